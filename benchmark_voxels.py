@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Voxel Benchmark - measures voxel_shape_library primitives and model export
+
+Runs every primitive across a matrix of sizes and block scales, plus a few
+composed models like the ones the AI writes, and reports wall time,
+blocks/second, peak memory and output size (JSON, or binary for the export
+cases). Uses only the standard library, so it runs offline.
+
+Usage:
+    python3 benchmark_voxels.py run                       # print results
+    python3 benchmark_voxels.py run -o baseline.json      # save a baseline
+    python3 benchmark_voxels.py compare baseline.json     # run, compare to baseline
+    python3 benchmark_voxels.py compare old.json new.json # compare two saved runs
+
+A case that raises is recorded with its error instead of results, and the
+run goes on. run exits with status 1 when any case failed; compare exits
+with status 1 when any case is slower, uses more memory or produces bigger
+output than the baseline by more than --threshold, or fails where the
+baseline did not.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import voxel_shape_library as vsl
+
+BASELINE_VERSION = 1
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.15
+
+SIZES = [1.0, 2.0, 4.0]
+SCALES = [0.1, 0.2, 0.4]
+
+# Each entry builds the call for one (size, scale) point of the matrix
+PRIMITIVES = {
+    "circle_layer": lambda r, s: vsl.create_circle_layer(0, r, s, "red"),
+    "sphere": lambda r, s: vsl.create_sphere(r, s, "red"),
+    "cylinder": lambda r, s: vsl.create_cylinder(2 * r, r, s, "blue"),
+    "tapered_shape": lambda r, s: vsl.create_tapered_shape(
+        [{"y": r, "radius": r / 2}, {"y": 0, "radius": r}, {"y": -r, "radius": r / 3}],
+        s,
+        [{"y_range": [r, -r], "color": "orange"}],
+    ),
+    "box": lambda r, s: vsl.create_box(2 * r, 2 * r, 2 * r, s, "white"),
+    "cone": lambda r, s: vsl.create_cone(2 * r, r, s, "green"),
+    "pyramid": lambda r, s: vsl.create_pyramid(2 * r, 2 * r, s, "yellow"),
+    "torus": lambda r, s: vsl.create_torus(r, r / 3, s, "gold"),
+    "plane": lambda r, s: vsl.create_plane(2 * r, 2 * r, s, "gray"),
+    "text": lambda r, s: vsl.create_text("BLOCKY" * max(1, int(r)), s, "white"),
+    "hemisphere": lambda r, s: vsl.create_hemisphere(r, s, "cyan"),
+    "ellipsoid": lambda r, s: vsl.create_ellipsoid(r, r / 2, r * 0.75, s, "pink"),
+    "wedge": lambda r, s: vsl.create_wedge(2 * r, r, 2 * r, s, "brown"),
+    "arch": lambda r, s: vsl.create_arch(2 * r, 2 * r, r / 2, r / 4, s, "stone"),
+    "star": lambda r, s: vsl.create_star(5, r / 2, r, s, "yellow"),
+    "ring": lambda r, s: vsl.create_ring(r, r * 0.7, r / 2, s, "purple"),
+}
+
+def _lantern():
+    blocks = vsl.create_tapered_shape(
+        [
+            {"y": 1.2, "radius": 0.3},
+            {"y": 0.8, "radius": 0.6},
+            {"y": 0.4, "radius": 0.4},
+            {"y": 0.0, "radius": 0.6},
+            {"y": -0.4, "radius": 0.3},
+        ],
+        0.18,
+        [{"y_range": [1.2, -0.4], "color": "orange"}],
+    )
+    blocks.extend(vsl.create_cylinder(0.4, 0.1, 0.1, "black", center_y=1.4))
+    return vsl.add_glow(blocks)
+
+def _house():
+    blocks = vsl.create_box(4, 3, 4, 0.2, "white", center=(0, 1.5, 0))
+    roof = vsl.create_pyramid(5, 2, 0.2, "red", center=(0, 3, 0))
+    blocks.extend(roof)
+    blocks.extend(vsl.create_box(0.8, 1.6, 0.2, 0.2, "brown", center=(0, 0.8, 2.1)))
+    blocks.extend(vsl.create_cylinder(1.2, 0.3, 0.2, "gray", center_y=4.0))
+    return blocks
+
+def _tree():
+    blocks = vsl.create_cylinder(3, 0.4, 0.2, "brown", block_material="wool", center_y=1.5)
+    for y, radius in [(3.5, 1.8), (4.8, 1.4), (5.8, 0.9)]:
+        crown = vsl.create_sphere(radius, 0.2, "green", block_material="wool")
+        for block in crown:
+            block["y"] += y
+        blocks.extend(crown)
+    return blocks
+
+def _snowman():
+    blocks = []
+    for y, radius in [(1.2, 1.2), (3.0, 0.9), (4.4, 0.6)]:
+        part = vsl.create_sphere(radius, 0.15, "white")
+        for block in part:
+            block["y"] += y
+        blocks.extend(part)
+    blocks.extend(vsl.create_cone(0.6, 0.12, 0.08, "orange", center_y=4.4))
+    hat = vsl.create_cylinder(0.6, 0.45, 0.15, "black", center_y=5.3)
+    blocks.extend(hat)
+    return blocks
+
+def _castle_tower():
+    blocks = vsl.create_cylinder(8, 2, 0.25, "light_gray", center_y=4)
+    blocks.extend(vsl.create_ring(2.4, 1.8, 0.8, 0.25, "gray", center_y=8.4))
+    blocks.extend(vsl.create_cone(3, 2.6, 0.25, "blue", center_y=10.3))
+    blocks.extend(vsl.create_arch(1.6, 2.2, 0.6, 0.3, 0.2, "brown", center=(0, 1.1, 2)))
+    return vsl.transform_blocks(blocks, rotate=(0, 45, 0))
+
+def _planet():
+    blocks = vsl.create_sphere(4, 0.2, "blue")
+    blocks.extend(vsl.create_torus(6, 0.6, 0.2, "yellow"))
+    blocks.extend(vsl.create_star(5, 0.4, 1, 0.15, "yellow", center_y=6))
+    return vsl.add_glow(blocks, brightness_block=10)
+
+MODELS = {
+    "lantern": _lantern,
+    "house": _house,
+    "tree": _tree,
+    "snowman": _snowman,
+    "castle_tower": _castle_tower,
+    "planet": _planet,
+}
+
+def benchmark_cases(filter_text=None):
+    """Yield (name, callable) for every benchmark case"""
+    cases = []
+    for name, build in PRIMITIVES.items():
+        for size in SIZES:
+            for scale in SCALES:
+                cases.append((f"primitive/{name}/r{size:g}/s{scale:g}", lambda b=build, r=size, s=scale: b(r, s)))
+    for name, build in MODELS.items():
+        cases.append((f"model/{name}", build))
+        cases.append((f"export/{name}", lambda b=build: vsl.encode_binary_model(b())))
+
+    for name, func in cases:
+        if filter_text is None or filter_text in name:
+            yield name, func
+
+def measure(func, repeat=DEFAULT_REPEAT):
+    """
+    Measure one benchmark case with a cold geometry cache
+
+    Returns:
+        Dictionary of blocks, wall_time (best of repeat), blocks_per_sec,
+        peak_memory and output_bytes
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        vsl.clear_geometry_cache()
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    # A separate traced run, since tracemalloc slows everything down
+    vsl.clear_geometry_cache()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if isinstance(result, (bytes, bytearray)):
+        blocks = len(vsl.decode_binary_model(result))
+        output_bytes = len(result)
+    else:
+        blocks = len(result)
+        output_bytes = len(json.dumps(result, separators=(",", ":")))
+
+    wall_time = min(times)
+    return {
+        "blocks": blocks,
+        "wall_time": wall_time,
+        "blocks_per_sec": blocks / wall_time if wall_time > 0 else 0.0,
+        "peak_memory": peak,
+        "output_bytes": output_bytes,
+    }
+
+def run_benchmarks(repeat=DEFAULT_REPEAT, filter_text=None, verbose=True):
+    """Run every benchmark case and return a baseline dictionary"""
+    results = {}
+    for name, func in benchmark_cases(filter_text):
+        try:
+            results[name] = measure(func, repeat)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            if verbose:
+                print(f"{name:<40} FAILED {results[name]['error']}", file=sys.stderr)
+            continue
+        if verbose:
+            r = results[name]
+            print(
+                f"{name:<40} {r['blocks']:>7} blocks {r['wall_time'] * 1000:>9.2f} ms "
+                f"{r['blocks_per_sec']:>11,.0f} blocks/s {r['peak_memory'] / 1024:>9.1f} KiB "
+                f"{r['output_bytes']:>9} B",
+                file=sys.stderr,
+            )
+
+    return {
+        "version": BASELINE_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two baseline dictionaries
+
+    Returns:
+        List of (case, metric, old, new, change) regressions, where change is
+        the relative increase
+    """
+    regressions = []
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None or "error" in old or "error" in new:
+            continue
+        for metric in ("wall_time", "peak_memory", "output_bytes"):
+            if old[metric] <= 0:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            if change > threshold:
+                regressions.append((name, metric, old[metric], new[metric], change))
+    return regressions
+
+def failed_cases(results):
+    """{case: error} of the cases that raised"""
+    return {name: result["error"] for name, result in results["results"].items() if "error" in result}
+
+def _load(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("version") != BASELINE_VERSION:
+        raise SystemExit(f"{path}: unsupported baseline version {data.get('version')}")
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark voxel_shape_library primitives and model export")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subcommands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("-o", "--output", help="Save results as a JSON baseline")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--filter", help="Only run cases whose name contains this text")
+
+    compare_parser = subcommands.add_parser("compare", help="Compare against a saved baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current", nargs="?", help="Saved results to compare (default: run now)")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="Allowed relative increase before a case counts as a regression")
+    compare_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    compare_parser.add_argument("--filter", help="Only run cases whose name contains this text")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_benchmarks(args.repeat, args.filter)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            print(f"Saved {len(results['results'])} results to {args.output}", file=sys.stderr)
+        else:
+            json.dump(results, sys.stdout, indent=2, sort_keys=True)
+            print()
+        failed = failed_cases(results)
+        if failed:
+            print(f"{len(failed)} of {len(results['results'])} cases failed", file=sys.stderr)
+        return 1 if failed else 0
+
+    baseline = _load(args.baseline)
+    current = _load(args.current) if args.current else run_benchmarks(args.repeat, args.filter)
+
+    missing = sorted(set(baseline["results"]) - set(current["results"]))
+    if missing and not args.filter:
+        print(f"Cases missing from current run: {', '.join(missing)}", file=sys.stderr)
+    failed = failed_cases(current)
+    newly_failed = sorted(set(failed) - set(failed_cases(baseline)))
+    for name in sorted(failed):
+        print(f"FAILED {name}: {failed[name]}")
+    changed = sorted(
+        name for name, result in current["results"].items()
+        if name in baseline["results"] and name not in failed
+        and baseline["results"][name].get("blocks") != result["blocks"]
+    )
+    for name in changed:
+        print(f"Block count changed: {name} {baseline['results'][name]['blocks']} -> {current['results'][name]['blocks']}")
+
+    regressions = compare_results(baseline, current, args.threshold)
+    for name, metric, old, new, change in regressions:
+        print(f"REGRESSION {name} {metric}: {old:.6g} -> {new:.6g} (+{change:.0%})")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} across {len(current['results'])} cases")
+    return 1 if regressions or newly_failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
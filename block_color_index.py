@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Color-to-block index built from the bundled Minecraft block textures
+
+The build step averages every full-cube block texture in CIE Lab, records how
+much the texture varies around that average, and stores the result as an
+implicit k-d tree (entries ordered so that the median of each range is its
+root), so loading needs no tree construction at all.
+
+Usage:
+    python3 block_color_index.py build        # regenerate data/block_color_index.json
+    python3 block_color_index.py lookup 200 30 30 --materials concrete,wool
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+
+from voxel_shape_library import read_png
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEXTURE_DIR = os.path.join(BASE_DIR, "public", "minecraft-textures", "block")
+INDEX_PATH = os.path.join(BASE_DIR, "data", "block_color_index.json")
+INDEX_VERSION = 1
+
+# Block IDs the index may contain: full, opaque cubes only
+FULL_BLOCKS_PATH = os.path.join(BASE_DIR, "data", "full_blocks.txt")
+
+# Texture suffixes for individual faces, in order of preference for the block's color
+FACE_SUFFIXES = ("_side", "_front", "_top", "_end", "_bottom", "_back")
+
+# Textures that are not a block's resting appearance (lit furnaces, crop stages, ...)
+_SKIP_PATTERN = re.compile(r"(_on|_overlay|_stage_?\d+|_moist|_inner|_particle|_vertical|_inverted_top|\d)$")
+
+# Texture names that differ from the ID of their block
+TEXTURE_BLOCK_IDS = {
+    "magma": "magma_block",
+    "snow": "snow_block",
+    "dried_kelp": "dried_kelp_block",
+}
+
+# Blocks that are not full cubes or cannot be placed as a block display
+_NOT_FULL_BLOCK = re.compile(r"(door|comparator|repeater|daylight_detector|debug|structure_block|jigsaw|"
+                             r"^lava|^water|^azalea$|_inside$|command_block_conditional)")
+
+# Textures stored in grayscale and tinted in game, with the default plains tint
+BIOME_TINTS = {
+    "grass_block_top": (145, 189, 89),
+    "oak_leaves": (119, 171, 47),
+    "jungle_leaves": (119, 171, 47),
+    "acacia_leaves": (119, 171, 47),
+    "dark_oak_leaves": (119, 171, 47),
+    "mangrove_leaves": (146, 193, 98),
+    "birch_leaves": (128, 167, 85),
+    "spruce_leaves": (97, 153, 97),
+    "vine": (119, 171, 47),
+    "lily_pad": (32, 128, 48),
+    "water_still": (63, 118, 228),
+}
+
+# Textures with more transparent pixels than this are not solid blocks
+MAX_TRANSPARENT_FRACTION = 0.1
+
+# Colors are quantized to this many bits per channel for the batched lookup table
+_LOOKUP_BITS = 5
+
+def srgb_to_lab(rgb):
+    """Convert an (r, g, b) color (0-255, sRGB) to CIE Lab with a D65 white point"""
+    linear = []
+    for value in rgb[:3]:
+        c = value / 255
+        linear.append(c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4)
+    r, g, b = linear
+    x = (0.4124 * r + 0.3576 * g + 0.1805 * b) / 0.95047
+    y = 0.2126 * r + 0.7152 * g + 0.0722 * b
+    z = (0.0193 * r + 0.1192 * g + 0.9505 * b) / 1.08883
+
+    def f(t):
+        return t ** (1 / 3) if t > 0.008856 else 7.787 * t + 16 / 116
+
+    fx, fy, fz = f(x), f(y), f(z)
+    return (116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz))
+
+def texture_color(path, tint=None):
+    """
+    Average Lab color and variance of one texture
+
+    Returns:
+        (L, a, b, variance, transparent_fraction), where variance is the mean
+        squared Lab distance of the opaque pixels from the average
+    """
+    width, height, rows = read_png(path)
+    # Animated textures are vertical strips of square frames; use the first one
+    rows = rows[:width]
+    labs = []
+    transparent = 0
+    for row in rows:
+        for r, g, b, alpha in row:
+            if alpha < 128:
+                transparent += 1
+                continue
+            if tint:
+                r, g, b = r * tint[0] // 255, g * tint[1] // 255, b * tint[2] // 255
+            labs.append(srgb_to_lab((r, g, b)))
+    total = transparent + len(labs)
+    if not labs:
+        return None
+
+    mean = [sum(lab[axis] for lab in labs) / len(labs) for axis in range(3)]
+    variance = sum(
+        (lab[0] - mean[0]) ** 2 + (lab[1] - mean[1]) ** 2 + (lab[2] - mean[2]) ** 2 for lab in labs
+    ) / len(labs)
+    return mean[0], mean[1], mean[2], variance, transparent / total
+
+def _texture_block(name):
+    """Block ID and preference rank for a texture file name (lower rank wins)"""
+    for rank, suffix in enumerate(FACE_SUFFIXES):
+        if name.endswith(suffix):
+            return name[:-len(suffix)], rank + 1
+    return name, 0
+
+def load_full_blocks(path=FULL_BLOCKS_PATH):
+    """Block IDs (without namespace) listed in data/full_blocks.txt"""
+    with open(path) as f:
+        return frozenset(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+def build_index(texture_dir=TEXTURE_DIR, full_blocks=None):
+    """
+    Compute index entries for every solid block texture in a directory
+
+    Args:
+        texture_dir: Directory of block textures
+        full_blocks: Block IDs that may be indexed (default: load_full_blocks())
+
+    Returns:
+        List of [block_id, L, a, b, variance] entries in k-d tree order
+    """
+    if full_blocks is None:
+        full_blocks = load_full_blocks()
+    chosen = {}
+    for filename in sorted(os.listdir(texture_dir)):
+        if not filename.endswith(".png"):
+            continue
+        name = filename[:-4]
+        block, rank = _texture_block(name)
+        # Skip on the block as well as the texture: "farmland_moist_top" is a farmland texture
+        if _SKIP_PATTERN.search(name) or _SKIP_PATTERN.search(block):
+            continue
+        block = TEXTURE_BLOCK_IDS.get(block, block)
+        if _NOT_FULL_BLOCK.search(block) or block not in full_blocks:
+            continue
+        if block in chosen and chosen[block][0] <= rank:
+            continue
+        try:
+            color = texture_color(os.path.join(texture_dir, filename), BIOME_TINTS.get(name))
+        except (ValueError, OSError) as e:
+            print(f"  ⚠ Skipping {filename}: {e}", file=sys.stderr)
+            continue
+        if color is None or color[4] > MAX_TRANSPARENT_FRACTION:
+            continue
+        chosen[block] = (rank, color)
+
+    entries = [
+        [f"minecraft:{block}", round(L, 2), round(a, 2), round(b, 2), round(variance, 1)]
+        for block, (_, (L, a, b, variance, _)) in chosen.items()
+    ]
+    return _kd_order(entries)
+
+def _kd_order(entries, depth=0):
+    """Order entries as an implicit k-d tree: median first by position, recursively"""
+    if len(entries) <= 1:
+        return list(entries)
+    axis = 1 + depth % 3
+    entries = sorted(entries, key=lambda entry: entry[axis])
+    middle = len(entries) // 2
+    return _kd_order(entries[:middle], depth + 1) + [entries[middle]] + _kd_order(entries[middle + 1:], depth + 1)
+
+def _material_matches(block_id, materials):
+    name = block_id.split(":", 1)[-1]
+    return any(name == material or name.endswith("_" + material) for material in materials)
+
+class BlockColorIndex:
+    """Nearest-block lookup over Lab colors"""
+
+    def __init__(self, entries, variance_weight=0.0):
+        """
+        Args:
+            entries: [block_id, L, a, b, variance] entries in k-d tree order
+            variance_weight: Penalty per unit of texture variance, to prefer
+                             evenly colored blocks over noisy ones
+        """
+        self.entries = entries
+        self.variance_weight = variance_weight
+        self._subsets = {}
+        self._tables = {}
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, variance_weight=0.0):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported block color index version: {data.get('version')}")
+        return cls(data["entries"], variance_weight)
+
+    def save(self, path=INDEX_PATH, source=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {"version": INDEX_VERSION, "source": source, "fields": ["block", "L", "a", "b", "variance"],
+                 "entries": self.entries},
+                f, separators=(",", ":"),
+            )
+            f.write("\n")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _tree(self, materials):
+        if not materials:
+            return self.entries
+        key = frozenset(materials)
+        tree = self._subsets.get(key)
+        if tree is None:
+            tree = self._subsets[key] = _kd_order([e for e in self.entries if _material_matches(e[0], key)])
+            if not tree:
+                raise ValueError(f"No blocks match the materials {sorted(key)}")
+        return tree
+
+    def _search(self, tree, L, a, b):
+        weight = self.variance_weight
+        best = None
+        best_distance = math.inf
+        stack = [(0, len(tree), 0)]
+        while stack:
+            start, end, depth = stack.pop()
+            if start >= end:
+                continue
+            middle = (start + end) // 2
+            entry = tree[middle]
+            distance = (entry[1] - L) ** 2 + (entry[2] - a) ** 2 + (entry[3] - b) ** 2 + weight * entry[4]
+            if distance < best_distance:
+                best, best_distance = entry, distance
+
+            axis = 1 + depth % 3
+            delta = (L, a, b)[axis - 1] - entry[axis]
+            near, far = ((middle + 1, end), (start, middle)) if delta > 0 else ((start, middle), (middle + 1, end))
+            if delta * delta < best_distance:
+                stack.append((far[0], far[1], depth + 1))
+            stack.append((near[0], near[1], depth + 1))
+        return best
+
+    def nearest(self, rgb, allowed_materials=None):
+        """Block ID whose texture color is closest to an (r, g, b) color"""
+        return self._search(self._tree(allowed_materials), *srgb_to_lab(rgb))[0]
+
+    def nearest_blocks(self, colors, allowed_materials=None):
+        """
+        Batched lookup for many (r, g, b) colors
+
+        Colors are quantized to 5 bits per channel and each quantized color is
+        searched once, after which lookups are a table read.
+
+        Args:
+            colors: Iterable of (r, g, b) or (r, g, b, a) tuples
+            allowed_materials: Only consider blocks whose ID is, or ends with
+                               "_" plus, one of these names (e.g. ["concrete", "wool"])
+
+        Returns:
+            List of block IDs, one per color
+        """
+        key = frozenset(allowed_materials) if allowed_materials else None
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = [None] * (1 << (3 * _LOOKUP_BITS))
+        tree = self._tree(key)
+        shift = 8 - _LOOKUP_BITS
+        half = 1 << (shift - 1)
+
+        result = []
+        append = result.append
+        for color in colors:
+            r, g, b = color[0] >> shift, color[1] >> shift, color[2] >> shift
+            cell = (r << (2 * _LOOKUP_BITS)) | (g << _LOOKUP_BITS) | b
+            block = table[cell]
+            if block is None:
+                center = ((r << shift) + half, (g << shift) + half, (b << shift) + half)
+                block = table[cell] = self._search(tree, *srgb_to_lab(center))[0]
+            append(block)
+        return result
+
+    def palette(self, allowed_materials=None):
+        """
+        Color function for create_pixel_art, create_relief and voxelize_mesh
+
+        Returns block names without the namespace, so pass block_material=""
+        alongside it.
+        """
+        def palette(rgb):
+            return self.nearest_blocks([rgb], allowed_materials)[0].split(":", 1)[-1]
+        return palette
+
+_default_index = None
+
+def default_index():
+    """The index in data/block_color_index.json, loaded on first use"""
+    global _default_index
+    if _default_index is None:
+        _default_index = BlockColorIndex.load()
+    return _default_index
+
+def nearest_blocks(colors, allowed_materials=None):
+    """Map (r, g, b) colors to block IDs with the default index"""
+    return default_index().nearest_blocks(colors, allowed_materials)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the color-to-block index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subcommands.add_parser("build", help="Rebuild the index from block textures")
+    build_parser.add_argument("--textures", default=TEXTURE_DIR)
+    build_parser.add_argument("-o", "--output", default=INDEX_PATH)
+
+    lookup_parser = subcommands.add_parser("lookup", help="Find the closest block for a color")
+    lookup_parser.add_argument("rgb", type=int, nargs=3)
+    lookup_parser.add_argument("--materials", help="Comma-separated materials, e.g. concrete,wool")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        index = BlockColorIndex(build_index(args.textures))
+        index.save(args.output, source=os.path.relpath(args.textures, BASE_DIR))
+        print(f"✓ Indexed {len(index)} blocks into {args.output}")
+    else:
+        materials = args.materials.split(",") if args.materials else None
+        print(default_index().nearest(tuple(args.rgb), materials))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1157 @@
+"""
+Generate block display model functions (.mcfunction) for the datapack
+
+Every summoned entity is tagged with its model variant and a hash of its
+block, so a later deploy can write an "upgrade" function that kills only the
+blocks that were removed and summons only the new ones.
+
+Parts of an InstancedModel that are placed more than once by plain
+translation get their own function, written relative to the part's origin and
+called once per placement with "execute positioned". Those entities are tagged
+by their position within the part, so an upgrade of a display variant that
+uses part functions respawns the whole variant instead.
+
+Display variants merge runs of identical blocks on a grid into single
+stretched block displays, so a solid model spawns far fewer entities. The
+upgrade diff is taken between the merged blocks of both deploys.
+
+Function files are written a chunk of blocks at a time. A model given as a
+stream of blocks instead of a list is written in a single pass over it, for
+models too large to hold in memory. With a tick budget, a model function
+with more commands than that is split into chunks run one tick after
+another, so spawning a large model doesn't stall the server for a tick.
+"""
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from json.encoder import encode_basestring_ascii
+
+from voxel_shape_library import InstancedModel, diff_models, downsample_blocks
+
+# Canonical JSON of a block, hashed into its entity tag
+_CANONICAL_JSON = json.JSONEncoder(sort_keys=True, separators=(',', ':')).encode
+
+def format_number(value):
+    """Shortest decimal text for a coordinate or NBT float, to 6 decimal places (0.22, not 0.22000000000000003)"""
+    text = f"{value:.6f}".rstrip('0').rstrip('.')
+    return "0" if text == "-0" else text
+
+class _NumberText(dict):
+    """format_number() memo - coordinates repeat a lot along a model's grid"""
+
+    def __missing__(self, value):
+        text = self[value] = format_number(value)
+        return text
+
+def _properties_key(properties):
+    """Hashable form of a block's properties, keeping their order"""
+    return tuple(properties.items()) if properties else None
+
+def _block_state_nbt(name, properties):
+    props_nbt = ""
+    if properties:
+        props_list = [f'{k}:"{v}"' for k, v in properties]
+        props_nbt = f",Properties:{{{','.join(props_list)}}}"
+    return f"{{block_state:{{Name:\"{name}\"{props_nbt}}}"
+
+def _rotation_quaternion(rotation, rotation_offset):
+    """
+    Quaternion [x, y, z, w] of a block's [pitch, yaw, roll] rotation, turned
+    by rotation_offset degrees of yaw
+
+    Same order as the voxel library's rotations: yaw, then pitch, then roll,
+    each about the block's own axes (Ry * Rx * Rz).
+    """
+    pitch, yaw, roll = (math.radians(v) / 2 for v in rotation)
+    yaw += math.radians(rotation_offset) / 2
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    cr, sr = math.cos(roll), math.sin(roll)
+    return (
+        cy * sp * cr + sy * cp * sr,
+        sy * cp * cr - cy * sp * sr,
+        cy * cp * sr - sy * sp * cr,
+        cy * cp * cr + sy * sp * sr,
+    )
+
+def _transformation_nbt(scale, rotation, scale_multiplier, rotation_offset):
+    """Transformation NBT - it MUST include all components for Minecraft to apply it"""
+    sx, sy, sz = (1.0, 1.0, 1.0)
+    if scale:
+        # Apply scale multiplier to each block's scale
+        sx, sy, sz = (v * scale_multiplier for v in scale)
+
+    # Rotation as a quaternion [x, y, z, w], as left_rotation
+    left_rot = "[0f,0f,0f,1f]"
+    if rotation is not None:
+        left_rot = f"[{','.join(f'{format_number(v)}f' for v in _rotation_quaternion(rotation, rotation_offset))}]"
+
+    return (
+        f",transformation:{{"
+        f"translation:[0f,0f,0f],"
+        f"left_rotation:{left_rot},"
+        f"scale:[{format_number(sx)}f,{format_number(sy)}f,{format_number(sz)}f],"
+        f"right_rotation:[0f,0f,0f,1f]"
+        f"}}"
+    )
+
+# Largest number of blocks a single fill command may place
+FILL_MAX_VOLUME = 32768
+
+def merge_fill_boxes(cells, max_volume=FILL_MAX_VOLUME, max_stretch=None):
+    """
+    Greedily cover cells with boxes of a single block state
+
+    Starting from the lowest remaining cell (by y, then z, then x), a box
+    grows along x, then z, then y for as long as every new cell has the same
+    state and the box stays within the limits.
+
+    Args:
+        cells: {(x, y, z): block state}
+        max_volume: Most cells in one box
+        max_stretch: Most a box's longest side may be over its shortest one
+                     (None for no limit)
+
+    Returns:
+        [((x1, y1, z1), (x2, y2, z2), state), ...] covering every cell once
+    """
+    def fits(*sides):
+        if sides[0] * sides[1] * sides[2] > max_volume:
+            return False
+        return max_stretch is None or max(sides) <= max_stretch * min(sides)
+
+    remaining = dict(cells)
+    boxes = []
+    for position in sorted(cells, key=lambda p: (p[1], p[2], p[0])):
+        state = remaining.get(position)
+        if state is None:
+            continue
+        x0, y0, z0 = position
+
+        x1 = x0
+        while fits(x1 - x0 + 2, 1, 1) and remaining.get((x1 + 1, y0, z0)) == state:
+            x1 += 1
+        xs = range(x0, x1 + 1)
+
+        z1 = z0
+        while (fits(len(xs), 1, z1 - z0 + 2)
+               and all(remaining.get((x, y0, z1 + 1)) == state for x in xs)):
+            z1 += 1
+        zs = range(z0, z1 + 1)
+
+        y1 = y0
+        while (fits(len(xs), y1 - y0 + 2, len(zs))
+               and all(remaining.get((x, y1 + 1, z)) == state for z in zs for x in xs)):
+            y1 += 1
+
+        for y in range(y0, y1 + 1):
+            for z in zs:
+                for x in xs:
+                    del remaining[(x, y, z)]
+        boxes.append(((x0, y0, z0), (x1, y1, z1), state))
+    return boxes
+
+# Texture variance (see block_color_index) up to which a block counts as flat
+# colored, so stretching it shows no distortion
+FLAT_TEXTURE_VARIANCE = 2.0
+
+# Most a textured block display is stretched along one side compared to
+# another by default, before its texture visibly smears
+DEFAULT_MAX_STRETCH = 4
+
+_flat_blocks = None
+
+def flat_blocks():
+    """IDs of the flat colored blocks in the block color index (empty if it can't be loaded)"""
+    global _flat_blocks
+    if _flat_blocks is None:
+        try:
+            from block_color_index import default_index
+            entries = default_index().entries
+        except (OSError, ValueError) as e:
+            print(f"  ⚠ No block color index, treating every block as textured: {e}")
+            entries = []
+        _flat_blocks = frozenset(entry[0] for entry in entries if entry[4] <= FLAT_TEXTURE_VARIANCE)
+    return _flat_blocks
+
+def merge_display_blocks(blocks, max_stretch=DEFAULT_MAX_STRETCH):
+    """
+    Merge runs of identical display blocks into stretched ones
+
+    Blocks with the same material, properties, brightness and scale, no
+    rotation and a position on the grid of that scale are greedily merged
+    (see merge_fill_boxes) into boxes, each spawned as one block display
+    scaled to cover the whole box. Every other block is kept as it is.
+
+    Args:
+        blocks: List of block dictionaries
+        max_stretch: Most a textured block may be stretched along one side
+                     compared to another (None for no limit). Flat colored
+                     blocks (flat_blocks()) are never limited
+
+    Returns:
+        New list of blocks, the kept ones first in their original order
+    """
+    kept = []
+    groups = {}  # (material, properties, brightness, scale) -> (origin, {cell: first block})
+    for block in blocks:
+        scale = block.get('scale')
+        if block.get('rotation') or not scale or min(scale) <= 0:
+            kept.append(block)
+            continue
+        position = (block.get('x', 0), block.get('y', 0), block.get('z', 0))
+        key = (
+            block.get('block', 'minecraft:stone'), _properties_key(block.get('properties')),
+            _properties_key(block.get('brightness')), tuple(scale),
+        )
+        group = groups.get(key)
+        if group is None:
+            # The grid runs through the group's first block
+            origin = tuple(p - round(p / s) * s for p, s in zip(position, scale))
+            group = groups[key] = (origin, {})
+        origin, cells = group
+        cell = tuple(round((p - o) / s) for p, o, s in zip(position, origin, scale))
+        on_grid = all(abs(o + c * s - p) <= s * 0.01 for p, o, c, s in zip(position, origin, cell, scale))
+        if not on_grid or cell in cells:
+            kept.append(block)
+            continue
+        cells[cell] = block
+
+    merged = []
+    flat = flat_blocks() if max_stretch is not None else frozenset()
+    for (name, _, _, scale), (origin, cells) in groups.items():
+        block_id = name if ':' in name else f"minecraft:{name}"
+        stretch = None if block_id in flat else max_stretch
+        boxes = merge_fill_boxes(dict.fromkeys(cells, True), max_volume=math.inf, max_stretch=stretch)
+        for first, last, _ in boxes:
+            block = cells[first]
+            if first == last:
+                merged.append(block)
+                continue
+            sx, sy, sz = (s * (b - a + 1) for s, a, b in zip(scale, first, last))
+            ox, oy, oz = (o + a * s for o, a, s in zip(origin, first, scale))
+            box = dict(block)
+            # Displays grow from their x/z corner, and spawn half their height above y
+            box['x'], box['y'], box['z'] = ox, oy + (scale[1] - sy) / 2, oz
+            box['scale'] = [sx, sy, sz]
+            merged.append(box)
+    return kept + merged
+
+# Blocks turned into commands at a time, and the write buffer of function files
+WRITE_CHUNK_BLOCKS = 4096
+WRITE_BUFFER_BYTES = 1 << 20
+
+# Projects with fewer blocks than this in total are generated in-process
+PARALLEL_MIN_BLOCKS = 20000
+
+_COMPACT_JSON = json.JSONEncoder(separators=(',', ':')).encode
+
+class FunctionFile:
+    """
+    Buffered .mcfunction writer
+
+    Lines are written as they come, joined by newlines with no trailing
+    newline (the same bytes as '\\n'.join(lines)), so no function is ever
+    held in memory as a whole.
+    """
+
+    def __init__(self, path, header=()):
+        self._file = open(path, 'w', buffering=WRITE_BUFFER_BYTES)
+        self._separator = ""
+        self.files = [os.path.basename(path)]
+        self.write_lines(header)
+
+    def write_lines(self, lines):
+        for line in lines:
+            self._file.write(self._separator)
+            self._file.write(line)
+            self._separator = "\n"
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TickedFunctionFile:
+    """
+    Function writer that spreads a function's commands over several ticks
+
+    Up to budget commands the function is written as a plain FunctionFile.
+    Past that, the commands go to chunk functions of budget commands each.
+    The main function summons a marker entity where it runs as the anchor,
+    tagged with the stage it is at, and a tick function runs the chunk of
+    each anchor's stage as and at it, so relative coordinates stay correct.
+    Every chunk moves its anchor on to the next stage and the last one
+    removes it; the tick function runs again next tick while anchors are left.
+
+    With restart, running the main function again before it is done starts
+    over. Without it, every run gets an anchor of its own and they spawn side
+    by side (e.g. the placements of a shared part). A spawn stops if its
+    anchor's chunk is unloaded.
+    """
+
+    def __init__(self, function_dir, name, header, namespace, anchor_tag, budget, restart=True):
+        """
+        Args:
+            function_dir: Directory of the datapack's functions
+            name: Function name, without namespace or extension
+            header: Comment lines at the top of the main function
+            namespace: Datapack namespace, for schedule and function commands
+            anchor_tag: Tag of the anchor marker entities
+            budget: Most commands run per tick (per anchor)
+            restart: Remove the anchors of an earlier run when run again
+        """
+        if budget < 1:
+            raise ValueError(f"Tick budget must be at least 1 command, got {budget}")
+        self.function_dir = function_dir
+        self.name = name
+        self.header = list(header)
+        self.namespace = namespace
+        self.anchor_tag = anchor_tag
+        self.budget = budget
+        self.restart = restart
+        self.files = []
+        self.ticks = 1
+        self._pending = []  # Commands of the first chunk, kept until the budget is exceeded
+        self._chunk = None
+        self._room = budget
+
+    def _path(self, name):
+        return os.path.join(self.function_dir, f'{name}.mcfunction')
+
+    def _function(self, name):
+        return f"{self.namespace}:{name}"
+
+    def _stage(self, tick):
+        """Tag of the anchors whose next chunk is chunk tick"""
+        return f"{self.anchor_tag}_{tick}"
+
+    def _anchors(self, *tags):
+        """Selector of the anchor markers, narrowed to those with every one of tags"""
+        arguments = ["type=minecraft:marker"] + [f"tag={tag}" for tag in (self.anchor_tag, *tags)]
+        return f"@e[{','.join(arguments)}]"
+
+    def _next_chunk(self):
+        chunk = self._chunk
+        if chunk is None:
+            chunk = FunctionFile(self._path(f'{self.name}_chunk_0'), self._pending)
+            self._pending = None
+        chunk.write_lines([
+            f"tag @s remove {self._stage(self.ticks - 1)}",
+            f"tag @s add {self._stage(self.ticks)}",
+        ])
+        chunk.close()
+        self._chunk = FunctionFile(self._path(f'{self.name}_chunk_{self.ticks}'))
+        self.ticks += 1
+        self._room = self.budget
+
+    def write_lines(self, lines):
+        lines = iter(lines)
+        while True:
+            if not self._room:
+                # Only start another chunk once there is a command to put in it
+                first = next(lines, None)
+                if first is None:
+                    return
+                self._next_chunk()
+                lines = itertools.chain((first,), lines)
+            batch = list(itertools.islice(lines, self._room))
+            if not batch:
+                return
+            self._room -= len(batch)
+            if self._chunk is None:
+                self._pending.extend(batch)
+            else:
+                self._chunk.write_lines(batch)
+
+    def close(self):
+        if self._chunk is None:
+            with FunctionFile(self._path(self.name), self.header) as function_file:
+                function_file.write_lines(self._pending)
+            self.files = function_file.files
+            return
+
+        self._chunk.write_lines(["kill @s"])
+        self._chunk.close()
+        tick_function = self._function(f'{self.name}_tick')
+        with FunctionFile(self._path(f'{self.name}_tick')) as tick_file:
+            # Last stage first, so an anchor that moved on waits for the next tick
+            tick_file.write_lines(
+                f"execute as {self._anchors(self._stage(tick))} at @s "
+                f"run function {self._function(f'{self.name}_chunk_{tick}')}"
+                for tick in reversed(range(self.ticks))
+            )
+            tick_file.write_lines([f"execute if entity {self._anchors()} run schedule function {tick_function} 1t"])
+        self.files = [f'{self.name}.mcfunction', f'{self.name}_tick.mcfunction']
+        self.files += [f'{self.name}_chunk_{tick}.mcfunction' for tick in range(self.ticks)]
+
+        tags = ",".join(encode_basestring_ascii(tag) for tag in (self.anchor_tag, self._stage(0)))
+        with FunctionFile(self._path(self.name), self.header) as function_file:
+            if self.restart:
+                # Drop what is left of an earlier run of this function
+                function_file.write_lines([f"kill {self._anchors()}"])
+            function_file.write_lines([f"summon minecraft:marker ~ ~ ~ {{Tags:[{tags}]}}"])
+            # Runs of the same tick share one tick function call, so
+            # unrestarted anchors start on the next tick
+            function_file.write_lines([
+                f"function {tick_function}" if self.restart else f"schedule function {tick_function} 1t"
+            ])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _pool_context():
+    """forkserver keeps a clean, preloaded process to fork from; spawn where it is missing"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["block_display_generator"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+def _generate_job(settings, job):
+    """Process pool entry point: one model's functions, plus what generating them printed"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        written = BlockDisplayGenerator(*settings).generate_model_functions(*job)
+    return written, output.getvalue()
+
+class PreparedBlocks:
+    """
+    Per-block values that every variant of a model shares, computed once
+
+    Variants only differ by scale multiplier, rotation offset and placement
+    mode, so each one is a pass over these columns plus one NBT fragment per
+    distinct (scale, rotation) pair. Slicing gives a chunk that shares the caches.
+    """
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.xs = [block.get('x', 0) for block in blocks]
+        self.ys = [block.get('y', 0) for block in blocks]
+        self.zs = [block.get('z', 0) for block in blocks]
+
+        interned = {}
+        self.materials = []
+        self.lights = []
+        self.shapes = []
+        for block in blocks:
+            material = (block.get('block', 'minecraft:stone'), _properties_key(block.get('properties')))
+            self.materials.append(interned.setdefault(material, material))
+
+            brightness = block.get('brightness')
+            light = ""
+            if brightness:
+                light = f",brightness:{{sky:{brightness.get('sky', 15)},block:{brightness.get('block', 0)}}}"
+                light = interned.setdefault(light, light)
+            self.lights.append(light)
+
+            scale = block.get('scale')
+            rotation = block.get('rotation')
+            shape = (tuple(scale) if scale else None, tuple(rotation) if rotation else None)
+            self.shapes.append(interned.setdefault(shape, shape))
+
+        self._block_tags = None
+        self._parent = None
+        self._caches = ({}, {}, {}, _NumberText())  # Display states, setblock states, transformations, numbers
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("PreparedBlocks only supports slicing")
+        chunk = object.__new__(PreparedBlocks)
+        for name in ('blocks', 'xs', 'ys', 'zs', 'materials', 'lights', 'shapes'):
+            setattr(chunk, name, getattr(self, name)[index])
+        chunk._block_tags = None
+        chunk._parent = (self, index)
+        chunk._caches = self._caches
+        return chunk
+
+    @property
+    def block_tags(self):
+        """BlockDisplayGenerator.block_tag() of every block"""
+        if self._block_tags is None:
+            if self._parent is not None:
+                parent, index = self._parent
+                self._block_tags = parent.block_tags[index]
+            else:
+                self._block_tags = BlockDisplayGenerator.block_tags(self.blocks)
+        return self._block_tags
+
+    def display_states(self):
+        states = self._caches[0]
+        for material in set(self.materials) - states.keys():
+            states[material] = _block_state_nbt(*material)
+        return states
+
+    def setblock_states(self):
+        states = self._caches[1]
+        for material in set(self.materials) - states.keys():
+            name, properties = material
+            props_str = f"[{','.join(f'{k}={v}' for k, v in properties)}]" if properties else ""
+            states[material] = f"{name}{props_str}"
+        return states
+
+    def transformations(self, scale_multiplier, rotation_offset):
+        """Transformation NBT per (scale, rotation) shape for one variant"""
+        cache = self._caches[2].setdefault((scale_multiplier, rotation_offset), {})
+        for shape in set(self.shapes) - cache.keys():
+            cache[shape] = _transformation_nbt(shape[0], shape[1], scale_multiplier, rotation_offset)
+        return cache
+
+    @property
+    def numbers(self):
+        return self._caches[3]
+
+class BlockDisplayGenerator:
+    def __init__(self, build_path, namespace, snapshot_path, merge_displays=True,
+                 max_stretch=DEFAULT_MAX_STRETCH, tick_budget=None):
+        """
+        Args:
+            build_path: Mod build directory
+            namespace: Datapack namespace the functions are written to
+            snapshot_path: Directory that keeps the last deployed block list of
+                           each model, outside the build directory (which is
+                           recreated on every deploy)
+            merge_displays: Spawn runs of identical display blocks as single
+                            stretched displays (see merge_display_blocks)
+            max_stretch: Distortion cap for stretched textured blocks (None
+                         for no limit, see merge_display_blocks)
+            tick_budget: Most commands a model function runs per tick, to
+                         spread spawning a large model over several ticks
+                         (see TickedFunctionFile; None, or less than 1,
+                         runs it all at once)
+        """
+        self.build_path = build_path
+        self.namespace = namespace
+        self.function_dir = os.path.join(build_path, 'src/main/resources/data', namespace, 'function')
+        self.snapshot_path = snapshot_path
+        self.merge_displays = merge_displays
+        self.max_stretch = max_stretch
+        self.tick_budget = tick_budget if tick_budget and tick_budget >= 1 else None
+
+    def merge_settings(self):
+        """How display blocks are merged, recorded with each snapshot (None when they are not)"""
+        return {'max_stretch': self.max_stretch} if self.merge_displays else None
+
+    def create_function_directory(self):
+        """Create the function directory if it doesn't exist"""
+        os.makedirs(self.function_dir, exist_ok=True)
+
+    @staticmethod
+    def parse_variant(variant):
+        """
+        Parse a variant name such as "scale_2", "rotation_90", "lod_2" or "placement_blocks"
+
+        Returns:
+            (scale_multiplier, rotation_offset, placement_mode, variant_suffix)
+        """
+        scale_multiplier = 1.0
+        rotation_offset = 0.0
+        placement_mode = 'display'  # Default to display entities
+        variant_suffix = ""
+
+        # Extract placement mode from THIS variant (if it's a placement variant)
+        if variant.startswith('placement_'):
+            placement_mode = variant.split('_')[1]  # Extract 'blocks' or 'display'
+            # Add placement mode to filename suffix so they don't overwrite each other
+            if placement_mode == 'blocks':
+                variant_suffix = "_blocks"
+
+        if variant != 'base' and not variant.startswith('placement_'):
+            parts = variant.split('_')
+            if len(parts) >= 2:
+                variant_type = parts[0]
+                variant_value = float(parts[1])
+                if variant_type == 'scale':
+                    scale_multiplier = variant_value
+                    # Format as int if whole number to match JavaScript
+                    if variant_value == int(variant_value):
+                        variant_suffix = f"_scale_{int(variant_value)}"
+                    else:
+                        variant_suffix = f"_scale_{variant_value}".replace('.', '_')
+                elif variant_type == 'rotation':
+                    rotation_offset = variant_value
+                    if variant_value == int(variant_value):
+                        variant_suffix = f"_rotation_{int(variant_value)}"
+                    else:
+                        variant_suffix = f"_rotation_{variant_value}".replace('.', '_')
+                elif variant_type == 'lod':
+                    variant_suffix = f"_lod_{int(variant_value)}"
+
+        return scale_multiplier, rotation_offset, placement_mode, variant_suffix
+
+    @staticmethod
+    def lod_level(variant):
+        """Octree level of an "lod_N" variant (0 for every other variant)"""
+        if variant.startswith('lod_'):
+            return max(0, int(float(variant.split('_')[1])))
+        return 0
+
+    @staticmethod
+    def model_tag(model_id, variant_suffix):
+        """Entity tag shared by every block of one model variant"""
+        return f"bc_{model_id}{variant_suffix}"
+
+    @staticmethod
+    def block_tag(block_entity):
+        """Entity tag identifying one block by its content and position"""
+        canonical = _CANONICAL_JSON(block_entity)
+        return "b" + hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+    @staticmethod
+    def block_tags(blocks):
+        """block_tag() of every block, in order"""
+        sha1 = hashlib.sha1
+        return ["b" + sha1(_CANONICAL_JSON(block).encode('utf-8')).hexdigest()[:12] for block in blocks]
+
+    def block_command(self, block_entity, scale_multiplier, rotation_offset, placement_mode, tags=None):
+        """
+        Build the command that places one block
+
+        Returns:
+            (command, position) where position is the (x, y, z) cell for
+            placement_blocks and None for display entities
+        """
+        commands, positions = self.block_commands(
+            [block_entity], scale_multiplier, rotation_offset, placement_mode, tags=tags
+        )
+        return commands[0], positions[0] if positions is not None else None
+
+    def block_commands(self, blocks, scale_multiplier, rotation_offset, placement_mode, tags=None, block_tags=None):
+        """
+        Build the commands that place a list of blocks
+
+        Args:
+            blocks: Block list, or PreparedBlocks to share the per-block work
+                    between variants
+            tags: Entity tags shared by every block
+            block_tags: Optional extra tag per block (same length as blocks)
+
+        Returns:
+            (commands, positions) where positions is the list of (x, y, z)
+            cells for placement_blocks and None for display entities
+        """
+        prepared = blocks if isinstance(blocks, PreparedBlocks) else PreparedBlocks(blocks)
+        if placement_mode == 'blocks':
+            return self._setblock_commands(prepared, scale_multiplier)
+
+        m = scale_multiplier
+        numbers = prepared.numbers
+        states = prepared.display_states()
+        transforms = prepared.transformations(scale_multiplier, rotation_offset)
+        shared_tags = ','.join(encode_basestring_ascii(tag) for tag in tags or ())
+        if block_tags is not None:
+            prefix = f",Tags:[{shared_tags}," if tags else ",Tags:["
+            ends = [f"{prefix}{encode_basestring_ascii(tag)}]}}" for tag in block_tags]
+        else:
+            ends = itertools.repeat(f",Tags:[{shared_tags}]}}" if tags else "}")
+
+        # Add Y offset to match Three.js rendering (blocks pivot at center in Three.js, bottom in Minecraft)
+        commands = [
+            f"summon minecraft:block_display ~{numbers[x * m]} "
+            f"~{numbers[y * m + (shape[0][1] * m) / 2 if shape[0] else y * m]} ~{numbers[z * m]} "
+            f"{states[material]}{light}{transforms[shape]}{end}"
+            for x, y, z, material, light, shape, end in zip(
+                prepared.xs, prepared.ys, prepared.zs, prepared.materials, prepared.lights, prepared.shapes, ends
+            )
+        ]
+        return commands, None
+
+    def _setblock_commands(self, prepared, scale_multiplier):
+        """setblock commands for placement_blocks, one per source block"""
+        cells = self.block_cells(prepared, scale_multiplier)
+        commands = [f"setblock ~{x} ~{y} ~{z} {state}" for (x, y, z), state in cells]
+        return commands, [position for position, _ in cells]
+
+    def block_cells(self, blocks, scale_multiplier):
+        """
+        Cells of placement_blocks, snapped to the model's own block grid
+
+        Args:
+            blocks: Block list or PreparedBlocks
+
+        Returns:
+            [((x, y, z), block state), ...] per source block, in order - when
+            blocks share a cell the last one is the one that stays placed
+        """
+        prepared = blocks if isinstance(blocks, PreparedBlocks) else PreparedBlocks(blocks)
+        states = prepared.setblock_states()
+        cells = []
+        for x, y, z, material, (scale, _) in zip(
+            prepared.xs, prepared.ys, prepared.zs, prepared.materials, prepared.shapes
+        ):
+            # Scale up coordinates by the block's own size to preserve detail
+            upscale_factor = 1.0 / (scale[0] if scale else 0.22)  # Usually 0.22 for AI models
+            y = y * scale_multiplier * upscale_factor
+            if scale:
+                y += (scale[1] * scale_multiplier) / 2  # Same Three.js pivot offset as display entities
+            position = (
+                int(round(x * scale_multiplier * upscale_factor)), int(round(y)),
+                int(round(z * scale_multiplier * upscale_factor)),
+            )
+            cells.append((position, states[material]))
+        return cells
+
+    @staticmethod
+    def fill_commands(cells):
+        """
+        setblock / fill commands that place a set of cells
+
+        Args:
+            cells: {(x, y, z): block state}
+
+        Returns:
+            Commands, with every box from merge_fill_boxes() of more than one
+            cell as a single fill
+        """
+        commands = []
+        for (x1, y1, z1), (x2, y2, z2), state in merge_fill_boxes(cells):
+            if (x1, y1, z1) == (x2, y2, z2):
+                commands.append(f"setblock ~{x1} ~{y1} ~{z1} {state}")
+            else:
+                commands.append(f"fill ~{x1} ~{y1} ~{z1} ~{x2} ~{y2} ~{z2} {state}")
+        return commands
+
+    def _snapshot_file(self, model_id):
+        return os.path.join(self.snapshot_path, f'{model_id}.json')
+
+    def load_snapshot(self, model_id):
+        """
+        Block list from the previous deploy of a model
+
+        Returns:
+            (blocks or None, whether that deploy used part functions,
+            its merge_settings())
+        """
+        try:
+            with open(self._snapshot_file(model_id)) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None, False, None
+        if isinstance(data, dict):
+            return data.get('blocks'), bool(data.get('instanced')), data.get('merge')
+        return data, False, None
+
+    def save_snapshot(self, model_id, blocks, instanced=False, merge=None):
+        os.makedirs(self.snapshot_path, exist_ok=True)
+        data = blocks
+        if instanced or merge is not None:
+            data = {'instanced': instanced, 'merge': merge, 'blocks': blocks}
+        with open(self._snapshot_file(model_id), 'w') as f:
+            # dumps() uses the C encoder; dump() streams through the pure-Python one
+            f.write(json.dumps(data, separators=(',', ':')))
+
+    @staticmethod
+    def shared_parts(model):
+        """
+        Parts of an InstancedModel worth a function of their own
+
+        Returns:
+            ({part name: [(x, y, z) offset, ...]} for parts placed at least
+            twice by plain translation, [indices of the remaining instances])
+        """
+        offsets = {}
+        for index, (name, transform) in enumerate(model.instances):
+            offset = transform.translation()
+            if offset is not None:
+                offsets.setdefault(name, []).append((index, offset))
+        shared = {name: [offset for _, offset in placed] for name, placed in offsets.items() if len(placed) > 1}
+        shared_indices = {index for name in shared for index, _ in offsets[name]}
+        inline = [index for index in range(len(model.instances)) if index not in shared_indices]
+        return shared, inline
+
+    def function_file(self, function_name, header, model_tag, restart=True):
+        """
+        Writer for a model, part or upgrade function, spread over several
+        ticks past tick_budget commands (see TickedFunctionFile)
+
+        model_tag names the function's anchor markers, so it must be unique
+        to the function.
+        """
+        if self.tick_budget:
+            return TickedFunctionFile(
+                self.function_dir, function_name, header, self.namespace, f"{model_tag}_anchor", self.tick_budget,
+                restart=restart,
+            )
+        return FunctionFile(os.path.join(self.function_dir, f'{function_name}.mcfunction'), header)
+
+    def function_header(self, model_name, variant, prompt):
+        return [
+            f"# {model_name} {variant}",
+            f"# Generated by BlockCraft AI",
+            f"# Prompt: {prompt}",
+            "",
+        ]
+
+    def generate_model_functions(self, model_id, model_name, prompt, blocks, variants):
+        """
+        Write the function for each variant of a model, plus an upgrade
+        function when a previous deploy of the model is known
+
+        Args:
+            blocks: Block list or InstancedModel. Any other iterable of blocks
+                    is streamed instead (see stream_model_functions)
+
+        Returns:
+            List of written function file names
+        """
+        if not isinstance(blocks, (list, InstancedModel)):
+            return self.stream_model_functions(model_id, model_name, prompt, blocks, variants)
+
+        model = blocks if isinstance(blocks, InstancedModel) else None
+        shared, inline = self.shared_parts(model) if model is not None else ({}, [])
+        if model is not None:
+            blocks = model.to_blocks()
+
+        previous, previous_instanced, previous_merge = self.load_snapshot(model_id)
+        merge = self.merge_settings()
+        diff = None
+        if previous is not None:
+            diff = diff_models(previous, blocks)
+            # Blocks that only moved within tolerance keep their deployed form,
+            # so their entity tags stay valid for the next upgrade
+            kept = {id(new): old for old, new in diff['unchanged']}
+            blocks = [kept.get(id(block), block) for block in blocks]
+        written = []
+        lods = {}
+        merged = {}
+        prepared = {}  # PreparedBlocks per block list, shared by the variants that spawn it
+        used_parts = False
+
+        for variant in variants or ['base']:
+            scale_multiplier, rotation_offset, placement_mode, variant_suffix = self.parse_variant(variant)
+
+            # lod_N variants spawn a downsampled copy, with its own upgrade diff
+            variant_blocks, variant_diff, variant_previous = blocks, diff, previous
+            level = self.lod_level(variant)
+            if level:
+                if level not in lods:
+                    lod_blocks = downsample_blocks(blocks, level)
+                    lod_diff = lod_previous = None
+                    if previous is not None:
+                        lod_previous = downsample_blocks(previous, level)
+                        lod_diff = diff_models(lod_previous, lod_blocks)
+                    lods[level] = (lod_blocks, lod_diff, lod_previous)
+                variant_blocks, variant_diff, variant_previous = lods[level]
+
+            print(f"  Generating function for: {model_name} ({len(variant_blocks)} blocks) - variant: {variant} (scale={scale_multiplier}, mode={placement_mode})")
+
+            # Real blocks snap to the grid per block and LODs merge across parts,
+            # so only full-detail display variants call shared part functions
+            use_parts = bool(shared) and placement_mode == 'display' and not level
+            used_parts = used_parts or use_parts
+
+            # Display variants spawn merged blocks, diffed against the previous
+            # deploy's merged blocks when it merged them the same way
+            source_count = len(variant_blocks)
+            merging = self.merge_displays and placement_mode == 'display'
+            if merging and not use_parts:
+                if level not in merged:
+                    merged_blocks = merge_display_blocks(variant_blocks, self.max_stretch)
+                    merged_diff = variant_diff
+                    if variant_previous is not None and previous_merge == merge:
+                        merged_diff = diff_models(merge_display_blocks(variant_previous, self.max_stretch), merged_blocks)
+                    merged[level] = (merged_blocks, merged_diff)
+                variant_blocks, variant_diff = merged[level]
+
+            # Cells of placement_blocks, merged into fill commands once all are known
+            cells = {}
+            model_tag = self.model_tag(model_id, variant_suffix)
+            function_filename = f'{model_id}{variant_suffix}.mcfunction'
+            function_file = self.function_file(
+                f'{model_id}{variant_suffix}', self.function_header(model_name, variant, prompt), model_tag
+            )
+
+            with function_file:
+                if use_parts:
+                    def commands(part_blocks):
+                        if merging:
+                            part_blocks = merge_display_blocks(part_blocks, self.max_stretch)
+                        return self.block_commands(
+                            part_blocks, scale_multiplier, rotation_offset, placement_mode,
+                            tags=[model_tag], block_tags=self.block_tags(part_blocks),
+                        )[0]
+
+                    function_file.write_lines(commands(model.blocks))
+                    for index in inline:
+                        function_file.write_lines(commands(model.instance_blocks(index)))
+                    for part_number, (name, offsets) in enumerate(shared.items()):
+                        part_function = f'{model_id}{variant_suffix}_part_{part_number}'
+                        # Every placement of the part spawns on its own anchor
+                        part_file = self.function_file(
+                            part_function, [f"# {model_name} {variant} part: {name}", ""],
+                            f"{model_tag}_part_{part_number}", restart=False,
+                        )
+                        with part_file:
+                            part_file.write_lines(commands(model.parts[name]))
+                        written.extend(part_file.files)
+                        function_file.write_lines(
+                            f"execute positioned ~{format_number(x * scale_multiplier)} "
+                            f"~{format_number(y * scale_multiplier)} ~{format_number(z * scale_multiplier)} "
+                            f"run function {self.namespace}:{part_function}"
+                            for x, y, z in offsets
+                        )
+                else:
+                    if id(variant_blocks) not in prepared:
+                        prepared[id(variant_blocks)] = PreparedBlocks(variant_blocks)
+                    columns = prepared[id(variant_blocks)]
+                    if placement_mode == 'blocks':
+                        cells.update(self.block_cells(columns, scale_multiplier))
+                        commands = self.fill_commands(cells)
+                        function_file.write_lines(commands)
+                    else:
+                        for start in range(0, len(columns), WRITE_CHUNK_BLOCKS):
+                            chunk = columns[start:start + WRITE_CHUNK_BLOCKS]
+                            commands, _ = self.block_commands(
+                                chunk, scale_multiplier, rotation_offset, placement_mode,
+                                tags=[model_tag], block_tags=chunk.block_tags,
+                            )
+                            function_file.write_lines(commands)
+            written.extend(function_file.files)
+
+            if placement_mode == 'blocks':
+                print(f"  ✓ Generated function: {function_filename} ({len(cells)} unique positions from {len(variant_blocks)} source blocks, {len(commands)} commands)")
+            elif use_parts:
+                placements = sum(len(offsets) for offsets in shared.values())
+                print(f"  ✓ Generated function: {function_filename} ({len(shared)} shared parts, {placements} placements)")
+            elif merging:
+                fewer = 100 * (1 - len(variant_blocks) / source_count) if source_count else 0
+                print(f"  ✓ Generated function: {function_filename} ({len(variant_blocks)} displays from {source_count} blocks, {fewer:.0f}% fewer entities)")
+            else:
+                print(f"  ✓ Generated function: {function_filename}")
+            if len(function_file.files) > 1:
+                print(f"  ✓ Spread over {function_file.ticks} ticks ({self.tick_budget} commands per tick)")
+
+            if variant_diff is not None:
+                upgrade_filename = f'{model_id}{variant_suffix}_upgrade.mcfunction'
+                # Entity tags of a deploy that used part functions, or merged
+                # blocks differently, can't be matched block by block
+                remerged = placement_mode == 'display' and previous_merge != merge
+                if use_parts or (previous_instanced and placement_mode == 'display' and not level) or remerged:
+                    reason = "Display merging changed" if remerged and not use_parts else "Shared part functions"
+                    upgrade_header = self.upgrade_header(model_name, variant, f"{reason}: respawning the whole model")
+                    upgrade_lines = self.respawn_lines(
+                        previous, model_tag, f'{model_id}{variant_suffix}', scale_multiplier,
+                    )
+                else:
+                    upgrade_header = self.upgrade_header(
+                        model_name, variant,
+                        f"+{len(variant_diff['added'])} added, -{len(variant_diff['removed'])} removed, "
+                        f"~{len(variant_diff['changed'])} changed",
+                    )
+                    upgrade_lines = self.upgrade_lines(
+                        variant_diff, model_tag, scale_multiplier, rotation_offset, placement_mode
+                    )
+                upgrade_file = self.function_file(
+                    f'{model_id}{variant_suffix}_upgrade', upgrade_header, f"{model_tag}_upgrade"
+                )
+                with upgrade_file:
+                    upgrade_file.write_lines(upgrade_lines)
+                written.extend(upgrade_file.files)
+                print(f"  ✓ Generated upgrade: {upgrade_filename} (+{len(variant_diff['added'])} -{len(variant_diff['removed'])} ~{len(variant_diff['changed'])})")
+
+        self.save_snapshot(model_id, blocks, instanced=used_parts, merge=merge)
+        return written
+
+    def generate_models(self, jobs, max_workers=None):
+        """
+        Generate several models, spread over a process pool for big projects
+
+        Each model's printed output is replayed in job order, so the log reads
+        the same as one generate_model_functions() call after another.
+
+        Args:
+            jobs: (model_id, model_name, prompt, blocks, variants) tuples
+            max_workers: Pool size (default: one per CPU), 1 runs everything
+                         in this process
+
+        Returns:
+            [(written file names, None) or (None, exception)] in job order
+        """
+        pooled = [
+            index for index, job in enumerate(jobs)
+            if isinstance(job[3], (list, InstancedModel))  # Streams can't be sent to another process
+        ]
+        total_blocks = sum(len(jobs[index][3]) for index in pooled)
+        workers = min(max_workers or os.cpu_count() or 1, len(pooled))
+        # Models that share an ID share a snapshot, so they must run one after another
+        if workers < 2 or total_blocks < PARALLEL_MIN_BLOCKS or len({jobs[i][0] for i in pooled}) < len(pooled):
+            pooled = []
+
+        results = []
+        with contextlib.ExitStack() as stack:
+            futures = {}
+            if pooled:
+                executor = stack.enter_context(ProcessPoolExecutor(workers, mp_context=_pool_context()))
+                settings = (
+                    self.build_path, self.namespace, self.snapshot_path,
+                    self.merge_displays, self.max_stretch, self.tick_budget,
+                )
+                futures = {index: executor.submit(_generate_job, settings, jobs[index]) for index in pooled}
+
+            for index, job in enumerate(jobs):
+                try:
+                    if index in futures:
+                        written, output = futures[index].result()
+                        print(output, end='')
+                    else:
+                        written = self.generate_model_functions(*job)
+                    results.append((written, None))
+                except Exception as e:
+                    results.append((None, e))
+        return results
+
+    def stream_model_functions(self, model_id, model_name, prompt, blocks, variants):
+        """
+        Write the function for each variant of a model in one pass over a
+        stream of blocks (e.g. iter_json_array(blocks_json))
+
+        Every variant's file is written chunk by chunk, and so is the
+        snapshot, so memory use does not grow with the model. Upgrades, LODs
+        and merged display blocks need the whole model at once: no upgrade
+        function is written (the next deploy can diff against this one),
+        lod_N variants are skipped and display blocks are spawned one by one.
+
+        Returns:
+            List of written function file names
+        """
+        os.makedirs(self.snapshot_path, exist_ok=True)
+        snapshot_file = self._snapshot_file(model_id)
+        # Written under a temporary name, so a failed stream keeps the last good snapshot
+        partial = f'{snapshot_file}.{os.getpid()}.tmp'
+        outputs = []
+        count = 0
+        try:
+            with contextlib.ExitStack() as stack:
+                for variant in variants or ['base']:
+                    if self.lod_level(variant):
+                        print(f"  ⚠ Skipping variant {variant} of {model_name}: streamed models have no LODs")
+                        continue
+                    scale_multiplier, rotation_offset, placement_mode, variant_suffix = self.parse_variant(variant)
+                    function_filename = f'{model_id}{variant_suffix}.mcfunction'
+                    model_tag = self.model_tag(model_id, variant_suffix)
+                    function_file = stack.enter_context(self.function_file(
+                        f'{model_id}{variant_suffix}', self.function_header(model_name, variant, prompt), model_tag,
+                    ))
+                    outputs.append((
+                        function_filename, function_file, model_tag, scale_multiplier, rotation_offset, placement_mode,
+                    ))
+                print(f"  Streaming functions for: {model_name} ({', '.join(name for name, *_ in outputs)})")
+
+                snapshot = stack.enter_context(open(partial, 'w', buffering=WRITE_BUFFER_BYTES))
+                snapshot.write('[')
+                blocks = iter(blocks)
+                while True:
+                    chunk = list(itertools.islice(blocks, WRITE_CHUNK_BLOCKS))
+                    if not chunk:
+                        break
+                    columns = PreparedBlocks(chunk)
+                    for _, function_file, model_tag, scale_multiplier, rotation_offset, placement_mode in outputs:
+                        if placement_mode == 'blocks':
+                            # Merged per chunk; later chunks still overwrite earlier cells in order
+                            commands = self.fill_commands(dict(self.block_cells(columns, scale_multiplier)))
+                        else:
+                            commands, _ = self.block_commands(
+                                columns, scale_multiplier, rotation_offset, placement_mode,
+                                tags=[model_tag], block_tags=columns.block_tags,
+                            )
+                        function_file.write_lines(commands)
+                    if count:
+                        snapshot.write(',')
+                    snapshot.write(','.join(_COMPACT_JSON(block) for block in chunk))
+                    count += len(chunk)
+                snapshot.write(']')
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        os.replace(partial, snapshot_file)
+
+        for function_filename, function_file, *_ in outputs:
+            print(f"  ✓ Generated function: {function_filename} ({count} blocks, streamed)")
+            if len(function_file.files) > 1:
+                print(f"  ✓ Spread over {function_file.ticks} ticks ({self.tick_budget} commands per tick)")
+        return [name for _, function_file, *_ in outputs for name in function_file.files]
+
+    @staticmethod
+    def reach(blocks, scale_multiplier):
+        """Distance from the spawn point that covers every block, for entity selectors"""
+        reach = 1.0
+        for block in blocks:
+            size = max(block.get('scale') or [1.0])
+            distance = math.sqrt(block.get('x', 0) ** 2 + block.get('y', 0) ** 2 + block.get('z', 0) ** 2)
+            reach = max(reach, (distance + size) * scale_multiplier + 1.0)
+        return math.ceil(reach)
+
+    def upgrade_header(self, model_name, variant, summary):
+        return [
+            f"# {model_name} {variant} upgrade",
+            f"# Generated by BlockCraft AI",
+            f"# {summary}",
+            "",
+        ]
+
+    def respawn_lines(self, previous, model_tag, function_name, scale_multiplier):
+        """Upgrade commands that kill the whole deployed variant and run its function again"""
+        return [
+            f"kill @e[type=minecraft:block_display,tag={model_tag},distance=..{self.reach(previous, scale_multiplier)}]",
+            f"function {self.namespace}:{function_name}",
+        ]
+
+    def upgrade_lines(self, diff, model_tag, scale_multiplier, rotation_offset, placement_mode):
+        """
+        Commands that turn the previously deployed model into the current one
+
+        Run it at the same spot as the original function. Changed blocks are
+        replaced (kill + summon); identical duplicates of a removed block are
+        summoned again since they share its tag.
+        """
+        removed = diff['removed'] + [old for old, _ in diff['changed']]
+        placed = diff['added'] + [new for _, new in diff['changed']]
+
+        lines = []
+
+        if placement_mode == 'blocks':
+            def positions(blocks):
+                return self.block_commands(blocks, scale_multiplier, rotation_offset, placement_mode)[1]
+
+            old_positions = set(positions(removed))
+            kept_positions = set(positions([new for _, new in diff['unchanged']]))
+            new_cells = dict(self.block_cells(placed, scale_multiplier))
+            cells = dict.fromkeys(old_positions - kept_positions - new_cells.keys(), "minecraft:air")
+            cells.update(new_cells)
+            lines.extend(self.fill_commands(cells))
+            return lines
+
+        # Only look for entities within the model's reach
+        reach = self.reach(removed, scale_multiplier)
+
+        killed = set()
+        for tag in self.block_tags(removed):
+            if tag not in killed:
+                killed.add(tag)
+                lines.append(f"kill @e[type=minecraft:block_display,tag={model_tag},tag={tag},distance=..{reach}]")
+
+        unchanged = [old for old, _ in diff['unchanged']]
+        resummon = [old for old, tag in zip(unchanged, self.block_tags(unchanged)) if tag in killed]
+        spawned = placed + resummon
+        lines.extend(self.block_commands(
+            spawned, scale_multiplier, rotation_offset, placement_mode,
+            tags=[model_tag], block_tags=self.block_tags(spawned),
+        )[0])
+        return lines
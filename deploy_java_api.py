@@ -12,12 +12,19 @@ import subprocess
 import shutil
 import base64
 import hashlib
+import itertools
 import socket
+import struct
+import zlib
 from io import BytesIO
 from PIL import Image
 from texture_generator import TextureGenerator
 from resource_pack_generator import ResourcePackGenerator
 from recipe_generator import RecipeGenerator
+from block_display_generator import BlockDisplayGenerator, DEFAULT_MAX_STRETCH
+from voxel_shape_library import (
+    InstancedModel, decode_binary_model, instanced_model_from_dict, is_instanced_model, iter_json_array,
+)
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -31,6 +38,8 @@ CORS(app, resources={
 # Paths
 TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), 'mod-template')
 BUILD_PATH = '/tmp/blockcraft-build'
+MODEL_SNAPSHOT_PATH = '/tmp/blockcraft-models'  # Last deployed block list per model, for upgrade functions
+STREAM_BLOCKS_JSON_CHARS = 16 * 1024 * 1024  # Larger blocks_json (roughly 150k+ blocks) is streamed, never fully parsed
 MINECRAFT_MODS_PATH = '/home/jordan/minecraft-fabric-1.21.1-cobblemon/mods'
 MINECRAFT_DIR = '/home/jordan/minecraft-fabric-1.21.1-cobblemon'
 RESOURCEPACKS_HTTP_DIR = os.path.join(MINECRAFT_DIR, 'resourcepacks')
@@ -574,27 +583,58 @@ public class {mob_renderer} extends EntityRenderer<{mob_class}> {{
 
         # Generate block_display model functions
         block_display_models = data.get('blockDisplayModels', [])
-        model_variants = data.get('modelVariants', {})  # { "model_123": ["scale_2", "scale_10"] }
+        model_variants = data.get('modelVariants', {})  # { "model_123": ["scale_2", "scale_10", "lod_2"] }
         model_errors = []  # Track errors for user feedback
 
         if block_display_models and len(block_display_models) > 0:
             print(f"🎨 Generating {len(block_display_models)} block display model functions...")
             print(f"   DEBUG: Model variants: {model_variants}")
 
+            # Optional per-tick command budget, so large models spawn over several ticks
+            # (unset, 0 or negative spawns each model in one tick)
+            spawn_tick_budget = max(0, int(data.get('spawnTickBudget') or 0)) or None
+
+            # Merge runs of identical display blocks, stretching textured ones
+            # by at most maxStretch (null: no limit, flat colors always unlimited)
+            merge_displays = bool(data.get('mergeDisplays', True))
+            max_stretch = data.get('maxStretch', DEFAULT_MAX_STRETCH)
+            if max_stretch is not None:
+                max_stretch = max(1.0, float(max_stretch))
+
             # Create datapack directory structure
-            datapack_dir = os.path.join(BUILD_PATH, 'src/main/resources/data', item_namespace, 'function')
-            os.makedirs(datapack_dir, exist_ok=True)
+            display_gen = BlockDisplayGenerator(
+                BUILD_PATH, item_namespace, MODEL_SNAPSHOT_PATH, merge_displays=merge_displays,
+                max_stretch=max_stretch, tick_budget=spawn_tick_budget
+            )
+            display_gen.create_function_directory()
 
+            model_jobs = []
             for model in block_display_models:
                 model_id = model.get('model_id', 'unknown')
                 model_name = model.get('name', 'AI Model')
                 blocks_json = model.get('blocks_json', '[]')
+                blocks_binary = model.get('blocks_binary')  # base64 of the compact binary format
 
-                # Parse blocks from JSON string
+                # Parse blocks from the binary model or the JSON string
                 try:
-                    blocks = json.loads(blocks_json) if isinstance(blocks_json, str) else blocks_json
-                except json.JSONDecodeError:
-                    error_msg = f"Failed to parse blocks_json for {model_name}"
+                    # Instanced models stay instanced so shared parts become functions
+                    if blocks_binary:
+                        blocks = decode_binary_model(base64.b64decode(blocks_binary))
+                        if not isinstance(blocks, InstancedModel):
+                            blocks = blocks.to_blocks()
+                    elif (isinstance(blocks_json, str) and len(blocks_json) > STREAM_BLOCKS_JSON_CHARS
+                          and blocks_json.lstrip().startswith('[')):
+                        # Very large models go from the JSON text to the function files in chunks
+                        stream = iter_json_array(blocks_json)
+                        first = next(stream, None)
+                        blocks = itertools.chain([first], stream) if first is not None else []
+                    else:
+                        blocks = json.loads(blocks_json) if isinstance(blocks_json, str) else blocks_json
+                        if is_instanced_model(blocks):
+                            blocks = instanced_model_from_dict(blocks)
+                except (json.JSONDecodeError, KeyError, ValueError, struct.error, zlib.error):
+                    source = 'blocks_binary' if blocks_binary else 'blocks_json'
+                    error_msg = f"Failed to parse {source} for {model_name}"
                     print(f"  ⚠ {error_msg}")
                     model_errors.append(error_msg)
                     continue
@@ -607,163 +647,17 @@ public class {mob_renderer} extends EntityRenderer<{mob_class}> {{
 
                 # Get variants for this model (e.g., ["scale_2", "scale_10"])
                 variants = model_variants.get(model_id, [])
+                model_jobs.append((model_id, model_name, model.get('prompt', 'N/A'), blocks, variants))
 
-                # If no variants specified, generate base version
-                if not variants:
-                    variants = ['base']
-
-                for variant in variants:
-                    # Parse variant to get scale/rotation multiplier and placement mode
-                    scale_multiplier = 1.0
-                    rotation_offset = 0.0
-                    placement_mode = 'display'  # Default to display entities
-                    variant_suffix = ""
-
-                    # Extract placement mode from THIS variant (if it's a placement variant)
-                    if variant.startswith('placement_'):
-                        placement_mode = variant.split('_')[1]  # Extract 'blocks' or 'display'
-                        # Add placement mode to filename suffix so they don't overwrite each other
-                        if placement_mode == 'blocks':
-                            variant_suffix = "_blocks"
-
-                    if variant != 'base' and not variant.startswith('placement_'):
-                        parts = variant.split('_')
-                        if len(parts) >= 2:
-                            variant_type = parts[0]
-                            variant_value = float(parts[1])
-                            if variant_type == 'scale':
-                                scale_multiplier = variant_value
-                                # Format as int if whole number to match JavaScript
-                                if variant_value == int(variant_value):
-                                    variant_suffix = f"_scale_{int(variant_value)}"
-                                else:
-                                    variant_suffix = f"_scale_{variant_value}".replace('.', '_')
-                            elif variant_type == 'rotation':
-                                rotation_offset = variant_value
-                                if variant_value == int(variant_value):
-                                    variant_suffix = f"_rotation_{int(variant_value)}"
-                                else:
-                                    variant_suffix = f"_rotation_{variant_value}".replace('.', '_')
-
-                    print(f"  Generating function for: {model_name} ({len(blocks)} blocks) - variant: {variant} (scale={scale_multiplier}, mode={placement_mode})")
-
-                    # Create mcfunction file
-                    function_lines = [
-                        f"# {model_name} {variant}",
-                        f"# Generated by BlockCraft AI",
-                        f"# Prompt: {model.get('prompt', 'N/A')}",
-                        "",
-                    ]
-
-                    # Track unique positions to verify all blocks are placed
-                    unique_positions = set()
-
-                    for block_entity in blocks:
-                        block_type = block_entity.get('block', 'minecraft:stone')
-                        x = block_entity.get('x', 0) * scale_multiplier
-                        y = block_entity.get('y', 0) * scale_multiplier
-                        z = block_entity.get('z', 0) * scale_multiplier
-                        properties = block_entity.get('properties', {})
-                        brightness = block_entity.get('brightness', {})
-                        scale = block_entity.get('scale', None)
-                        rotation = block_entity.get('rotation', None)
-
-                        # For real blocks mode, scale up coordinates to preserve detail
-                        # Use the actual scale from the block to determine upscale factor
-                        if placement_mode == 'blocks':
-                            # Get the scale value (usually 0.22 for AI models)
-                            block_scale = scale[0] if scale else 0.22  # Default to 0.22 if no scale
-                            upscale_factor = 1.0 / block_scale
-                            x *= upscale_factor
-                            y *= upscale_factor
-                            z *= upscale_factor
-
-                        # Add Y offset to match Three.js rendering (blocks pivot at center in Three.js, bottom in Minecraft)
-                        if scale:
-                            sy = scale[1]  # Get Y scale
-                            y += (sy * scale_multiplier) / 2
-
-                        # Build block_state NBT
-                        props_nbt = ""
-                        if properties:
-                            props_list = [f'{k}:"{v}"' for k, v in properties.items()]
-                            props_nbt = f",Properties:{{{','.join(props_list)}}}"
-
-                        # Build transformation NBT - MUST include all components for Minecraft to apply it
-                        # Default identity transformation
-                        sx, sy, sz = (1.0, 1.0, 1.0)
-                        if scale:
-                            sx, sy, sz = scale
-                            # Apply scale multiplier to each block's scale
-                            sx *= scale_multiplier
-                            sy *= scale_multiplier
-                            sz *= scale_multiplier
-
-                        # Rotation (quaternion format [x, y, z, w])
-                        left_rot = "[0f,0f,0f,1f]"  # Identity quaternion (no rotation)
-                        if rotation:
-                            pitch, yaw, roll = rotation
-                            # Convert degrees to quaternion (simplified - just use left_rotation for yaw)
-                            import math
-                            yaw_rad = math.radians(yaw + rotation_offset)
-                            left_rot = f"[0f,{math.sin(yaw_rad/2)}f,0f,{math.cos(yaw_rad/2)}f]"
-
-                        # Complete transformation with all required components
-                        transform_nbt = (
-                            f",transformation:{{"
-                            f"translation:[0f,0f,0f],"
-                            f"left_rotation:{left_rot},"
-                            f"scale:[{sx}f,{sy}f,{sz}f],"
-                            f"right_rotation:[0f,0f,0f,1f]"
-                            f"}}"
-                        )
-
-                        # Generate command based on placement mode
-                        if placement_mode == 'blocks':
-                            # Real blocks mode - use setblock command
-                            # Round coordinates to integers for block placement
-                            bx = int(round(x))
-                            by = int(round(y))
-                            bz = int(round(z))
-
-                            # Track unique positions
-                            unique_positions.add((bx, by, bz))
-
-                            # Build properties string for setblock
-                            props_str = ""
-                            if properties:
-                                props_list = [f'{k}={v}' for k, v in properties.items()]
-                                props_str = f"[{','.join(props_list)}]"
-
-                            setblock_cmd = f"setblock ~{bx} ~{by} ~{bz} {block_type}{props_str}"
-                            function_lines.append(setblock_cmd)
-                        else:
-                            # Display entities mode - use summon block_display command
-                            # Build brightness NBT
-                            brightness_nbt = ""
-                            if brightness:
-                                sky = brightness.get('sky', 15)
-                                block_light = brightness.get('block', 0)
-                                brightness_nbt = f",brightness:{{sky:{sky},block:{block_light}}}"
-
-                            # Generate summon command
-                            summon_cmd = (
-                                f"summon minecraft:block_display ~{x} ~{y} ~{z} "
-                                f"{{block_state:{{Name:\"{block_type}\"{props_nbt}}}"
-                                f"{brightness_nbt}{transform_nbt}}}"
-                            )
-                            function_lines.append(summon_cmd)
-
-                    # Write function file with variant suffix
-                    function_filename = f'{model_id}{variant_suffix}.mcfunction'
-                    function_file_path = os.path.join(datapack_dir, function_filename)
-                    with open(function_file_path, 'w') as f:
-                        f.write('\n'.join(function_lines))
-
-                    if placement_mode == 'blocks':
-                        print(f"  ✓ Generated function: {function_filename} ({len(unique_positions)} unique positions from {len(blocks)} source blocks)")
-                    else:
-                        print(f"  ✓ Generated function: {function_filename}")
+            # Big projects are generated across a process pool, one model per task
+            for (_, model_name, _, _, _), (_, error) in zip(model_jobs, display_gen.generate_models(model_jobs)):
+                if isinstance(error, json.JSONDecodeError):
+                    # Streamed blocks_json is only parsed while the functions are written
+                    error_msg = f"Failed to parse blocks_json for {model_name}: {error}"
+                    print(f"  ⚠ {error_msg}")
+                    model_errors.append(error_msg)
+                elif error is not None:
+                    raise error
 
             print(f"  ✓ All block display functions generated")
 
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Voxelize OBJ/STL triangle meshes into block display models
+
+The result uses the same block list format as voxel_shape_library, so it can
+be passed to deploy_java_mod as blocks_json (or encoded with
+encode_binary_model).
+
+Usage:
+    python3 mesh_voxelizer.py model.obj --scale 0.2 --size 4 --fill -o blocks.json
+"""
+
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+
+from block_color_index import default_index
+from voxel_shape_library import block_name, encode_binary_model, nearest_block_color
+
+DEFAULT_COLOR = (207, 213, 214)
+_BVH_LEAF_SIZE = 8
+
+class Mesh:
+    """Triangle mesh with an optional (r, g, b) color per face"""
+
+    def __init__(self, vertices, faces, face_colors=None):
+        """
+        Args:
+            vertices: List of (x, y, z) tuples
+            faces: List of (i, j, k) vertex index tuples
+            face_colors: List of (r, g, b) tuples (0-255) or None per face
+        """
+        self.vertices = vertices
+        self.faces = faces
+        self.face_colors = face_colors if face_colors is not None else [None] * len(faces)
+
+    def __len__(self):
+        return len(self.faces)
+
+    def bounds(self):
+        xs, ys, zs = zip(*self.vertices)
+        return (min(xs), min(ys), min(zs)), (max(xs), max(ys), max(zs))
+
+def _read_mtl(path):
+    """Diffuse (Kd) colors from an OBJ material library, as 0-255 tuples"""
+    colors = {}
+    current = None
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                if parts[0] == "newmtl" and len(parts) > 1:
+                    current = " ".join(parts[1:])
+                elif parts[0] == "Kd" and current is not None and len(parts) >= 4:
+                    colors[current] = tuple(max(0, min(255, round(float(v) * 255))) for v in parts[1:4])
+    except OSError:
+        pass
+    return colors
+
+def load_obj(path):
+    """
+    Load a Wavefront OBJ file
+
+    Polygons are triangulated as fans. Face colors come from the material's
+    Kd color (usemtl + mtllib) or from per-vertex colors ("v x y z r g b").
+    """
+    vertices = []
+    vertex_colors = []
+    faces = []
+    face_colors = []
+    materials = {}
+    material_color = None
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            kind = parts[0]
+            if kind == "v":
+                vertices.append((float(parts[1]), float(parts[2]), float(parts[3])))
+                if len(parts) >= 7:
+                    rgb = [float(v) for v in parts[4:7]]
+                    if max(rgb) <= 1.0:
+                        rgb = [v * 255 for v in rgb]
+                    vertex_colors.append(tuple(max(0, min(255, round(v))) for v in rgb))
+                else:
+                    vertex_colors.append(None)
+            elif kind == "f":
+                indices = []
+                for ref in parts[1:]:
+                    index = int(ref.split("/")[0])
+                    indices.append(index - 1 if index > 0 else len(vertices) + index)
+                for n in range(1, len(indices) - 1):
+                    face = (indices[0], indices[n], indices[n + 1])
+                    faces.append(face)
+                    color = material_color
+                    if color is None:
+                        corner_colors = [vertex_colors[i] for i in face if vertex_colors[i] is not None]
+                        if corner_colors:
+                            color = tuple(round(sum(c[axis] for c in corner_colors) / len(corner_colors)) for axis in range(3))
+                    face_colors.append(color)
+            elif kind == "mtllib":
+                materials.update(_read_mtl(os.path.join(base_dir, " ".join(parts[1:]))))
+            elif kind == "usemtl":
+                material_color = materials.get(" ".join(parts[1:]))
+
+    return Mesh(vertices, faces, face_colors)
+
+def load_stl(path):
+    """
+    Load an ASCII or binary STL file
+
+    Binary files may carry 15-bit face colors in the attribute word, in
+    either the VisCAM/SolidView or the Materialise Magics convention.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    vertices = []
+    faces = []
+    face_colors = []
+
+    is_binary = len(data) >= 84 and len(data) == 84 + 50 * struct.unpack_from("<I", data, 80)[0]
+    if is_binary:
+        (count,) = struct.unpack_from("<I", data, 80)
+        # Materialise Magics marks its files with COLOR= in the header and stores
+        # RGB with bit 15 clear; VisCAM/SolidView store BGR with bit 15 set
+        magics = b"COLOR=" in data[:80]
+        valid_bit = 0 if magics else 0x8000
+        for n in range(count):
+            values = struct.unpack_from("<12fH", data, 84 + 50 * n)
+            base = len(vertices)
+            vertices.extend((values[3:6], values[6:9], values[9:12]))
+            faces.append((base, base + 1, base + 2))
+            attribute = values[12]
+            if attribute & 0x8000 == valid_bit:
+                low, middle, high = (attribute & 0x1F, (attribute >> 5) & 0x1F, (attribute >> 10) & 0x1F)
+                rgb = (low, middle, high) if magics else (high, middle, low)
+                face_colors.append(tuple(v * 255 // 31 for v in rgb))
+            else:
+                face_colors.append(None)
+    else:
+        corners = []
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            parts = line.split()
+            if parts and parts[0] == "vertex":
+                corners.append(len(vertices))
+                vertices.append((float(parts[1]), float(parts[2]), float(parts[3])))
+            elif parts and parts[0] == "endloop":
+                for n in range(1, len(corners) - 1):
+                    faces.append((corners[0], corners[n], corners[n + 1]))
+                    face_colors.append(None)
+                corners = []
+
+    return Mesh(vertices, faces, face_colors)
+
+def load_mesh(path):
+    """Load an OBJ or STL file based on its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".obj":
+        return load_obj(path)
+    if extension == ".stl":
+        return load_stl(path)
+    raise ValueError(f"Unsupported mesh format: {extension} (expected .obj or .stl)")
+
+class _BVHNode:
+    __slots__ = ("min_x", "min_z", "max_x", "max_z", "left", "right", "triangles")
+
+def _build_bvh(triangles, boxes):
+    """Bounding-volume hierarchy over the triangles' x/z footprints, for vertical ray queries"""
+    node = _BVHNode()
+    node.min_x = min(boxes[t][0] for t in triangles)
+    node.min_z = min(boxes[t][1] for t in triangles)
+    node.max_x = max(boxes[t][2] for t in triangles)
+    node.max_z = max(boxes[t][3] for t in triangles)
+    node.left = node.right = None
+    node.triangles = None
+
+    if len(triangles) <= _BVH_LEAF_SIZE:
+        node.triangles = triangles
+        return node
+
+    # Median split along the wider axis of the node
+    axis = 0 if node.max_x - node.min_x >= node.max_z - node.min_z else 1
+    triangles = sorted(triangles, key=lambda t: boxes[t][axis] + boxes[t][axis + 2])
+    middle = len(triangles) // 2
+    node.left = _build_bvh(triangles[:middle], boxes)
+    node.right = _build_bvh(triangles[middle:], boxes)
+    return node
+
+def _query_bvh(node, x, z, found):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if x < node.min_x or x > node.max_x or z < node.min_z or z > node.max_z:
+            continue
+        if node.triangles is not None:
+            found.extend(node.triangles)
+        else:
+            stack.append(node.left)
+            stack.append(node.right)
+    return found
+
+def _triangle_box_overlap(center, half, v0, v1, v2):
+    """
+    Separating-axis triangle/box test (Akenine-Moller)
+
+    Args:
+        center: Box center (x, y, z)
+        half: Half the box edge length
+        v0, v1, v2: Triangle corners
+    """
+    cx, cy, cz = center
+    ax, ay, az = v0[0] - cx, v0[1] - cy, v0[2] - cz
+    bx, by, bz = v1[0] - cx, v1[1] - cy, v1[2] - cz
+    qx, qy, qz = v2[0] - cx, v2[1] - cy, v2[2] - cz
+
+    edges = ((bx - ax, by - ay, bz - az), (qx - bx, qy - by, qz - bz), (ax - qx, ay - qy, az - qz))
+
+    # Nine cross-product axes (box axis x triangle edge)
+    for ex, ey, ez in edges:
+        fx, fy, fz = abs(ex), abs(ey), abs(ez)
+
+        # X x edge = (0, -ez, ey)
+        p0, p1, p2 = -ez * ay + ey * az, -ez * by + ey * bz, -ez * qy + ey * qz
+        radius = half * (fz + fy)
+        if min(p0, p1, p2) > radius or max(p0, p1, p2) < -radius:
+            return False
+
+        # Y x edge = (ez, 0, -ex)
+        p0, p1, p2 = ez * ax - ex * az, ez * bx - ex * bz, ez * qx - ex * qz
+        radius = half * (fz + fx)
+        if min(p0, p1, p2) > radius or max(p0, p1, p2) < -radius:
+            return False
+
+        # Z x edge = (-ey, ex, 0)
+        p0, p1, p2 = -ey * ax + ex * ay, -ey * bx + ex * by, -ey * qx + ex * qy
+        radius = half * (fy + fx)
+        if min(p0, p1, p2) > radius or max(p0, p1, p2) < -radius:
+            return False
+
+    # Box face normals are covered by the caller's bounding-box sweep
+
+    # Triangle normal
+    (e0x, e0y, e0z), (e1x, e1y, e1z), _ = edges
+    nx, ny, nz = e0y * e1z - e0z * e1y, e0z * e1x - e0x * e1z, e0x * e1y - e0y * e1x
+    distance = nx * ax + ny * ay + nz * az
+    radius = half * (abs(nx) + abs(ny) + abs(nz))
+    return abs(distance) <= radius
+
+def voxelize_mesh(mesh, scale=0.2, size=None, fill=False, block_material="concrete",
+                  default_color=DEFAULT_COLOR, palette=None):
+    """
+    Voxelize a triangle mesh into blocks
+
+    Args:
+        mesh: Mesh (see load_mesh)
+        scale: Block scale, i.e. voxel edge length
+        size: If set, uniformly resize the mesh so its largest dimension is this long
+        fill: Also fill the interior (needs a closed mesh)
+        block_material: Block material ("concrete", "wool", ...)
+        default_color: (r, g, b) used for faces without a color
+        palette: Function mapping (r, g, b) to a color name (default: nearest_block_color)
+
+    Returns:
+        List of block dictionaries, centered on x/z with the bottom at y=0
+    """
+    if not mesh.faces:
+        return []
+    palette = palette or nearest_block_color
+
+    (min_x, min_y, min_z), (max_x, max_y, max_z) = mesh.bounds()
+    factor = 1.0
+    if size:
+        largest = max(max_x - min_x, max_y - min_y, max_z - min_z)
+        factor = size / largest if largest > 0 else 1.0
+
+    # Mesh space -> voxel index space, one unit per voxel, voxel (i, j, k)
+    # centered on (i, j, k): centered on x/z, and half a voxel down on y so
+    # voxel j covers j..j+1 voxels above the mesh bottom - blocks stand on y
+    shift_x = (min_x + max_x) / 2
+    shift_z = (min_z + max_z) / 2
+    to_grid = factor / scale
+    vertices = [
+        ((x - shift_x) * to_grid, (y - min_y) * to_grid - 0.5, (z - shift_z) * to_grid)
+        for x, y, z in mesh.vertices
+    ]
+
+    colors = {}  # (i, j, k) -> face index
+    half = 0.5
+    floor = math.floor
+    for face_index, (a, b, c) in enumerate(mesh.faces):
+        v0, v1, v2 = vertices[a], vertices[b], vertices[c]
+        lo_i = floor(min(v0[0], v1[0], v2[0]) + 0.5)
+        hi_i = floor(max(v0[0], v1[0], v2[0]) + 0.5)
+        lo_j = floor(min(v0[1], v1[1], v2[1]) + 0.5)
+        hi_j = floor(max(v0[1], v1[1], v2[1]) + 0.5)
+        lo_k = floor(min(v0[2], v1[2], v2[2]) + 0.5)
+        hi_k = floor(max(v0[2], v1[2], v2[2]) + 0.5)
+
+        if lo_i == hi_i and lo_j == hi_j and lo_k == hi_k:
+            # Small triangle entirely inside one voxel: no test needed
+            colors.setdefault((lo_i, lo_j, lo_k), face_index)
+            continue
+
+        for i in range(lo_i, hi_i + 1):
+            for j in range(lo_j, hi_j + 1):
+                for k in range(lo_k, hi_k + 1):
+                    key = (i, j, k)
+                    if key in colors:
+                        continue
+                    if _triangle_box_overlap(key, half, v0, v1, v2):
+                        colors[key] = face_index
+
+    if fill:
+        _fill_interior(mesh, vertices, colors)
+
+    face_names = {}
+    blocks = []
+    for (i, j, k), face_index in sorted(colors.items(), key=lambda item: (item[0][1], item[0][0], item[0][2])):
+        name = face_names.get(face_index)
+        if name is None:
+            rgb = mesh.face_colors[face_index] or default_color
+            name = face_names[face_index] = block_name(palette(rgb), block_material)
+        blocks.append({
+            "block": name,
+            "x": round(i * scale, 3),
+            "y": round(j * scale, 3),
+            "z": round(k * scale, 3),
+            "scale": [scale, scale, scale],
+        })
+    return blocks
+
+def _fill_interior(mesh, vertices, colors):
+    """Fill voxels inside a closed mesh by casting a vertical ray through each column"""
+    footprints = []
+    for a, b, c in mesh.faces:
+        v0, v1, v2 = vertices[a], vertices[b], vertices[c]
+        footprints.append((
+            min(v0[0], v1[0], v2[0]), min(v0[2], v1[2], v2[2]),
+            max(v0[0], v1[0], v2[0]), max(v0[2], v1[2], v2[2]),
+        ))
+    root = _build_bvh(list(range(len(mesh.faces))), footprints)
+
+    columns = {}
+    for i, j, k in colors:
+        columns.setdefault((i, k), []).append(j)
+
+    for (i, k) in columns:
+        hits = []
+        for face_index in _query_bvh(root, i, k, []):
+            a, b, c = mesh.faces[face_index]
+            v0, v1, v2 = vertices[a], vertices[b], vertices[c]
+            # Barycentric coordinates of (i, k) in the triangle's x/z projection
+            denominator = (v1[2] - v2[2]) * (v0[0] - v2[0]) + (v2[0] - v1[0]) * (v0[2] - v2[2])
+            if abs(denominator) < 1e-12:
+                continue
+            w0 = ((v1[2] - v2[2]) * (i - v2[0]) + (v2[0] - v1[0]) * (k - v2[2])) / denominator
+            w1 = ((v2[2] - v0[2]) * (i - v2[0]) + (v0[0] - v2[0]) * (k - v2[2])) / denominator
+            w2 = 1 - w0 - w1
+            if w0 < 0 or w1 < 0 or w2 < 0:
+                continue
+            hits.append((w0 * v0[1] + w1 * v1[1] + w2 * v2[1], face_index))
+
+        hits.sort()
+        # Rays through shared edges hit both neighbours at the same height
+        unique = []
+        for y, face_index in hits:
+            if not unique or y - unique[-1][0] > 1e-9:
+                unique.append((y, face_index))
+
+        for (y_in, face_index), (y_out, _) in zip(unique[::2], unique[1::2]):
+            # Same rounding as the surface voxels, so a bottom face on a voxel boundary adds no layer below
+            for j in range(math.floor(y_in + 0.5), math.floor(y_out + 0.5) + 1):
+                colors.setdefault((i, j, k), face_index)
+
+def main():
+    parser = argparse.ArgumentParser(description="Voxelize an OBJ/STL mesh into a block display model")
+    parser.add_argument("mesh", help="Path to an .obj or .stl file")
+    parser.add_argument("--scale", type=float, default=0.2, help="Block scale (voxel size)")
+    parser.add_argument("--size", type=float, help="Resize so the largest dimension has this length")
+    parser.add_argument("--fill", action="store_true", help="Fill the interior of closed meshes")
+    parser.add_argument("--material", default="concrete", help="Block material (concrete, wool, ...)")
+    parser.add_argument("--textures", metavar="MATERIALS",
+                        help="Match colors against block textures, limited to these comma-separated "
+                             "materials (e.g. concrete,wool,planks) or 'all'")
+    parser.add_argument("--binary", action="store_true", help="Write the compact binary format instead of JSON")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    mesh = load_mesh(args.mesh)
+    block_material, palette = args.material, None
+    if args.textures:
+        materials = None if args.textures == "all" else args.textures.split(",")
+        block_material, palette = "", default_index().palette(materials)
+    blocks = voxelize_mesh(mesh, scale=args.scale, size=args.size, fill=args.fill,
+                           block_material=block_material, palette=palette)
+    print(f"Voxelized {len(mesh)} triangles into {len(blocks)} blocks", file=sys.stderr)
+
+    if args.binary:
+        data = encode_binary_model(blocks)
+        if args.output:
+            with open(args.output, "wb") as f:
+                f.write(data)
+        else:
+            sys.stdout.buffer.write(data)
+    elif args.output:
+        with open(args.output, "w") as f:
+            json.dump(blocks, f)
+    else:
+        json.dump(blocks, sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Render voxel models to small PNG thumbnails
+
+Gallery views of saved models don't need Three.js: this projects every block
+orthographically (isometric, front, side or top), draws it with the average
+color of its block texture, and encodes the result as a PNG with the standard
+library only. Thumbnails are cached on disk by a hash of the model content.
+
+Usage:
+    python3 model_thumbnail.py render blocks.json -o thumb.png --view iso --size 128
+    python3 model_thumbnail.py gallery ~/.local/share/<app>/blockcraft.db
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import struct
+import sys
+import zlib
+
+from block_color_index import BIOME_TINTS, TEXTURE_DIR
+from voxel_shape_library import BINARY_MODEL_MAGIC, BLOCK_COLORS, decode_binary_model, expand_model, read_png
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "blockcraft", "thumbnails")
+# Part of every cache key; bump it when rendering changes so old thumbnails are redrawn
+THUMBNAIL_VERSION = 1
+DEFAULT_SIZE = 128
+VIEWS = ("iso", "front", "side", "top")
+
+FALLBACK_COLOR = (128, 128, 128)
+# Brightness of the top, left and right faces in the isometric view
+FACE_SHADES = (1.0, 0.8, 0.62)
+# Axis views show a single face, so nearer blocks are drawn brighter instead
+DEPTH_SHADE_RANGE = (0.55, 1.0)
+_DEPTH_LEVELS = 8
+
+# Templates are built for block sizes and sub-pixel offsets rounded to this fraction of a pixel
+_SUBPIXEL = 4
+# Faces are grown by this many pixels so neighbouring blocks never leave gaps
+_COVERAGE_MARGIN = 0.15
+# Border around the canvas that absorbs spans reaching past the image edge
+_CANVAS_PADDING = 4
+
+_ISO_RIGHT = (1 / math.sqrt(2), 0.0, -1 / math.sqrt(2))
+_ISO_UP = (-1 / math.sqrt(6), 2 / math.sqrt(6), -1 / math.sqrt(6))
+
+_color_cache = {}
+
+def _texture_average(path, tint=None):
+    width, _, rows = read_png(path)
+    total = [0, 0, 0]
+    count = 0
+    # Animated textures are vertical strips of square frames; use the first one
+    for row in rows[:width]:
+        for r, g, b, alpha in row:
+            if alpha >= 128:
+                total[0] += r
+                total[1] += g
+                total[2] += b
+                count += 1
+    if not count:
+        return None
+    r, g, b = (value // count for value in total)
+    if tint:
+        r, g, b = r * tint[0] // 255, g * tint[1] // 255, b * tint[2] // 255
+    return r, g, b
+
+def block_color(block_id, top=False):
+    """
+    Average (r, g, b) color of a block's texture, as seen from the side or the top
+
+    Blocks without a texture fall back to the concrete color their name
+    starts with, then to gray.
+    """
+    key = (block_id, top)
+    color = _color_cache.get(key)
+    if color is not None:
+        return color
+
+    name = block_id.split(":", 1)[-1]
+    suffixes = ("_top", "_end", "", "_side") if top else ("_side", "", "_front", "_top")
+    for suffix in suffixes:
+        texture = name + suffix
+        path = os.path.join(TEXTURE_DIR, texture + ".png")
+        if not os.path.exists(path):
+            continue
+        try:
+            color = _texture_average(path, BIOME_TINTS.get(texture))
+        except (ValueError, OSError):
+            continue
+        if color is not None:
+            break
+    else:
+        for color_name in sorted(BLOCK_COLORS, key=len, reverse=True):
+            if name.startswith(color_name + "_"):
+                color = BLOCK_COLORS[color_name]
+                break
+        else:
+            color = FALLBACK_COLOR
+
+    _color_cache[key] = color
+    return color
+
+def _project(blocks, view):
+    """
+    Screen position, depth and half extents of every block that can be seen
+
+    A block is dropped when an identical box sits in front of it along the
+    view direction: both cover exactly the same pixels, so this per-ray
+    z-buffer drops the hidden blocks of grid-aligned parts (boxes,
+    cylinders, filled meshes) before anything is drawn.
+
+    Returns:
+        List of (u, v, depth, hx, hy, hz, block_id) with v pointing up and
+        larger depth nearer to the viewer
+    """
+    nearest = {}
+    get = nearest.get
+    rx, _, rz = _ISO_RIGHT
+    ux, uy, uz = _ISO_UP
+    for block in blocks:
+        x, y, z = block["x"], block["y"], block["z"]
+        sx, sy, sz = block.get("scale") or (1.0, 1.0, 1.0)
+        if view == "iso":
+            key, depth = (x - z, y - z, sx, sy, sz), x + y + z
+            item = (rx * x + rz * z, ux * x + uy * y + uz * z, depth, sx / 2, sy / 2, sz / 2, block["block"])
+        elif view == "front":
+            key, depth = (x, y, sx, sy, sz), z
+            item = (x, y, depth, sx / 2, sy / 2, sz / 2, block["block"])
+        elif view == "side":
+            key, depth = (z, y, sx, sy, sz), x
+            item = (-z, y, depth, sx / 2, sy / 2, sz / 2, block["block"])
+        else:
+            key, depth = (x, z, sx, sy, sz), y
+            item = (x, -z, depth, sx / 2, sy / 2, sz / 2, block["block"])
+        current = get(key)
+        if current is None or depth > current[2]:
+            nearest[key] = item
+    return list(nearest.values())
+
+def _screen_extents(view, hx, hy, hz):
+    """Half width and half height of a block's footprint on screen"""
+    if view == "iso":
+        return (hx + hz) * _ISO_RIGHT[0], hy * _ISO_UP[1] + (hx + hz) * -_ISO_UP[0]
+    if view == "front":
+        return hx, hy
+    if view == "side":
+        return hz, hy
+    return hx, hz
+
+def _face_polygons(view, hx, hy, hz):
+    """Screen-space polygons (v up) of the visible faces of a block centered at the origin"""
+    if view != "iso":
+        w, h = _screen_extents(view, hx, hy, hz)
+        return [[(-w, -h), (w, -h), (w, h), (-w, h)]]
+
+    def corner(x, y, z):
+        return (_ISO_RIGHT[0] * x + _ISO_RIGHT[2] * z, _ISO_UP[0] * x + _ISO_UP[1] * y + _ISO_UP[2] * z)
+
+    top = [corner(hx, hy, hz), corner(hx, hy, -hz), corner(-hx, hy, -hz), corner(-hx, hy, hz)]
+    left = [corner(-hx, -hy, hz), corner(hx, -hy, hz), corner(hx, hy, hz), corner(-hx, hy, hz)]
+    right = [corner(hx, -hy, hz), corner(hx, -hy, -hz), corner(hx, hy, -hz), corner(hx, hy, hz)]
+    return [top, left, right]
+
+def _polygon_span(polygon, py):
+    """Horizontal extent [x0, x1] of a convex polygon at height py, or None"""
+    xs = []
+    count = len(polygon)
+    for i in range(count):
+        (x0, y0), (x1, y1) = polygon[i], polygon[(i + 1) % count]
+        if y0 == y1:
+            if y0 == py:
+                xs.extend((x0, x1))
+            continue
+        if min(y0, y1) <= py <= max(y0, y1):
+            xs.append(x0 + (py - y0) * (x1 - x0) / (y1 - y0))
+    if not xs:
+        return None
+    return min(xs), max(xs)
+
+def _template(polygons, fx, fy):
+    """
+    Pixel spans covered by the face polygons of a block
+
+    The block center sits at (fx, fy) inside pixel (0, 0), in image
+    coordinates (y down). Later faces win where faces overlap.
+
+    Returns:
+        List of (dy, dx, width, face) spans
+    """
+    margin = _COVERAGE_MARGIN
+    # Flip to image coordinates and move to the block center
+    polygons = [[(fx + u, fy - v) for u, v in polygon] for polygon in polygons]
+    low = math.floor(min(y for polygon in polygons for _, y in polygon) - margin)
+    high = math.ceil(max(y for polygon in polygons for _, y in polygon) + margin)
+
+    spans = []
+    for dy in range(low, high + 1):
+        row = {}
+        for face, polygon in enumerate(polygons):
+            # Sample just inside both pixel edges, so thin faces still cover a row
+            extents = [_polygon_span(polygon, y) for y in (dy + 0.5, dy + margin, dy + 1 - margin)]
+            extents = [extent for extent in extents if extent is not None]
+            if not extents:
+                continue
+            x0 = math.floor(min(e[0] for e in extents) - margin + 0.5)
+            x1 = math.ceil(max(e[1] for e in extents) + margin - 0.5)
+            for dx in range(x0, max(x1, x0 + 1)):
+                row[dx] = face
+        # Merge neighbouring pixels of the same face into one span
+        start = previous = face = None
+        for dx in sorted(row):
+            if start is not None and dx == previous + 1 and row[dx] == face:
+                previous = dx
+                continue
+            if start is not None:
+                spans.append((dy, start, previous - start + 1, face))
+            start = previous = dx
+            face = row[dx]
+        if start is not None:
+            spans.append((dy, start, previous - start + 1, face))
+    return spans
+
+def render_thumbnail(blocks, size=DEFAULT_SIZE, view="iso", background=(0, 0, 0, 0)):
+    """
+    Rasterize a block list
+
+    Blocks are drawn far to near (painter's algorithm), each as pixel spans
+    from a template shared by every block with the same on-screen size and
+    sub-pixel offset, so the per-block work is a handful of slice copies.
+
+    Args:
+        blocks: Block dictionaries (block, x, y, z, scale)
+        size: Width and height of the square image in pixels
+        view: "iso", "front", "side" or "top"
+        background: (r, g, b, a) of empty pixels (transparent by default)
+
+    Returns:
+        (width, height, rows) where rows is a list of RGBA bytearrays
+    """
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view {view!r}, expected one of {', '.join(VIEWS)}")
+    if not blocks:
+        return size, size, [bytearray(bytes(background) * size) for _ in range(size)]
+
+    projected = _project(blocks, view)
+
+    # Fit the model into the image, keeping a pixel of margin on every side
+    footprints = {}
+    u_min = v_min = math.inf
+    u_max = v_max = -math.inf
+    for u, v, _, hx, hy, hz, _ in projected:
+        footprint = footprints.get((hx, hy, hz))
+        if footprint is None:
+            footprint = footprints[(hx, hy, hz)] = _screen_extents(view, hx, hy, hz)
+        w, h = footprint
+        if u - w < u_min:
+            u_min = u - w
+        if u + w > u_max:
+            u_max = u + w
+        if v - h < v_min:
+            v_min = v - h
+        if v + h > v_max:
+            v_max = v + h
+    span = max(u_max - u_min, v_max - v_min, 1e-6)
+    pixels = (size - 3) / span
+    offset_x = (size - (u_max - u_min) * pixels) / 2 - u_min * pixels
+    offset_y = (size - (v_max - v_min) * pixels) / 2 + v_max * pixels
+
+    projected.sort(key=lambda item: item[2])
+    depth_min, depth_max = projected[0][2], projected[-1][2]
+    depth_range = depth_max - depth_min
+
+    # Draw on a canvas with a border, so spans never need clipping
+    pad = _CANVAS_PADDING
+    stride = (size + 2 * pad) * 4
+    canvas = bytearray(bytes(background) * (size + 2 * pad) * (size + 2 * pad))
+    offset_x += pad
+    offset_y += pad
+
+    extents = {}
+    templates = {}
+    sprites = {}
+    for u, v, depth, hx, hy, hz, block_id in projected:
+        px = offset_x + u * pixels
+        py = offset_y - v * pixels
+        ix, iy = int(px), int(py)
+        dimensions = extents.get((hx, hy, hz))
+        if dimensions is None:
+            dimensions = extents[(hx, hy, hz)] = (
+                round(hx * pixels * _SUBPIXEL), round(hy * pixels * _SUBPIXEL), round(hz * pixels * _SUBPIXEL))
+        key = (dimensions, int((px - ix) * _SUBPIXEL + 0.5), int((py - iy) * _SUBPIXEL + 0.5))
+        level = 0 if view == "iso" or not depth_range else int((depth - depth_min) / depth_range * (_DEPTH_LEVELS - 1) + 0.5)
+
+        sprite = sprites.get((key, block_id, level))
+        if sprite is None:
+            template = templates.get(key)
+            if template is None:
+                polygons = _face_polygons(view, *(value / _SUBPIXEL for value in dimensions))
+                template = templates[key] = _template(polygons, key[1] / _SUBPIXEL, key[2] / _SUBPIXEL)
+            faces = _face_colors(block_id, view, level)
+            sprite = sprites[(key, block_id, level)] = [
+                (dy * stride + dx * 4, dy * stride + (dx + width) * 4, faces[face] * width)
+                for dy, dx, width, face in template
+            ]
+
+        base = iy * stride + ix * 4
+        for start, end, pixels_data in sprite:
+            canvas[base + start:base + end] = pixels_data
+
+    rows = [canvas[y * stride + pad * 4:y * stride + (pad + size) * 4] for y in range(pad, pad + size)]
+    return size, size, rows
+
+def _face_colors(block_id, view, level):
+    """RGBA pixel bytes of each visible face of a block"""
+    if view == "iso":
+        colors = [(block_color(block_id, top=True), FACE_SHADES[0]),
+                  (block_color(block_id), FACE_SHADES[1]),
+                  (block_color(block_id), FACE_SHADES[2])]
+    else:
+        shade_low, shade_high = DEPTH_SHADE_RANGE
+        shade = shade_low + (shade_high - shade_low) * level / (_DEPTH_LEVELS - 1)
+        colors = [(block_color(block_id, top=view == "top"), shade)]
+    return [bytes((min(255, int(r * shade)), min(255, int(g * shade)), min(255, int(b * shade)), 255))
+            for (r, g, b), shade in colors]
+
+def encode_png(width, height, rows):
+    """Encode RGBA rows (bytearrays of width * 4 bytes) as PNG bytes"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    raw = bytearray()
+    for row in rows:
+        raw.append(0)  # Filter type None
+        raw += row
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(bytes(raw), 6))
+            + chunk(b"IEND", b""))
+
+def model_hash(blocks):
+    """Content hash of a block list, independent of key order and whitespace"""
+    if isinstance(blocks, str):
+        blocks = json.loads(blocks)
+    canonical = json.dumps(blocks, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+def cached_thumbnail(blocks, size=DEFAULT_SIZE, view="iso", cache_dir=CACHE_DIR):
+    """
+    Path of the thumbnail of a model, rendering it only if it isn't cached yet
+
+    Args:
+        blocks: Block list or its JSON string (instanced models are expanded)
+        cache_dir: Directory holding <hash>-<view>-<size>-v<version>.png files
+
+    Returns:
+        Path to the PNG file
+    """
+    blocks = expand_model(blocks)
+    path = os.path.join(cache_dir, f"{model_hash(blocks)}-{view}-{size}-v{THUMBNAIL_VERSION}.png")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    png = encode_png(*render_thumbnail(blocks, size, view))
+    # Write under a temporary name first, so readers never see half a file
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as f:
+        f.write(png)
+    os.replace(partial, path)
+    return path
+
+def load_blocks(path):
+    """Read a block list from a JSON file or a binary model file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(BINARY_MODEL_MAGIC):
+        return decode_binary_model(data).to_blocks()
+    return expand_model(data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render voxel models to PNG thumbnails")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    render_parser = subcommands.add_parser("render", help="Render one model file")
+    render_parser.add_argument("model", help="Block list as JSON or the binary model format")
+    render_parser.add_argument("-o", "--output", required=True, help="PNG file to write")
+
+    gallery_parser = subcommands.add_parser("gallery", help="Render every model saved in the app database")
+    gallery_parser.add_argument("database", help="Path to blockcraft.db")
+    gallery_parser.add_argument("--cache-dir", default=CACHE_DIR)
+
+    for sub in (render_parser, gallery_parser):
+        sub.add_argument("--view", choices=VIEWS, default="iso")
+        sub.add_argument("--size", type=int, default=DEFAULT_SIZE, help="Image width and height in pixels")
+
+    args = parser.parse_args()
+    if args.command == "render":
+        png = encode_png(*render_thumbnail(load_blocks(args.model), args.size, args.view))
+        with open(args.output, "wb") as f:
+            f.write(png)
+        print(f"✓ Wrote {args.output}", file=sys.stderr)
+        return
+
+    connection = sqlite3.connect(args.database)
+    try:
+        for model_id, blocks_json in connection.execute("SELECT model_id, blocks_json FROM ai_models"):
+            try:
+                print(f"{model_id}\t{cached_thumbnail(blocks_json, args.size, args.view, args.cache_dir)}")
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                print(f"  ⚠ Skipping {model_id}: {e}", file=sys.stderr)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Regression checks for the voxel model pipeline
+
+Each check builds a small model, runs it through one stage of the pipeline
+and compares the result with what the stage must preserve. Uses only the
+standard library, so it runs offline.
+
+Usage:
+    python3 regression_checks.py            # run every check
+    python3 regression_checks.py lod fill   # run the checks whose name contains a word
+
+Exits with status 1 when any check fails.
+"""
+
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import traceback
+
+CHECKS = []
+
+def check(func):
+    """Register a check - it raises AssertionError (or any error) on failure"""
+    CHECKS.append(func)
+    return func
+
+@check
+def index_block_ids():
+    """Every block in the color index is a full cube from data/full_blocks.txt"""
+    from block_color_index import INDEX_PATH, default_index, load_full_blocks
+
+    full_blocks = load_full_blocks()
+    with open(INDEX_PATH) as f:
+        entries = json.load(f)["entries"]
+    unknown = sorted(entry[0] for entry in entries if entry[0].split(":", 1)[-1] not in full_blocks)
+    assert not unknown, f"blocks outside data/full_blocks.txt: {unknown}"
+
+    index = default_index()
+    for rgb in [(20, 20, 200), (255, 0, 0), (250, 250, 250), (10, 10, 10), (90, 160, 60)]:
+        block = index.nearest(rgb)
+        assert block.split(":", 1)[-1] in full_blocks, f"{rgb} -> {block}"
+
+def block_cells(blocks, unit):
+    """
+    {(i, j, k): block} of the unit cells covered by blocks
+
+    Blocks are centered on x/z and stand on y, as in the model preview.
+    """
+    cells = {}
+    for block in blocks:
+        sx, sy, sz = block.get("scale", [1.0, 1.0, 1.0])
+        low = (block["x"] - sx / 2, block["y"], block["z"] - sz / 2)
+        high = (block["x"] + sx / 2, block["y"] + sy, block["z"] + sz / 2)
+        ranges = [range(round(a / unit), round(b / unit)) for a, b in zip(low, high)]
+        for i in ranges[0]:
+            for j in ranges[1]:
+                for k in ranges[2]:
+                    cells[(i, j, k)] = block["block"]
+    return cells
+
+# A small RGBA image with blobs of equal pixels for the rectangle merging to find
+_IMAGE_PATTERN = [
+    "RR..WW",
+    "RRK.WW",
+    "RRKKW.",
+    "..KKGG",
+    "BB..GG",
+]
+_IMAGE_COLORS = {"R": (255, 0, 0), "W": (255, 255, 255), "K": (0, 0, 0), "G": (128, 128, 128), "B": (0, 0, 255)}
+
+def _test_image():
+    rows = [[_IMAGE_COLORS[c] + (255,) if c != "." else (0, 0, 0, 0) for c in line] for line in _IMAGE_PATTERN]
+    return len(rows[0]), len(rows), rows
+
+def _pixel_cells(image, vertical, heights=None):
+    """
+    Cells, in units of half a pixel, that each opaque pixel covers unmerged
+
+    A pixel is centered on x (and on z lying flat) and stands on y, one pixel
+    deep - or heights[rgb] pixels tall for a relief column.
+    """
+    width, height, rows = image
+    cells = set()
+    for py, row in enumerate(rows):
+        for px, pixel in enumerate(row):
+            if pixel[3] < 128:
+                continue
+            across = round(width - 2 - 2 * px)  # 2 * ((width - 1) / 2 - px) - 1
+            if vertical:
+                up = height - 1 - 2 * py  # 2 * ((height - 1) / 2 - py)
+                cells.update((across + a, up + b, k) for a in (0, 1) for b in (0, 1) for k in (-1, 0))
+            else:
+                down = 2 * py - height  # 2 * (py - (height - 1) / 2) - 1
+                tall = 2 * (heights[pixel[:3]] if heights else 1)
+                cells.update((across + a, j, down + b) for a in (0, 1) for b in (0, 1) for j in range(tall))
+    return cells
+
+@check
+def image_rectangles():
+    """Merged pixel art and relief blocks cover exactly the cells of their unmerged pixels"""
+    from voxel_shape_library import create_pixel_art, create_relief
+
+    scale = 0.5
+    image = _test_image()
+    pixels = sum(c != "." for line in _IMAGE_PATTERN for c in line)
+    for vertical in (True, False):
+        blocks = create_pixel_art(image, scale, vertical=vertical)
+        assert len(blocks) < pixels, "nothing was merged"
+        cells = block_cells(blocks, scale / 2)
+        assert set(cells) == _pixel_cells(image, vertical), f"pixel art (vertical={vertical}) covers other cells"
+
+    # Brightness sets the height: white 4 pixels, gray 2, the dark colors 1
+    heights = {(255, 255, 255): 4, (128, 128, 128): 2, (0, 0, 0): 1, (255, 0, 0): 1, (0, 0, 255): 1}
+    blocks = create_relief(image, scale, max_height=4 * scale, color="white")
+    assert set(block_cells(blocks, scale / 2)) == _pixel_cells(image, False, heights), \
+        "relief columns don't stand on the base"
+
+@check
+def palette_primaries():
+    """Primary colors map to the concrete of their own hue"""
+    from voxel_shape_library import nearest_block_color
+
+    for rgb, color in [((255, 0, 0), "red"), ((0, 0, 255), "blue"), ((255, 255, 0), "yellow"),
+                       ((0, 255, 0), "lime"), ((255, 255, 255), "white"), ((0, 0, 0), "black")]:
+        assert nearest_block_color(rgb) == color, f"{rgb} -> {nearest_block_color(rgb)}, not {color}"
+
+def _bounds(blocks):
+    """(low, high) corners of the box around blocks, x/z centered and y the bottom"""
+    low = [min(b["x"] - b["scale"][0] / 2 for b in blocks), min(b["y"] for b in blocks),
+           min(b["z"] - b["scale"][2] / 2 for b in blocks)]
+    high = [max(b["x"] + b["scale"][0] / 2 for b in blocks), max(b["y"] + b["scale"][1] for b in blocks),
+            max(b["z"] + b["scale"][2] / 2 for b in blocks)]
+    return [round(v, 3) for v in low], [round(v, 3) for v in high]
+
+@check
+def lod_bounds():
+    """Every LOD level of a cube fills the same box as the cube itself"""
+    from voxel_shape_library import build_lods, downsample_blocks
+
+    size = 0.25
+    for shift in (0.0, 0.1):
+        # 8x8x8 cube of quarter blocks spanning 0..2 (shifted off the origin lattice)
+        cube = [{"block": "minecraft:stone", "x": shift + size / 2 + i * size, "y": shift + j * size,
+                 "z": shift + size / 2 + k * size, "scale": [size] * 3}
+                for i in range(8) for j in range(8) for k in range(8)]
+        expected = _bounds(cube)
+        for level in range(4):
+            blocks = downsample_blocks(cube, level)
+            assert len(blocks) == 8 ** (3 - level), f"level {level}: {len(blocks)} blocks"
+            assert _bounds(blocks) == expected, f"level {level}: {_bounds(blocks)} != {expected}"
+        for level, blocks in build_lods(cube, [512, 64, 8, 1]):
+            assert _bounds(blocks) == expected, f"build_lods level {level}: {_bounds(blocks)} != {expected}"
+
+def _display_cells(blocks, unit):
+    """
+    Cells covered by block displays as deploy spawns them
+
+    A display grows from its x/z corner and is summoned half its height above
+    y, so its box starts at y + height / 2.
+    """
+    moved = [dict(b, x=b["x"] + b["scale"][0] / 2, y=b["y"] + b["scale"][1] / 2,
+                  z=b["z"] + b["scale"][2] / 2) for b in blocks]
+    return block_cells(moved, unit)
+
+@check
+def display_merging():
+    """Merged displays cover the unmerged cells, stretching only flat colors without limit"""
+    from block_display_generator import DEFAULT_MAX_STRETCH, merge_display_blocks
+
+    size = 0.5
+    for block, most in [("minecraft:stone", 1 + 12 // DEFAULT_MAX_STRETCH), ("minecraft:white_concrete", 1)]:
+        # A 12 x 3 x 2 slab, which is a 12:1 stretch merged whole
+        slab = [{"block": block, "x": i * size, "y": j * size, "z": k * size, "scale": [size] * 3}
+                for i in range(12) for j in range(3) for k in range(2)]
+        merged = merge_display_blocks(slab)
+        assert len(merged) <= most, f"{block}: {len(merged)} displays"
+        assert _display_cells(merged, size) == _display_cells(slab, size), f"{block}: merged cells differ"
+        for box in merged:
+            if block == "minecraft:stone":
+                assert max(box["scale"]) <= DEFAULT_MAX_STRETCH * min(box["scale"]), f"{block}: {box['scale']}"
+
+def _function_lines(function_dir, name):
+    path = os.path.join(function_dir, f"{name}.mcfunction")
+    with open(path) as f:
+        return [line for line in f.read().split("\n") if line and not line.startswith("#")]
+
+# Commands a TickedFunctionFile adds to its chunks to move the anchor along
+_TICK_BOOKKEEPING = re.compile(r"tag @s (add|remove) \S+|kill @s")
+
+def _ticked_commands(function_dir, name):
+    """The commands of a function as written without a tick budget, read back from its chunks"""
+    if not os.path.exists(os.path.join(function_dir, f"{name}_tick.mcfunction")):
+        return _function_lines(function_dir, name)
+    commands = []
+    tick = 0
+    while os.path.exists(os.path.join(function_dir, f"{name}_chunk_{tick}.mcfunction")):
+        commands += [line for line in _function_lines(function_dir, f"{name}_chunk_{tick}")
+                     if not _TICK_BOOKKEEPING.fullmatch(line)]
+        tick += 1
+    return commands
+
+def _fill_cells(commands):
+    """{(x, y, z): state} placed by setblock / fill commands"""
+    cells = {}
+    for command in commands:
+        words = command.split()
+        numbers = [int(word.lstrip("~")) for word in words[1:-1]]
+        low, high = numbers[:3], numbers[3:] or numbers[:3]
+        for x in range(low[0], high[0] + 1):
+            for y in range(low[1], high[1] + 1):
+                for z in range(low[2], high[2] + 1):
+                    cells[(x, y, z)] = words[-1]
+    return cells
+
+@check
+def fill_and_ticks():
+    """Fill commands place the model's cells, and ticked functions keep every command within the budget"""
+    from block_display_generator import BlockDisplayGenerator, PreparedBlocks, TickedFunctionFile
+    from voxel_shape_library import InstancedModel
+
+    try:
+        TickedFunctionFile(".", "bad", [], "ns", "anchor", 0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a budget of 0 was accepted")
+    assert BlockDisplayGenerator(".", "ns", ".", tick_budget=-5).tick_budget is None
+
+    size = 0.25
+    def cube(blocks, n):
+        # A checkerboard of two blocks, so the displays don't merge away
+        return [{"block": blocks[(i + j + k) % 2], "x": i * size, "y": j * size, "z": k * size, "scale": [size] * 3}
+                for i in range(n) for j in range(n) for k in range(n)]
+    model = InstancedModel(cube(["minecraft:stone", "minecraft:dirt"], 3))
+    model.define("post", cube(["minecraft:oak_planks", "minecraft:glass"], 2))
+    for x in (2, 4, 6):
+        model.place("post", translate=(x, 0, 0))
+    changed = InstancedModel(cube(["minecraft:stone", "minecraft:dirt"], 4))
+    changed.parts, changed.instances = model.parts, model.instances
+    variants = ["base", "placement_blocks"]
+
+    with tempfile.TemporaryDirectory() as root:
+        outputs = {}
+        for budget in (None, 7):
+            build, snapshots = os.path.join(root, f"build_{budget}"), os.path.join(root, f"snapshots_{budget}")
+            generator = BlockDisplayGenerator(build, "ns", snapshots, tick_budget=budget)
+            generator.create_function_directory()
+            with contextlib.redirect_stdout(io.StringIO()):
+                generator.generate_model_functions("model", "Model", "", model, variants)
+                written = generator.generate_model_functions("model", "Model", "", changed, variants)
+            outputs[budget] = (generator.function_dir, written)
+
+        plain_dir, plain = outputs[None]
+        ticked_dir, ticked = outputs[7]
+        names = [name[:-len(".mcfunction")] for name in plain]
+        assert any(name.endswith("_part_0") for name in names) and any(name.endswith("_upgrade") for name in names)
+        for name in ("model", "model_part_0", "model_blocks_upgrade"):
+            assert f"{name}_tick.mcfunction" in ticked, f"{name} was not spread over ticks"
+        for name in names:
+            assert _ticked_commands(ticked_dir, name) == _function_lines(plain_dir, name), f"{name} lost commands"
+
+        for name in ticked:
+            lines = _function_lines(ticked_dir, name[:-len(".mcfunction")])
+            if "_chunk_" in name:
+                commands = [line for line in lines if not _TICK_BOOKKEEPING.fullmatch(line)]
+                assert len(commands) <= 7, f"{name}: {len(commands)} commands"
+            for line in lines:
+                assert line.count("[") == line.count("]"), f"{name}: {line}"
+                for function in re.findall(r"function ns:(\S+)", line):
+                    assert f"{function}.mcfunction" in ticked, f"{name} runs missing {function}"
+
+        # placement_blocks fills exactly the cells of the source blocks
+        generator = BlockDisplayGenerator(root, "ns", root)
+        expected = dict(generator.block_cells(PreparedBlocks(list(changed)), 1.0))
+        assert _fill_cells(_function_lines(plain_dir, "model_blocks")) == expected, "fill commands place other cells"
+
+def _assert_round_trip(blocks, decoded, tolerance):
+    assert len(decoded) == len(blocks), f"{len(decoded)} blocks back from {len(blocks)}"
+    for block, back in zip(blocks, decoded):
+        assert back["block"] == block["block"] and back.get("scale") == block.get("scale"), f"{block} -> {back}"
+        for axis in "xyz":
+            assert abs(back[axis] - block[axis]) <= tolerance + 1e-9, f"{axis} of {block} came back as {back[axis]}"
+
+@check
+def binary_round_trip():
+    """Binary models decode to their blocks, or refuse to encode when positions would move"""
+    from voxel_shape_library import InstancedModel, create_cone, decode_binary_model, encode_binary_model
+
+    def row(size, step, count):
+        return [{"block": "minecraft:stone" if i % 3 else "minecraft:glass", "x": i * step, "y": i * step / 2,
+                 "z": -i * step, "scale": [size] * 3} for i in range(count)]
+
+    # Within int16 range at 0.001, positions keep the JSON precision
+    blocks = row(0.25, 0.125, 100)
+    _assert_round_trip(blocks, decode_binary_model(encode_binary_model(blocks, compression=None)).to_blocks(), 0.0005)
+
+    model = InstancedModel(row(0.25, 0.25, 5))
+    model.define("post", row(0.5, 0.5, 4))
+    model.place("post", translate=(3, 0, 1))
+    model.place("post", rotate=(0, 90, 0), translate=(-2, 1, 0))
+    decoded = decode_binary_model(encode_binary_model(model, compression="zlib"))
+    _assert_round_trip(model.to_blocks(), decoded.to_blocks(), 0.0005)
+
+    # Blocks far below 0.1 keep the plain 0.001 quantum when the model is small
+    blocks = row(0.05, 0.05, 2) + create_cone(1.0, 0.5, 0.08, "red")
+    _assert_round_trip(blocks, decode_binary_model(encode_binary_model(blocks)).to_blocks(), 0.0005)
+
+    # Large models get a coarser quantum, as long as it is fine for their smallest block
+    blocks = row(4.0, 3.0, 100)
+    _assert_round_trip(blocks, decode_binary_model(encode_binary_model(blocks)).to_blocks(), 4.0 / 200)
+    # Rounding to the coarser quantum lands on the edge of the int16 range here
+    blocks = [dict(block, x=x) for block, x in zip(row(50.0, 0, 2), (-65.533, 65.535))]
+    _assert_round_trip(blocks, decode_binary_model(encode_binary_model(blocks)).to_blocks(), 0.002)
+    try:
+        encode_binary_model(row(0.25, 3.0, 100))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a large model of small blocks was encoded with a coarse quantum")
+
+@check
+def display_rotation():
+    """Summoned displays carry the full rotation of their blocks, not just the yaw"""
+    from block_display_generator import BlockDisplayGenerator
+    from voxel_shape_library import (Transform, _euler_to_matrix3, _matrix3_multiply,
+                                     _quaternion_to_matrix3)
+
+    blocks = [{"block": "minecraft:stone", "x": i, "y": 0, "z": 0, "scale": [0.5, 1.0, 0.25]} for i in range(3)]
+    blocks = Transform().rotate(x=30, y=45, z=-20).apply(blocks)
+    assert all(block["rotation"][0] and block["rotation"][2] for block in blocks), "no pitch or roll to check"
+
+    generator = BlockDisplayGenerator(".", "ns", ".")
+    for offset in (0, 90):
+        commands, _ = generator.block_commands(blocks, 1.0, offset, "display")
+        for block, command in zip(blocks, commands):
+            quaternion = [float(v) for v in re.search(r"left_rotation:\[([^\]]*)f\]", command)[1].split("f,")]
+            expected = _matrix3_multiply(_euler_to_matrix3(0, offset, 0), _euler_to_matrix3(*block["rotation"]))
+            shown = _quaternion_to_matrix3(quaternion)
+            assert max(abs(a - b) for a, b in zip(shown, expected)) < 1e-4, f"{block['rotation']} -> {quaternion}"
+
+@check
+def budget_streaming():
+    """A generate() using unseeded random streams the model its sizing passes planned"""
+    import random
+    from voxel_shape_library import create_sphere, generate_with_budget, iter_model, stream_with_budget
+
+    def generate():
+        for _ in range(4):
+            yield create_sphere(random.uniform(0.5, 2.0), 0.1, "red")
+
+    for seed in range(5):
+        random.seed(seed)
+        out = io.StringIO()
+        report = stream_with_budget(generate, 2000, out)
+        streamed = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert report["within_budget"] and len(streamed) == report["total_blocks"], f"seed {seed}: {report}"
+
+        random.seed(seed)
+        blocks, _ = generate_with_budget(generate, 2000)
+        assert streamed == json.loads(json.dumps(blocks)), f"seed {seed}: streamed another model"
+
+    try:
+        list(iter_model([{"block": "minecraft:stone", "x": 0, "y": 0, "z": 0}, "minecraft:stone"]))
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("a block ID string was accepted as generate() output")
+
+@check
+def voxelized_bounds():
+    """Voxelized meshes stand on y=0 and end within a voxel above the mesh top"""
+    from mesh_voxelizer import Mesh, voxelize_mesh
+
+    # A closed box mesh 0.9 tall, 1.3 x 0.7 across
+    corners = [(x, y, z) for x in (0, 1.3) for y in (0, 0.9) for z in (0, 0.7)]
+    faces = [(0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5), (0, 4, 5), (0, 5, 1),
+             (2, 3, 7), (2, 7, 6), (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3)]
+    scale = 0.25
+    for fill in (False, True):
+        blocks = voxelize_mesh(Mesh(corners, faces), scale=scale, fill=fill)
+        (_, bottom, _), (_, top, _) = _bounds(blocks)
+        assert bottom == 0, f"fill={fill}: bottom at {bottom}"
+        assert 0.9 <= top < 0.9 + scale, f"fill={fill}: top at {top} for a mesh 0.9 tall"
+
+def main():
+    words = sys.argv[1:]
+    checks = [func for func in CHECKS if not words or any(word in func.__name__ for word in words)]
+    failed = 0
+    for func in checks:
+        try:
+            func()
+        except Exception:
+            failed += 1
+            print(f"❌ {func.__name__}: {func.__doc__}")
+            traceback.print_exc()
+        else:
+            print(f"✓ {func.__name__}")
+
+    print(f"\n{len(checks) - failed}/{len(checks)} checks passed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,11 @@
 use serde::{Deserialize, Serialize};
-use std::process::Command;
+use std::collections::{HashMap, HashSet};
 use std::fs;
+use std::io::{BufRead, BufReader, Write};
+use std::process::{Child, ChildStdin, Command, Stdio};
+use std::sync::mpsc::{self, Receiver, Sender};
+use std::sync::{Arc, Mutex, OnceLock};
+use std::time::Duration;
 use super::openai::BlockDisplayEntity;
 
 #[derive(Debug, Serialize, Deserialize)]
@@ -67,6 +72,210 @@ struct ResponseMessage {
     content: String,
 }
 
+/// Wall-clock and memory limits for each generation, enforced by the worker
+const WORKER_TIMEOUT_SECS: u64 = 60;
+const WORKER_MEMORY_MB: u64 = 1024;
+/// Number of generations the worker runs at the same time
+const WORKER_POOL_SIZE: usize = 2;
+
+/// Long-lived `voxel_worker.py` process shared by every generation. It keeps the
+/// voxel library loaded and takes JSON-RPC requests on stdin; a reader thread
+/// routes each output line back to the request waiting for that id.
+struct VoxelWorker {
+    child: Child,
+    stdin: ChildStdin,
+    pending: Arc<Mutex<HashMap<u64, Sender<serde_json::Value>>>>,
+    next_id: u64,
+}
+
+static VOXEL_WORKER: OnceLock<Mutex<Option<VoxelWorker>>> = OnceLock::new();
+
+impl VoxelWorker {
+    fn spawn() -> Result<VoxelWorker, String> {
+        // Private directory per app process, so separate app instances never share files
+        let dir = std::env::temp_dir().join(format!("blocklycraft-voxel-{}", std::process::id()));
+        fs::create_dir_all(&dir)
+            .map_err(|e| format!("Failed to create voxel worker directory: {}", e))?;
+        fs::write(dir.join("voxel_shape_library.py"), include_str!("../../../voxel_shape_library.py"))
+            .map_err(|e| format!("Failed to write voxel library: {}", e))?;
+        fs::write(dir.join("voxel_worker.py"), include_str!("../../../voxel_worker.py"))
+            .map_err(|e| format!("Failed to write voxel worker: {}", e))?;
+
+        let mut child = Command::new("python3")
+            .arg(dir.join("voxel_worker.py"))
+            .arg("--pool-size")
+            .arg(WORKER_POOL_SIZE.to_string())
+            .stdin(Stdio::piped())
+            .stdout(Stdio::piped())
+            .stderr(Stdio::inherit())
+            .spawn()
+            .map_err(|e| format!("Failed to start voxel worker: {}", e))?;
+
+        let stdin = child.stdin.take().ok_or("Failed to open voxel worker stdin")?;
+        let stdout = child.stdout.take().ok_or("Failed to open voxel worker stdout")?;
+        let pending: Arc<Mutex<HashMap<u64, Sender<serde_json::Value>>>> = Arc::new(Mutex::new(HashMap::new()));
+
+        let routes = Arc::clone(&pending);
+        std::thread::spawn(move || {
+            for line in BufReader::new(stdout).lines() {
+                let Ok(line) = line else { break };
+                let Ok(message) = serde_json::from_str::<serde_json::Value>(&line) else { continue };
+
+                // Block chunks carry the request id in params, final responses at the top level
+                let is_final = message.get("method").is_none();
+                let id = if is_final {
+                    message.get("id").and_then(|id| id.as_u64())
+                } else {
+                    message.pointer("/params/id").and_then(|id| id.as_u64())
+                };
+                let Some(id) = id else { continue };
+
+                let mut routes = routes.lock().unwrap();
+                if let Some(sender) = routes.get(&id) {
+                    let _ = sender.send(message);
+                }
+                if is_final {
+                    routes.remove(&id);
+                }
+            }
+            // Worker exited - dropping the senders wakes every waiting request
+            routes.lock().unwrap().clear();
+        });
+
+        Ok(VoxelWorker { child, stdin, pending, next_id: 1 })
+    }
+
+    fn is_running(&mut self) -> bool {
+        matches!(self.child.try_wait(), Ok(None))
+    }
+
+    /// Send a generate request. Also returns how many requests were already in
+    /// flight, which the worker may have to finish before it starts this one.
+    fn submit(&mut self, params: serde_json::Value) -> Result<(Receiver<serde_json::Value>, usize), String> {
+        let id = self.next_id;
+        self.next_id += 1;
+
+        let (sender, receiver) = mpsc::channel();
+        let ahead = {
+            let mut pending = self.pending.lock().unwrap();
+            let ahead = pending.len();
+            pending.insert(id, sender);
+            ahead
+        };
+
+        let request = serde_json::json!({
+            "jsonrpc": "2.0",
+            "id": id,
+            "method": "generate",
+            "params": params,
+        });
+        if let Err(e) = writeln!(self.stdin, "{}", request).and_then(|_| self.stdin.flush()) {
+            self.pending.lock().unwrap().remove(&id);
+            return Err(format!("Failed to send request to voxel worker: {}", e));
+        }
+        Ok((receiver, ahead))
+    }
+}
+
+/// Run generated `generate()` code on the voxel worker within a block budget.
+/// Blocks are parsed and deduplicated as the worker streams them.
+fn run_voxel_code(code: &str, block_budget: usize, log_tag: &str) -> Result<Vec<BlockDisplayEntity>, String> {
+    let (receiver, ahead) = {
+        let mut worker = VOXEL_WORKER
+            .get_or_init(|| Mutex::new(None))
+            .lock()
+            .map_err(|_| "Voxel worker lock poisoned".to_string())?;
+
+        // Start the worker on first use, and again if it has exited
+        if !worker.as_mut().map_or(false, |w| w.is_running()) {
+            println!("{} Starting voxel worker...", log_tag);
+            *worker = Some(VoxelWorker::spawn()?);
+        }
+
+        worker.as_mut().unwrap().submit(serde_json::json!({
+            "code": code,
+            "budget": block_budget,
+            "timeout": WORKER_TIMEOUT_SECS,
+            "memory_mb": WORKER_MEMORY_MB,
+        }))?
+    };
+
+    let mut entities: Vec<BlockDisplayEntity> = Vec::new();
+    let mut seen_positions = HashSet::new();
+    let mut total_count = 0usize;
+
+    // The worker starts its own timeout once a pool slot picks the request up.
+    // Until then it may first finish every request ahead of this one, each
+    // within its own time limit.
+    let job_limit = Duration::from_secs(WORKER_TIMEOUT_SECS + 10);
+    let queue_limit = job_limit * (ahead / WORKER_POOL_SIZE + 1) as u32;
+    let mut started = false;
+
+    loop {
+        // Only guards against a hung worker - generation timeouts come back as errors
+        let mut message = receiver
+            .recv_timeout(if started { job_limit } else { queue_limit })
+            .map_err(|_| if started {
+                "Voxel worker stopped responding".to_string()
+            } else {
+                format!("Voxel worker never started the request ({} requests ahead of it)", ahead)
+            })?;
+
+        if message.get("method").and_then(|m| m.as_str()) == Some("started") {
+            started = true;
+        } else if let Some(blocks) = message.pointer_mut("/params/blocks") {
+            let batch: Vec<BlockDisplayEntity> = serde_json::from_value(blocks.take())
+                .map_err(|e| format!("Failed to parse generated blocks JSON: {}", e))?;
+
+            for entity in batch {
+                total_count += 1;
+                // Deduplicate blocks at the same position, rounded to 3 decimal places
+                // to catch near-duplicates (fixes z-fighting/flickering)
+                let pos = (
+                    (entity.x * 1000.0).round() as i32,
+                    (entity.y * 1000.0).round() as i32,
+                    (entity.z * 1000.0).round() as i32,
+                );
+                if seen_positions.insert(pos) {
+                    entities.push(entity);
+                }
+            }
+        } else if let Some(error) = message.get("error") {
+            let text = error.get("message").and_then(|m| m.as_str()).unwrap_or("Unknown error");
+            return Err(format!("Python execution failed: {}", text));
+        } else {
+            if let Some(report) = message.pointer("/result/report") {
+                println!(
+                    "{} Block budget: {}/{} blocks (was {}, {} pass(es))",
+                    log_tag, report["total_blocks"], report["budget"], report["original_blocks"], report["passes"]
+                );
+                for call in report["primitives"].as_array().into_iter().flatten() {
+                    if call["effective_scale"] != call["scale"] {
+                        println!(
+                            "{}   {} #{}: scale {} -> {} ({} blocks)",
+                            log_tag, call["primitive"].as_str().unwrap_or("?"), call["call"], call["scale"], call["effective_scale"], call["blocks"]
+                        );
+                    }
+                }
+            }
+            break;
+        }
+    }
+
+    if entities.is_empty() {
+        return Err("AI generated empty model".to_string());
+    }
+
+    println!("{} Generated {} blocks (before deduplication)", log_tag, total_count);
+    let removed_count = total_count - entities.len();
+    if removed_count > 0 {
+        println!("{} Removed {} overlapping blocks", log_tag, removed_count);
+    }
+    println!("{} Successfully generated {} blocks", log_tag, entities.len());
+
+    Ok(entities)
+}
+
 #[tauri::command]
 pub async fn generate_block_display_model_codegen(
     api_key: String,
@@ -83,10 +292,14 @@ AVAILABLE LIBRARY FUNCTIONS WITH EXACT BLOCK COUNT FORMULAS:
    Formula: max(8, int(2 * π * radius / scale))
    Example: radius=3, scale=0.3 → max(8, int(18.85/0.3)) = 62 blocks
 
-2. create_sphere(radius, scale, color, block_material="concrete")
+2. create_sphere(radius, scale, color, block_material="concrete", distribution="rings")
    Formula: num_layers = int(2*radius / (scale*0.9))
             total ≈ num_layers * avg_circle_blocks
    Example: radius=2, scale=0.25 → ~14 layers * ~35 blocks/layer = ~490 blocks
+   distribution="uniform" spreads blocks evenly over the surface with no gaps
+   (also for create_ellipsoid, create_torus and create_tapered_shape):
+            total ≈ surface_area / (0.75 * scale²), sphere: 4*π*radius² / (0.75 * scale²)
+   Prefer it over shrinking scale to close gaps in round shells.
 
 3. create_cylinder(height, radius, scale, color, block_material="concrete", center_y=0.0)
    Formula: num_layers = int(height / (scale*0.9))
@@ -130,6 +343,26 @@ AVAILABLE LIBRARY FUNCTIONS WITH EXACT BLOCK COUNT FORMULAS:
 11. add_glow(blocks, brightness_sky=15, brightness_block=15)
     Returns: None (modifies in place, adds 0 blocks)
 
+12. create_terrain(width, depth, scale, max_height, seed=0, layers=None, center=(0,0,0), solid=False)
+    Formula: ~1-1.5 * int(width/scale) * int(depth/scale) blocks (surface only)
+    Example: width=6, depth=6, max_height=2, scale=0.3 → ~400-600 blocks
+    Hills of sand, grass, stone and snow; layers=[(0.0, "sand"), (0.5, "stone")] picks your own
+
+13. displace_blocks(blocks, amount, seed=0, frequency=1.0)
+    Returns: new list, same block count - pushes a shell in/out by noise (rough rock, bark, lumpy clouds)
+
+14. noise_materials(blocks, materials, seed=0, frequency=1.0)
+    Returns: new list, same block count - mixes materials in natural patches
+    Example: noise_materials(rock, ["stone", "cobblestone", "andesite"], seed=3)
+
+15. InstancedModel(blocks=None) - define(name, blocks), place(name, translate=(x,y,z), rotate=(pitch,yaw,roll))
+    Returns: a model you can return from generate() like a list; each part is stored once
+    Example: car = InstancedModel(body); car.define("wheel", wheel_blocks); car.place("wheel", translate=(1, 0, 1.5))
+    Use for repeated parts (wheels, windows, fence posts, lamps) - build the part around (0,0,0)
+
+NOISE: For natural texture use displace_blocks / noise_materials / create_terrain with a fixed seed.
+Never use the random module - the same code must always build the same model.
+
 CRITICAL: CALCULATE BEFORE CODING!
 Before writing any code, manually calculate:
   Total blocks = sum of all create_* calls using formulas above
@@ -383,6 +616,13 @@ Respond with ONLY a number (your estimate of total blocks)."#,
         temperature: 0.3,
     };
 
+    // Block budget per complexity level (matches the limits in the system prompt)
+    let block_budget: usize = match size.as_str() {
+        "small" => 2000,
+        "large" => 10000,
+        _ => 5000,
+    };
+
     println!("[OpenAI CodeGen] Requesting block count estimate...");
 
     let review_response = client
@@ -398,8 +638,8 @@ Respond with ONLY a number (your estimate of total blocks)."#,
         if let Ok(review_result) = review_response.json::<OpenAIResponse>().await {
             if let Some(estimate_str) = review_result.choices.get(0).map(|c| c.message.content.trim()) {
                 if let Ok(estimated_blocks) = estimate_str.parse::<usize>() {
-                    println!("[OpenAI CodeGen] AI estimates {} blocks", estimated_blocks);
-                    // Note: Not rejecting based on estimate, allowing all generations through
+                    println!("[OpenAI CodeGen] AI estimates {} blocks (budget {})", estimated_blocks, block_budget);
+                    // Not rejecting based on estimate - generate_with_budget() enforces the budget
                 }
             }
         }
@@ -420,85 +660,9 @@ Respond with ONLY a number (your estimate of total blocks)."#,
         code
     };
 
-    // Write voxel library to temp file
-    let voxel_lib = include_str!("voxel_shape_library.py");
-    let temp_lib_path = "/tmp/voxel_shape_library.py";
-    fs::write(temp_lib_path, voxel_lib)
-        .map_err(|e| format!("Failed to write voxel library: {}", e))?;
-
-    // Write generated code to temp file
-    let full_code = format!(
-        r#"#!/usr/bin/env python3
-import sys
-sys.path.insert(0, '/tmp')
-from voxel_shape_library import *
-import json
-
-{}
-
-# Execute and output JSON
-result = generate()
-print(json.dumps(result))
-"#,
-        clean_code
-    );
-
-    let temp_code_path = "/tmp/generated_voxel_code.py";
-    fs::write(temp_code_path, &full_code)
-        .map_err(|e| format!("Failed to write generated code: {}", e))?;
-
     println!("[OpenAI CodeGen] Executing generated Python code...");
 
-    // Execute Python code
-    let output = Command::new("python3")
-        .arg(temp_code_path)
-        .output()
-        .map_err(|e| format!("Failed to execute Python code: {}", e))?;
-
-    if !output.status.success() {
-        let stderr = String::from_utf8_lossy(&output.stderr);
-        return Err(format!("Python execution failed: {}", stderr));
-    }
-
-    let stdout = String::from_utf8_lossy(&output.stdout);
-    println!("[OpenAI CodeGen] Python output: {}", &stdout[..stdout.len().min(500)]);
-
-    // Parse JSON output
-    let mut entities: Vec<BlockDisplayEntity> = serde_json::from_str(&stdout)
-        .map_err(|e| format!("Failed to parse generated blocks JSON: {}. Output: {}", e, &stdout[..stdout.len().min(200)]))?;
-
-    if entities.is_empty() {
-        return Err("AI generated empty model".to_string());
-    }
-
-    println!("[OpenAI CodeGen] Generated {} blocks (before deduplication)", entities.len());
-
-    // Deduplicate blocks at exact same position (fixes z-fighting/flickering)
-    use std::collections::HashSet;
-    let mut seen_positions = HashSet::new();
-    let original_count = entities.len();
-
-    entities.retain(|entity| {
-        // Round to 3 decimal places to catch near-duplicates
-        let x = (entity.x * 1000.0).round() as i32;
-        let y = (entity.y * 1000.0).round() as i32;
-        let z = (entity.z * 1000.0).round() as i32;
-        let pos = (x, y, z);
-
-        if seen_positions.contains(&pos) {
-            false // Remove duplicate
-        } else {
-            seen_positions.insert(pos);
-            true // Keep first occurrence
-        }
-    });
-
-    let removed_count = original_count - entities.len();
-    if removed_count > 0 {
-        println!("[OpenAI CodeGen] Removed {} overlapping blocks", removed_count);
-    }
-
-    println!("[OpenAI CodeGen] Successfully generated {} blocks", entities.len());
+    let entities = run_voxel_code(clean_code, block_budget, "[OpenAI CodeGen]")?;
 
     Ok(CodegenResult {
         blocks: entities,
@@ -527,16 +691,20 @@ IMPORTANT EDITING RULES:
 
 AVAILABLE LIBRARY FUNCTIONS:
 - create_circle_layer(y, radius, scale, color, block_material="concrete")
-- create_sphere(radius, scale, color, block_material="concrete")
+- create_sphere(radius, scale, color, block_material="concrete", distribution="rings")
 - create_cylinder(height, radius, scale, color, block_material="concrete", center_y=0.0)
 - create_box(width, height, depth, scale, color, block_material="concrete", center=(0,0,0))
-- create_tapered_shape(profile, scale, color_map, block_material="concrete")
+- create_tapered_shape(profile, scale, color_map, block_material="concrete", distribution="rings")
 - create_cone(height, base_radius, scale, color, block_material="concrete", center_y=0.0)
 - create_pyramid(base_width, height, scale, color, block_material="concrete", center=(0,0,0))
-- create_torus(major_radius, minor_radius, scale, color, block_material="concrete", center_y=0.0)
+- create_torus(major_radius, minor_radius, scale, color, block_material="concrete", center_y=0.0, distribution="rings")
 - create_plane(width, depth, scale, color, block_material="concrete", center=(0,0,0))
 - create_text(text, scale, color, block_material="concrete", position=(0,0,0), char_spacing=1.0)
 - add_glow(blocks, brightness_sky=15, brightness_block=15)
+- create_terrain(width, depth, scale, max_height, seed=0, layers=None, center=(0,0,0), solid=False)
+- displace_blocks(blocks, amount, seed=0, frequency=1.0) - returns new blocks
+- noise_materials(blocks, materials, seed=0, frequency=1.0) - returns new blocks
+- InstancedModel(blocks) with define(name, blocks) and place(name, translate=..., rotate=...) - repeated parts
 
 Common edit examples:
 - "make it bigger" → increase radius/width/height parameters
@@ -643,84 +811,12 @@ Modify the code to fulfill the edit request. Output the complete modified genera
         code
     };
 
-    // Write voxel library to temp file
-    let voxel_lib = include_str!("voxel_shape_library.py");
-    let temp_lib_path = "/tmp/voxel_shape_library.py";
-    fs::write(temp_lib_path, voxel_lib)
-        .map_err(|e| format!("Failed to write voxel library: {}", e))?;
-
-    // Write generated code to temp file
-    let full_code = format!(
-        r#"#!/usr/bin/env python3
-import sys
-sys.path.insert(0, '/tmp')
-from voxel_shape_library import *
-import json
-
-{}
-
-# Execute and output JSON
-result = generate()
-print(json.dumps(result))
-"#,
-        clean_code
-    );
-
-    let temp_code_path = "/tmp/edited_voxel_code.py";
-    fs::write(temp_code_path, &full_code)
-        .map_err(|e| format!("Failed to write edited code: {}", e))?;
+    // Edits have no complexity setting, so allow the largest budget
+    let block_budget: usize = 10000;
 
     println!("[OpenAI Edit] Executing edited Python code...");
 
-    // Execute Python code
-    let output = Command::new("python3")
-        .arg(temp_code_path)
-        .output()
-        .map_err(|e| format!("Failed to execute Python code: {}", e))?;
-
-    if !output.status.success() {
-        let stderr = String::from_utf8_lossy(&output.stderr);
-        return Err(format!("Python execution failed: {}", stderr));
-    }
-
-    let stdout = String::from_utf8_lossy(&output.stdout);
-    println!("[OpenAI Edit] Python output: {}", &stdout[..stdout.len().min(500)]);
-
-    // Parse JSON output
-    let mut entities: Vec<BlockDisplayEntity> = serde_json::from_str(&stdout)
-        .map_err(|e| format!("Failed to parse edited blocks JSON: {}. Output: {}", e, &stdout[..stdout.len().min(200)]))?;
-
-    if entities.is_empty() {
-        return Err("AI generated empty model".to_string());
-    }
-
-    println!("[OpenAI Edit] Generated {} blocks (before deduplication)", entities.len());
-
-    // Deduplicate blocks at exact same position
-    use std::collections::HashSet;
-    let mut seen_positions = HashSet::new();
-    let original_count = entities.len();
-
-    entities.retain(|entity| {
-        let x = (entity.x * 1000.0).round() as i32;
-        let y = (entity.y * 1000.0).round() as i32;
-        let z = (entity.z * 1000.0).round() as i32;
-        let pos = (x, y, z);
-
-        if seen_positions.contains(&pos) {
-            false
-        } else {
-            seen_positions.insert(pos);
-            true
-        }
-    });
-
-    let removed_count = original_count - entities.len();
-    if removed_count > 0 {
-        println!("[OpenAI Edit] Removed {} overlapping blocks", removed_count);
-    }
-
-    println!("[OpenAI Edit] Successfully generated {} blocks", entities.len());
+    let entities = run_voxel_code(clean_code, block_budget, "[OpenAI Edit]")?;
 
     Ok(CodegenResult {
         blocks: entities,
@@ -36,6 +36,9 @@ export interface ModData {
   events?: any[];
   blockDisplayModels?: any[];
   modelVariants?: { [modelId: string]: string[] }; // e.g. { "model_123": ["scale_2", "scale_10"] }
+  spawnTickBudget?: number; // Most commands a model function runs per tick (unset: spawn in one tick)
+  mergeDisplays?: boolean; // Merge runs of identical display blocks (default true)
+  maxStretch?: number | null; // Most a textured display is stretched (default 4, null: no limit)
 }
 
 /**
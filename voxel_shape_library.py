@@ -3,7 +3,749 @@ Voxel Shape Library - Scientific building blocks for voxel models
 Used by AI to generate high-quality voxel structures
 """
 
+import bisect
+import colorsys
+import contextlib
+import functools
+import heapq
+import inspect
+import itertools
+import json
 import math
+import random
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+from array import array
+from collections import OrderedDict
+
+# ---------------------------------------------------------------------------
+# Geometry cache
+# ---------------------------------------------------------------------------
+#
+# Generated models call the same primitive with the same numbers over and over
+# (four identical legs, a row of windows, rings at many heights). Primitives
+# therefore keep their positions in a bounded LRU keyed by the geometric
+# arguments only; color and material are stamped on when blocks are handed out.
+
+GEOMETRY_CACHE_MAX_ENTRIES = 256
+GEOMETRY_CACHE_MAX_POINTS = 500_000
+
+def block_name(color, block_material):
+    """Minecraft block ID for a color + material pair ("" material = direct block ID)"""
+    return f"minecraft:{color}_{block_material}" if block_material else f"minecraft:{color}"
+
+class Geometry:
+    """
+    Immutable block positions of one primitive, without color or material
+
+    translated() is a cheap view that shares the positions and only records an
+    offset; blocks() materializes fresh block dictionaries, so callers can still
+    edit the result freely.
+    """
+
+    __slots__ = ("points", "scale", "offset")
+
+    def __init__(self, points, scale, offset=(0.0, 0.0, 0.0)):
+        self.points = points
+        self.scale = scale
+        self.offset = offset
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        points = tuple((block["x"], block["y"], block["z"]) for block in blocks)
+        scale = tuple(blocks[0]["scale"]) if blocks and blocks[0].get("scale") else None
+        return cls(points, scale)
+
+    def __len__(self):
+        return len(self.points)
+
+    def translated(self, x=0.0, y=0.0, z=0.0):
+        """Return a view of this geometry moved by (x, y, z)"""
+        ox, oy, oz = self.offset
+        return Geometry(self.points, self.scale, (ox + x, oy + y, oz + z))
+
+    def blocks(self, color, block_material="concrete"):
+        """Materialize block dictionaries with the given color and material"""
+        name = block_name(color, block_material)
+        scale = self.scale
+        ox, oy, oz = self.offset
+        if ox or oy or oz:
+            points = ((round(x + ox, 3), round(y + oy, 3), round(z + oz, 3)) for x, y, z in self.points)
+        else:
+            points = self.points
+        if scale is None:
+            return [{"block": name, "x": x, "y": y, "z": z} for x, y, z in points]
+        return [
+            {"block": name, "x": x, "y": y, "z": z, "scale": list(scale)}
+            for x, y, z in points
+        ]
+
+class _GeometryCache:
+    """LRU of Geometry objects bounded by entry count and total stored points"""
+
+    def __init__(self, max_entries, max_points):
+        self.max_entries = max_entries
+        self.max_points = max_points
+        self._entries = OrderedDict()
+        self._points = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        geometry = self._entries.get(key)
+        if geometry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return geometry
+
+    def put(self, key, geometry):
+        if len(geometry.points) > self.max_points:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._points -= len(old.points)
+        self._entries[key] = geometry
+        self._points += len(geometry.points)
+        while len(self._entries) > self.max_entries or self._points > self.max_points:
+            _, evicted = self._entries.popitem(last=False)
+            self._points -= len(evicted.points)
+
+    def clear(self):
+        self._entries.clear()
+        self._points = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return {
+            "entries": len(self._entries),
+            "points": self._points,
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_entries": self.max_entries,
+            "max_points": self.max_points,
+        }
+
+_geometry_cache = _GeometryCache(GEOMETRY_CACHE_MAX_ENTRIES, GEOMETRY_CACHE_MAX_POINTS)
+
+def clear_geometry_cache():
+    """Drop all cached primitive geometry"""
+    _geometry_cache.clear()
+
+def geometry_cache_info():
+    """Return cache statistics (entries, points, hits, misses, limits)"""
+    return _geometry_cache.info()
+
+def _freeze(value):
+    """Turn list/dict arguments into hashable cache key parts"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+@functools.lru_cache(maxsize=1024)
+def _unit_circle(num_blocks):
+    """(cos, sin) of each of num_blocks evenly spaced angles, shared by every ring of that size"""
+    return tuple(
+        (math.cos((2 * math.pi * i) / num_blocks), math.sin((2 * math.pi * i) / num_blocks))
+        for i in range(num_blocks)
+    )
+
+def _cached_primitive(func):
+    """
+    Cache a primitive's geometry by every argument except color and block_material
+
+    The wrapped function also gets a .geometry(...) helper that takes the same
+    arguments minus color/material and returns the shared Geometry.
+    """
+    signature = inspect.signature(func)
+
+    def lookup(arguments):
+        key = (func.__name__,) + tuple(
+            _freeze(value) for name, value in arguments.items()
+            if name not in ("color", "block_material")
+        )
+        geometry = _geometry_cache.get(key)
+        if geometry is None:
+            geometry = Geometry.from_blocks(func(**{**arguments, "color": "", "block_material": ""}))
+            _geometry_cache.put(key, geometry)
+        return geometry
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        return lookup(arguments).blocks(arguments["color"], arguments["block_material"])
+
+    def geometry(*args, **kwargs):
+        bound = signature.bind_partial(*args, **kwargs)
+        arguments = {"color": "", "block_material": ""}
+        arguments.update(bound.arguments)
+        bound = signature.bind(**arguments)
+        bound.apply_defaults()
+        return lookup(bound.arguments)
+
+    wrapper.geometry = geometry
+    wrapper.uncached = func
+    return wrapper
+
+def _ring_geometry(radius, scale):
+    """Cached (x, z) positions of one circle layer at y = 0"""
+    key = ("ring", radius, scale)
+    geometry = _geometry_cache.get(key)
+    if geometry is None:
+        points = tuple(
+            (round(radius * cos_a, 3), 0.0, round(radius * sin_a, 3))
+            for cos_a, sin_a in _unit_circle(calculate_blocks_for_circumference(radius, scale))
+        )
+        geometry = Geometry(points, (scale, scale, scale))
+        _geometry_cache.put(key, geometry)
+    return geometry
+
+
+# ---------------------------------------------------------------------------
+# Block budget
+# ---------------------------------------------------------------------------
+#
+# generate_with_budget() runs a generate() function, looks at how many blocks
+# each top-level primitive call produced, and re-runs it with coarser block
+# scales on the biggest parts until the model fits. Small parts (eyes, handles,
+# trims) carry the silhouette detail, so they are the last to be coarsened.
+
+# How block count responds to scale: shells fall with scale^2, lines with scale
+_BUDGET_SCALE_EXPONENT = {
+    "create_circle_layer": 1.0,
+    "create_star": 1.0,
+}
+# Primitives whose overall size depends on scale are never rescaled
+_BUDGET_FIXED = {"create_text", "create_pixel_art", "create_relief"}
+
+_active_budget_run = None
+
+class _BudgetRun:
+    """Per-pass state: scale factors to apply and the primitive calls seen"""
+
+    def __init__(self, factors=None):
+        self.factors = factors or {}
+        self.calls = []
+        self.depth = 0
+
+def _tracked_primitive(func):
+    """
+    Let an active budget run or profile see top-level calls of a primitive
+
+    Nested calls (create_sphere building circle layers) are left alone, so each
+    call made by generate() is counted exactly once.
+    """
+    signature = inspect.signature(func)
+
+    def budgeted(args, kwargs):
+        run = _active_budget_run
+        if run is None or run.depth:
+            return func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        index = len(run.calls)
+        scale = arguments["scale"]
+        factor = 1.0
+        planned = run.factors.get(index)
+        if planned is not None and planned[0] == func.__name__:
+            factor = planned[1]
+            arguments["scale"] = round(scale * factor, 4)
+
+        run.depth += 1
+        try:
+            blocks = func(**arguments)
+        finally:
+            run.depth -= 1
+
+        run.calls.append({
+            "call": index,
+            "primitive": func.__name__,
+            "scale": scale,
+            "effective_scale": arguments["scale"],
+            "blocks": len(blocks),
+        })
+        return blocks
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _active_profile
+        if profile is None:
+            if _active_budget_run is None:
+                return func(*args, **kwargs)
+            return budgeted(args, kwargs)
+        if profile.depth:
+            return budgeted(args, kwargs)
+        return profile.record(func.__name__, signature, budgeted, args, kwargs)
+
+    return wrapper
+
+def _budget_targets(counts, budget):
+    """
+    Split a block budget across primitive calls
+
+    Each call keeps min(n, k * sqrt(n)) blocks, with k found by bisection so the
+    targets add up to the budget: small calls stay untouched and large ones
+    shrink the most while still keeping their relative size.
+    """
+    if sum(counts) <= budget:
+        return list(counts)
+    low, high = 0.0, max(math.sqrt(n) for n in counts) + 1.0
+    for _ in range(50):
+        k = (low + high) / 2
+        if sum(min(n, k * math.sqrt(n)) for n in counts) > budget:
+            high = k
+        else:
+            low = k
+    return [min(n, low * math.sqrt(n)) for n in counts]
+
+def _budget_pass(generate, factors, consume, random_state):
+    """
+    Run generate() once under a budget run and hand its flattened blocks to consume()
+
+    The random module is reset to random_state first, so a generate() that
+    uses it unseeded makes the same model on every pass.
+    """
+    global _active_budget_run
+    run = _BudgetRun(factors)
+    previous = _active_budget_run
+    _active_budget_run = run
+    random.setstate(random_state)
+    if _active_profile is not None and _active_profile.calls:
+        _active_profile.passes += 1
+    try:
+        # Generator-based generate() functions call primitives while being consumed
+        result = consume(iter_model(generate()))
+    finally:
+        _active_budget_run = previous
+    return run, result
+
+def _plan_budget(generate, max_blocks, max_passes, consume, random_state):
+    """Re-run generate() with growing scale factors until it fits; returns the last pass"""
+    factors = {}
+    first_total = None
+
+    for attempt in range(1, max_passes + 1):
+        run, (total, blocks) = _budget_pass(generate, factors, consume, random_state)
+        if first_total is None:
+            first_total = total
+        if total <= max_blocks or attempt == max_passes:
+            break
+
+        adjustable = [
+            call for call in run.calls
+            if call["primitive"] not in _BUDGET_FIXED and call["blocks"] > 0
+        ]
+        if not adjustable:
+            break
+        fixed_blocks = total - sum(call["blocks"] for call in adjustable)
+        targets = _budget_targets([call["blocks"] for call in adjustable], max(1, max_blocks - fixed_blocks))
+
+        for call, target in zip(adjustable, targets):
+            if target >= call["blocks"]:
+                continue
+            exponent = _BUDGET_SCALE_EXPONENT.get(call["primitive"], 2.0)
+            step = (call["blocks"] / target) ** (1.0 / exponent)
+            previous_factor = factors.get(call["call"], (call["primitive"], 1.0))[1]
+            factors[call["call"]] = (call["primitive"], previous_factor * step)
+
+    report = {
+        "budget": max_blocks,
+        "original_blocks": first_total,
+        "total_blocks": total,
+        "within_budget": total <= max_blocks,
+        "passes": attempt,
+        "primitives": run.calls,
+    }
+    return factors, blocks, report
+
+def generate_with_budget(generate, max_blocks, max_passes=4):
+    """
+    Run generate() and coarsen primitive scales until the model fits max_blocks
+
+    Args:
+        generate: Function returning (or yielding) blocks - the usual generate()
+        max_blocks: Block budget for the whole model
+        max_passes: How many times generate() may run at most
+
+    Returns:
+        (blocks, report) - report has "budget", "total_blocks", "within_budget",
+        "passes" and "primitives": one entry per top-level primitive call with
+        its requested "scale", "effective_scale" and final "blocks"
+    """
+    def keep(blocks):
+        blocks = list(blocks)
+        return len(blocks), blocks
+
+    _, blocks, report = _plan_budget(generate, max_blocks, max_passes, keep, random.getstate())
+    return blocks, report
+
+def stream_with_budget(generate, max_blocks, out=None, chunk_size=1, max_passes=4):
+    """
+    Like generate_with_budget(), but writes the model as JSON Lines instead of returning it
+
+    Sizing passes only count blocks, and the final pass streams straight to out,
+    so memory stays bounded by the largest single primitive call. Every pass
+    starts from the same random module state, so it streams the model the
+    sizing passes counted (a generate() with its own unseeded RNG can't be
+    planned this way - seed it).
+
+    Returns:
+        The budget report (see generate_with_budget)
+    """
+    def count(blocks):
+        return sum(1 for _ in blocks), None
+
+    random_state = random.getstate()
+    factors, _, report = _plan_budget(generate, max_blocks, max_passes, count, random_state)
+    run, written = _budget_pass(
+        generate, factors,
+        lambda blocks: write_blocks_jsonl(blocks, out, chunk_size),
+        random_state,
+    )
+    report["total_blocks"] = written
+    report["within_budget"] = written <= max_blocks
+    report["primitives"] = run.calls
+    return report
+
+# ---------------------------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------------------------
+#
+# When a generate() is slow or makes too many blocks, profile_generate() shows
+# which calls are responsible: every top-level primitive call is recorded with
+# its call site, arguments, block count, wall time and allocated memory. With
+# no profile active, tracked primitives only pay for one global lookup.
+
+PROFILE_TRACE_VERSION = 1
+_PROFILE_MAX_ITEMS = 8
+_PROFILE_MAX_TEXT = 80
+
+_active_profile = None
+
+def _trace_value(value):
+    """JSON-safe, size-limited copy of an argument for the trace"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= _PROFILE_MAX_TEXT else value[:_PROFILE_MAX_TEXT] + "..."
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, (list, tuple)):
+        if len(value) > _PROFILE_MAX_ITEMS:
+            return f"<{type(value).__name__} of {len(value)}>"
+        return [_trace_value(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) > _PROFILE_MAX_ITEMS:
+            return f"<dict of {len(value)}>"
+        return {str(key): _trace_value(item) for key, item in value.items()}
+    text = repr(value)
+    return text if len(text) <= _PROFILE_MAX_TEXT else text[:_PROFILE_MAX_TEXT] + "..."
+
+class GenerationProfile:
+    """Primitive calls recorded while profiling, with a summary table and a JSON trace"""
+
+    def __init__(self, trace_memory=True):
+        """
+        Args:
+            trace_memory: Measure memory allocated per call with tracemalloc,
+                          which makes the whole run several times slower
+        """
+        self.trace_memory = trace_memory
+        self.calls = []
+        self.depth = 0
+        self.passes = 1
+        self.total_time = 0.0
+        self.total_blocks = None
+        self._started = None
+
+    def record(self, primitive, signature, call, args, kwargs):
+        """Run one top-level primitive call and record it"""
+        frame = sys._getframe(2)
+        try:
+            arguments = signature.bind(*args, **kwargs).arguments
+        except TypeError:
+            arguments = {}
+
+        if self.trace_memory:
+            memory_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            blocks = call(args, kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.depth -= 1
+
+        entry = {
+            "call": len(self.calls),
+            "pass": self.passes,
+            "primitive": primitive,
+            "site": f"{frame.f_code.co_filename}:{frame.f_lineno}",
+            "function": frame.f_code.co_name,
+            "arguments": {name: _trace_value(value) for name, value in arguments.items()},
+            "blocks": len(blocks),
+            "start": start - self._started if self._started is not None else 0.0,
+            "time": elapsed,
+        }
+        run = _active_budget_run
+        if run is not None and run.calls:
+            entry["effective_scale"] = run.calls[-1]["effective_scale"]
+        if self.trace_memory:
+            memory_after, peak = tracemalloc.get_traced_memory()
+            entry["memory_peak"] = max(0, peak - memory_before)
+            entry["memory_retained"] = memory_after - memory_before
+        self.calls.append(entry)
+        return blocks
+
+    def by_primitive(self):
+        """Totals per primitive name, slowest first"""
+        totals = {}
+        for entry in self.calls:
+            total = totals.setdefault(entry["primitive"], {"calls": 0, "blocks": 0, "time": 0.0, "memory_peak": 0})
+            total["calls"] += 1
+            total["blocks"] += entry["blocks"]
+            total["time"] += entry["time"]
+            total["memory_peak"] = max(total["memory_peak"], entry.get("memory_peak", 0))
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["time"]))
+
+    def as_dict(self):
+        """The JSON trace"""
+        return {
+            "version": PROFILE_TRACE_VERSION,
+            "total_time": self.total_time,
+            "total_blocks": self.total_blocks,
+            "primitive_time": sum(entry["time"] for entry in self.calls),
+            "passes": self.passes,
+            "trace_memory": self.trace_memory,
+            "primitives": self.by_primitive(),
+            "calls": self.calls,
+        }
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=1)
+
+    def summary(self, slowest=5):
+        """Table of time and blocks per primitive, followed by the slowest calls"""
+        primitive_time = sum(entry["time"] for entry in self.calls)
+        total_time = max(self.total_time, primitive_time)
+        lines = [f"{'primitive':<22} {'calls':>6} {'blocks':>9} {'time ms':>10} {'time %':>7} {'peak KiB':>10}"]
+        for name, total in self.by_primitive().items():
+            share = total["time"] / total_time * 100 if total_time else 0.0
+            peak = f"{total['memory_peak'] / 1024:.1f}" if self.trace_memory else "-"
+            lines.append(
+                f"{name:<22} {total['calls']:>6} {total['blocks']:>9,} {total['time'] * 1000:>10.2f} "
+                f"{share:>6.1f}% {peak:>10}"
+            )
+        outside = total_time - primitive_time
+        lines.append(f"{'(outside primitives)':<22} {'':>6} {'':>9} {outside * 1000:>10.2f} "
+                     f"{(outside / total_time * 100 if total_time else 0.0):>6.1f}%")
+        blocks = self.total_blocks if self.total_blocks is not None else sum(entry["blocks"] for entry in self.calls)
+        lines.append(f"{'total':<22} {len(self.calls):>6} {blocks:>9,} {total_time * 1000:>10.2f}")
+
+        if self.calls and slowest:
+            lines.append("")
+            lines.append("Slowest calls:")
+            for entry in sorted(self.calls, key=lambda entry: -entry["time"])[:slowest]:
+                arguments = ", ".join(f"{name}={json.dumps(value)}" for name, value in entry["arguments"].items())
+                lines.append(f"  {entry['site']} {entry['primitive']}({arguments}): "
+                             f"{entry['blocks']:,} blocks, {entry['time'] * 1000:.2f} ms")
+        return "\n".join(lines)
+
+@contextlib.contextmanager
+def profile_primitives(trace_memory=True):
+    """
+    Record every top-level primitive call made inside the with block
+
+    Yields:
+        GenerationProfile, complete once the block exits
+    """
+    global _active_profile
+    profile = GenerationProfile(trace_memory)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    previous = _active_profile
+    _active_profile = profile
+    profile._started = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.total_time = time.perf_counter() - profile._started
+        _active_profile = previous
+        if started_tracing:
+            tracemalloc.stop()
+
+def profile_generate(generate, trace_memory=True):
+    """
+    Run generate() once with profiling
+
+    Returns:
+        (blocks, profile) - print profile.summary() for the table, and use
+        profile.as_dict() or profile.write_trace(path) for the JSON trace
+    """
+    with profile_primitives(trace_memory) as profile:
+        blocks = list(iter_model(generate()))
+    profile.total_blocks = len(blocks)
+    return blocks, profile
+
+# ---------------------------------------------------------------------------
+# Streaming output
+# ---------------------------------------------------------------------------
+
+_COMPACT_JSON = json.JSONEncoder(separators=(",", ":"))
+_STREAM_FLUSH_EVERY = 256
+
+def iter_model(result):
+    """
+    Flatten generate() output into single blocks, lazily
+
+    Accepts a list of blocks, a generator yielding blocks, or a generator
+    yielding lists of blocks (e.g. yield create_sphere(...)). Raises TypeError
+    for anything else, such as a block ID string.
+    """
+    for item in result:
+        if isinstance(item, dict):
+            yield item
+        elif isinstance(item, (str, bytes, bytearray)):
+            raise TypeError(
+                f"generate() output must be blocks or lists of blocks, got {type(item).__name__} {item!r:.40}"
+            )
+        else:
+            yield from iter_model(item)
+
+def write_blocks_jsonl(blocks, out=None, chunk_size=1):
+    """
+    Write blocks as JSON Lines while they are being produced
+
+    Args:
+        blocks: Block list, generator, or generate() output (see iter_model)
+        out: Text stream to write to (default: sys.stdout)
+        chunk_size: 1 writes one block object per line; larger values write a
+                    JSON array of up to chunk_size blocks per line
+
+    Returns:
+        Number of blocks written
+    """
+    out = sys.stdout if out is None else out
+    encode = _COMPACT_JSON.encode
+    count = 0
+
+    if chunk_size <= 1:
+        for block in iter_model(blocks):
+            out.write(encode(block))
+            out.write("\n")
+            count += 1
+            if count % _STREAM_FLUSH_EVERY == 0:
+                out.flush()
+    else:
+        chunk = []
+        for block in iter_model(blocks):
+            chunk.append(block)
+            if len(chunk) == chunk_size:
+                out.write(encode(chunk))
+                out.write("\n")
+                out.flush()
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            out.write(encode(chunk))
+            out.write("\n")
+            count += len(chunk)
+
+    out.flush()
+    return count
+
+def read_blocks_jsonl(lines):
+    """Yield blocks from JSON Lines written by write_blocks_jsonl (either chunk mode)"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, list):
+            yield from item
+        else:
+            yield item
+
+_JSON_WHITESPACE = " \t\n\r"
+_JSON_READ_SIZE = 1 << 16
+
+def iter_json_array(source, read_size=_JSON_READ_SIZE):
+    """
+    Yield the items of a JSON array one at a time
+
+    Only the item being parsed (and, for files, one read buffer) is held in
+    memory, so a huge blocks_json never becomes one big list.
+
+    Args:
+        source: JSON text, or a text file object to read from
+        read_size: Characters to read from a file at a time
+
+    Raises:
+        ValueError (json.JSONDecodeError) for malformed JSON or a
+        document that isn't an array
+    """
+    decode = json.JSONDecoder().raw_decode
+    text = source if isinstance(source, str) else ""
+    at_end = isinstance(source, str)
+    pos = 0
+
+    def skip_whitespace():
+        nonlocal text, pos, at_end
+        while True:
+            while pos < len(text) and text[pos] in _JSON_WHITESPACE:
+                pos += 1
+            if pos < len(text) or at_end:
+                return
+            more = source.read(read_size)
+            at_end = not more
+            text, pos = more, 0
+
+    def expect(chars):
+        skip_whitespace()
+        if pos >= len(text) or text[pos] not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", text, pos)
+        return text[pos]
+
+    expect("[")
+    pos += 1
+    skip_whitespace()
+    if text[pos:pos + 1] == "]":
+        return
+    while True:
+        skip_whitespace()
+        while True:
+            try:
+                item, end = decode(text, pos)
+            except json.JSONDecodeError:
+                item = end = None
+            # An item that stops at the end of the buffer may continue in the next read
+            if at_end or (end is not None and end < len(text)):
+                break
+            more = source.read(read_size)
+            at_end = not more
+            text = text[pos:] + more
+            pos = 0
+        if end is None:
+            item, end = decode(text, pos)  # Raises with the position of the error
+        yield item
+        pos = end
+        if expect(",]") == "]":
+            return
+        pos += 1
 
 def calculate_blocks_for_circumference(radius, block_scale):
     """Calculate how many blocks fit around a circle without overlap"""
@@ -11,6 +753,7 @@ def calculate_blocks_for_circumference(radius, block_scale):
     num_blocks = int(circumference / block_scale)
     return max(8, num_blocks if num_blocks % 2 == 0 else num_blocks + 1)
 
+@_tracked_primitive
 def create_circle_layer(y, radius, scale, color, block_material="concrete"):
     """
     Create one circular horizontal layer of blocks
@@ -28,25 +771,16 @@ def create_circle_layer(y, radius, scale, color, block_material="concrete"):
     if radius <= 0:
         return []
 
-    num_blocks = calculate_blocks_for_circumference(radius, scale)
-    blocks = []
-
-    for i in range(num_blocks):
-        angle = (2 * math.pi * i) / num_blocks
-        x = radius * math.cos(angle)
-        z = radius * math.sin(angle)
-
-        blocks.append({
-            "block": f"minecraft:{color}_{block_material}" if block_material else f"minecraft:{color}",
-            "x": round(x, 3),
-            "y": round(y, 3),
-            "z": round(z, 3),
-            "scale": [scale, scale, scale]
-        })
-
-    return blocks
+    name = block_name(color, block_material)
+    y = round(y, 3)
+    return [
+        {"block": name, "x": x, "y": y, "z": z, "scale": [scale, scale, scale]}
+        for x, _, z in _ring_geometry(radius, scale).points
+    ]
 
-def create_sphere(radius, scale, color, block_material="concrete"):
+@_tracked_primitive
+@_cached_primitive
+def create_sphere(radius, scale, color, block_material="concrete", distribution="rings"):
     """
     Create a hollow spherical shell
 
@@ -55,10 +789,15 @@ def create_sphere(radius, scale, color, block_material="concrete"):
         scale: Block scale
         color: Minecraft color
         block_material: Material type
+        distribution: "rings" (stacked circle layers) or "uniform" (area-uniform lattice, fewer gaps)
 
     Returns:
         List of blocks forming sphere surface
     """
+    if distribution == "uniform":
+        return _uniform_blocks(_uniform_surface_points(_sphere_profile(radius, scale), scale), scale,
+                               block_name(color, block_material))
+
     blocks = []
     vertical_spacing = scale * 0.9
     num_layers = int((2 * radius) / vertical_spacing)
@@ -82,6 +821,8 @@ def create_sphere(radius, scale, color, block_material="concrete"):
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_cylinder(height, radius, scale, color, block_material="concrete", center_y=0.0):
     """
     Create a cylindrical shell
@@ -109,7 +850,8 @@ def create_cylinder(height, radius, scale, color, block_material="concrete", cen
 
     return blocks
 
-def create_tapered_shape(profile, scale, color_map, block_material="concrete"):
+@_tracked_primitive
+def create_tapered_shape(profile, scale, color_map, block_material="concrete", distribution="rings"):
     """
     Create a shape with varying radius at different heights
 
@@ -118,10 +860,24 @@ def create_tapered_shape(profile, scale, color_map, block_material="concrete"):
         scale: Block scale
         color_map: List of {"y_range": [min, max], "color": "color_name"}
         block_material: Material type
+        distribution: "rings" (stacked circle layers) or "uniform" (area-uniform lattice, fewer gaps)
 
     Returns:
         List of blocks forming tapered shape
     """
+    if distribution == "uniform":
+        blocks = []
+        for x, y, z in _uniform_surface_points(_tapered_profile(profile, scale), scale):
+            color = "white"  # default
+            for color_spec in color_map:
+                y_min, y_max = color_spec["y_range"]
+                if y_min >= y >= y_max:
+                    color = color_spec["color"]
+                    break
+            blocks.append({"block": block_name(color, block_material), "x": x, "y": y, "z": z,
+                           "scale": [scale, scale, scale]})
+        return blocks
+
     blocks = []
 
     # Sort profile by y
@@ -158,6 +914,8 @@ def create_tapered_shape(profile, scale, color_map, block_material="concrete"):
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_box(width, height, depth, scale, color, block_material="concrete", center=(0, 0, 0)):
     """
     Create a hollow box
@@ -230,6 +988,8 @@ def create_box(width, height, depth, scale, color, block_material="concrete", ce
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_cone(height, base_radius, scale, color, block_material="concrete", center_y=0.0):
     """
     Create a cone shape (tapered from base to point)
@@ -252,6 +1012,8 @@ def create_cone(height, base_radius, scale, color, block_material="concrete", ce
     color_map = [{"y_range": [center_y + height, center_y], "color": color}]
     return create_tapered_shape(profile, scale, color_map, block_material)
 
+@_tracked_primitive
+@_cached_primitive
 def create_pyramid(base_width, height, scale, color, block_material="concrete", center=(0, 0, 0)):
     """
     Create a pyramid with square base
@@ -314,7 +1076,10 @@ def create_pyramid(base_width, height, scale, color, block_material="concrete",
 
     return blocks
 
-def create_torus(major_radius, minor_radius, scale, color, block_material="concrete", center_y=0.0):
+@_tracked_primitive
+@_cached_primitive
+def create_torus(major_radius, minor_radius, scale, color, block_material="concrete", center_y=0.0,
+                 distribution="rings"):
     """
     Create a torus (donut) shape
 
@@ -325,10 +1090,15 @@ def create_torus(major_radius, minor_radius, scale, color, block_material="concr
         color: Minecraft color
         block_material: Material type
         center_y: Y position of torus BASE (bottom)
+        distribution: "rings" (stacked circle layers) or "uniform" (area-uniform lattice, fewer gaps)
 
     Returns:
         List of blocks forming torus surface
     """
+    if distribution == "uniform":
+        profile = _torus_profile(major_radius, minor_radius, center_y, scale)
+        return _uniform_blocks(_uniform_surface_points(profile, scale), scale, block_name(color, block_material))
+
     blocks = []
 
     # Number of segments around the major circle
@@ -336,20 +1106,18 @@ def create_torus(major_radius, minor_radius, scale, color, block_material="concr
     # Number of segments around the minor circle
     minor_segments = max(8, int(2 * math.pi * minor_radius / scale))
 
-    for i in range(major_segments):
-        major_angle = (2 * math.pi * i) / major_segments
+    minor_circle = _unit_circle(minor_segments)
 
+    for cos_major, sin_major in _unit_circle(major_segments):
         # Center of tube at this major angle
-        tube_center_x = major_radius * math.cos(major_angle)
-        tube_center_z = major_radius * math.sin(major_angle)
-
-        for j in range(minor_segments):
-            minor_angle = (2 * math.pi * j) / minor_segments
+        tube_center_x = major_radius * cos_major
+        tube_center_z = major_radius * sin_major
 
+        for cos_minor, sin_minor in minor_circle:
             # Offset from tube center
-            offset_x = minor_radius * math.cos(minor_angle) * math.cos(major_angle)
-            offset_y = minor_radius * math.sin(minor_angle)
-            offset_z = minor_radius * math.cos(minor_angle) * math.sin(major_angle)
+            offset_x = minor_radius * cos_minor * cos_major
+            offset_y = minor_radius * sin_minor
+            offset_z = minor_radius * cos_minor * sin_major
 
             blocks.append({
                 "block": f"minecraft:{color}_{block_material}" if block_material else f"minecraft:{color}",
@@ -361,6 +1129,8 @@ def create_torus(major_radius, minor_radius, scale, color, block_material="concr
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_plane(width, depth, scale, color, block_material="concrete", center=(0, 0, 0)):
     """
     Create a flat rectangular plane
@@ -770,6 +1540,8 @@ FONT_5X7 = {
     ],
 }
 
+@_tracked_primitive
+@_cached_primitive
 def create_text(text, scale, color, block_material="concrete", position=(0, 0, 0), char_spacing=1.0):
     """
     Create 3D text from string using bitmap font
@@ -819,6 +1591,8 @@ def create_text(text, scale, color, block_material="concrete", position=(0, 0, 0
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_hemisphere(radius, scale, color, block_material="concrete", center_y=0.0):
     """
     Create a hollow hemisphere (half sphere, dome)
@@ -858,7 +1632,10 @@ def create_hemisphere(radius, scale, color, block_material="concrete", center_y=
 
     return blocks
 
-def create_ellipsoid(radius_x, radius_y, radius_z, scale, color, block_material="concrete", center_y=0.0):
+@_tracked_primitive
+@_cached_primitive
+def create_ellipsoid(radius_x, radius_y, radius_z, scale, color, block_material="concrete", center_y=0.0,
+                     distribution="rings"):
     """
     Create a hollow ellipsoid (stretched sphere)
 
@@ -870,10 +1647,17 @@ def create_ellipsoid(radius_x, radius_y, radius_z, scale, color, block_material=
         color: Minecraft color
         block_material: Material type
         center_y: Y position of ellipsoid BASE (bottom)
+        distribution: "rings" (stacked circle layers) or "uniform" (area-uniform lattice, fewer gaps)
 
     Returns:
         List of blocks forming ellipsoid surface
     """
+    if distribution == "uniform":
+        profile, stretch = _surface_profile("ellipsoid", scale, radius_x=radius_x, radius_y=radius_y,
+                                            radius_z=radius_z, center_y=center_y)
+        return _uniform_blocks(_uniform_surface_points(profile, scale, stretch), scale,
+                               block_name(color, block_material))
+
     blocks = []
     vertical_spacing = scale * 0.9
     num_layers = int((2 * radius_y) / vertical_spacing)
@@ -904,10 +1688,9 @@ def create_ellipsoid(radius_x, radius_y, radius_z, scale, color, block_material=
             # Create elliptical layer
             num_blocks = calculate_blocks_for_circumference(max(horizontal_radius_x, horizontal_radius_z), scale)
 
-            for j in range(num_blocks):
-                angle = (2 * math.pi * j) / num_blocks
-                x = horizontal_radius_x * math.cos(angle)
-                z = horizontal_radius_z * math.sin(angle)
+            for cos_a, sin_a in _unit_circle(num_blocks):
+                x = horizontal_radius_x * cos_a
+                z = horizontal_radius_z * sin_a
 
                 blocks.append({
                     "block": f"minecraft:{color}_{block_material}" if block_material else f"minecraft:{color}",
@@ -919,6 +1702,8 @@ def create_ellipsoid(radius_x, radius_y, radius_z, scale, color, block_material=
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_wedge(width, height, depth, scale, color, block_material="concrete", center=(0, 0, 0)):
     """
     Create a wedge/ramp shape (triangular prism)
@@ -989,6 +1774,8 @@ def create_wedge(width, height, depth, scale, color, block_material="concrete",
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_arch(width, height, depth, thickness, scale, color, block_material="concrete", center=(0, 0, 0)):
     """
     Create an arch (rounded doorway/window)
@@ -1072,6 +1859,8 @@ def create_arch(width, height, depth, thickness, scale, color, block_material="c
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_star(points, inner_radius, outer_radius, scale, color, block_material="concrete", center_y=0.0):
     """
     Create a flat star shape (decorative element)
@@ -1134,6 +1923,8 @@ def create_star(points, inner_radius, outer_radius, scale, color, block_material
 
     return blocks
 
+@_tracked_primitive
+@_cached_primitive
 def create_ring(outer_radius, inner_radius, height, scale, color, block_material="concrete", center_y=0.0):
     """
     Create a ring/torus cross-section (flat platform with hole)
@@ -1172,14 +1963,928 @@ def add_glow(blocks, brightness_sky=15, brightness_block=15):
         block["brightness"] = {"sky": brightness_sky, "block": brightness_block}
     return blocks
 
+# ---------------------------------------------------------------------------
+# Uniform surface sampling
+# ---------------------------------------------------------------------------
+#
+# Ring-based shells give every horizontal layer its own block count and step
+# a fixed distance in y, so blocks bunch up where the surface is steep and
+# leave gaps where it is flat. distribution="uniform" instead places blocks
+# on a Fibonacci lattice spread by surface area: block i sits where the
+# cumulative area of the surface of revolution reaches (i + 0.5) / N of the
+# total, turned by the golden angle from block i - 1. On a sphere this is the
+# usual spherical Fibonacci lattice; ellipsoids, tori and tapered shapes use
+# the same construction along their profile curves. This is plain Python: the
+# cumulative-area table is built once per shape, and the loop over blocks
+# reuses it, with one bisect per block.
+
+# Surface area per block, in units of scale². Lower means denser; 0.75 covers
+# about 99.5% of a sphere with axis-aligned blocks.
+UNIFORM_AREA_PER_BLOCK = 0.75
+
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+def _profile_points(point, start, end, length, scale):
+    """Sample a profile curve point(t) -> (radius, y) finely enough to integrate area"""
+    steps = max(8, math.ceil(length / (scale / 4)))
+    return [point(start + (end - start) * i / steps) for i in range(steps + 1)]
+
+def _sphere_profile(radius, scale):
+    return _profile_points(lambda t: (radius * math.sin(t), radius * math.cos(t)), 0.0, math.pi, math.pi * radius, scale)
+
+def _ellipsoid_profile(radius_x, radius_y, radius_z, center_y, scale):
+    mean = (radius_x + radius_z) / 2
+    length = math.pi * max(mean, radius_y)
+    return _profile_points(
+        lambda t: (mean * math.sin(t), center_y + radius_y + radius_y * math.cos(t)), 0.0, math.pi, length, scale
+    )
+
+def _torus_profile(major_radius, minor_radius, center_y, scale):
+    return _profile_points(
+        lambda t: (major_radius + minor_radius * math.cos(t), center_y + minor_radius + minor_radius * math.sin(t)),
+        0.0, 2 * math.pi, 2 * math.pi * minor_radius, scale,
+    )
+
+def _tapered_profile(profile, scale):
+    points = []
+    ordered = sorted(profile, key=lambda p: p["y"], reverse=True)
+    for p1, p2 in zip(ordered, ordered[1:]):
+        length = math.hypot(p2["radius"] - p1["radius"], p2["y"] - p1["y"])
+        segment = _profile_points(
+            lambda t: (p1["radius"] + t * (p2["radius"] - p1["radius"]), p1["y"] + t * (p2["y"] - p1["y"])),
+            0.0, 1.0, length, scale,
+        )
+        points.extend(segment[1:] if points else segment)
+    return points
+
+def _cumulative_area(profile):
+    """Running lateral area 2*pi*r*ds along a profile polyline"""
+    areas = [0.0]
+    for (r1, y1), (r2, y2) in zip(profile, profile[1:]):
+        areas.append(areas[-1] + math.pi * (r1 + r2) * math.hypot(r2 - r1, y2 - y1))
+    return areas
+
+def _profile_at_area(profile, areas, target):
+    """(radius, y) where the cumulative area reaches target"""
+    index = bisect.bisect_left(areas, target, 1, len(areas) - 1)
+    a1, a2 = areas[index - 1], areas[index]
+    t = (target - a1) / (a2 - a1) if a2 > a1 else 0.0
+    (r1, y1), (r2, y2) = profile[index - 1], profile[index]
+    return r1 + t * (r2 - r1), y1 + t * (y2 - y1)
+
+def _uniform_surface_points(profile, scale, stretch=(1.0, 1.0)):
+    """
+    Area-uniform Fibonacci lattice on a surface of revolution around the y axis
+
+    Args:
+        profile: (radius, y) polyline of the surface
+        scale: Block scale, which sets the spacing
+        stretch: (x, z) factors applied after revolving, for elliptical sections
+    """
+    areas = _cumulative_area(profile)
+    total = areas[-1]
+    if total <= 0:
+        return []
+    count = max(1, math.ceil(total / (UNIFORM_AREA_PER_BLOCK * scale * scale)))
+    stretch_x, stretch_z = stretch
+    points = []
+    for i in range(count):
+        radius, y = _profile_at_area(profile, areas, (i + 0.5) / count * total)
+        angle = i * _GOLDEN_ANGLE
+        points.append((
+            round(radius * math.cos(angle) * stretch_x, 3),
+            round(y, 3),
+            round(radius * math.sin(angle) * stretch_z, 3),
+        ))
+    return points
+
+def _uniform_blocks(points, scale, name):
+    return [{"block": name, "x": x, "y": y, "z": z, "scale": [scale, scale, scale]} for x, y, z in points]
+
+def _surface_profile(shape, scale, **params):
+    """Profile and stretch for a shape name and its primitive's geometry arguments"""
+    if shape == "sphere":
+        return _sphere_profile(params["radius"], scale), (1.0, 1.0)
+    if shape == "ellipsoid":
+        rx, rz = params["radius_x"], params["radius_z"]
+        mean = (rx + rz) / 2
+        profile = _ellipsoid_profile(rx, params["radius_y"], rz, params.get("center_y", 0.0), scale)
+        return profile, (rx / mean, rz / mean)
+    if shape == "torus":
+        return _torus_profile(params["major_radius"], params["minor_radius"], params.get("center_y", 0.0), scale), (1.0, 1.0)
+    if shape == "tapered_shape":
+        return _tapered_profile(params["profile"], scale), (1.0, 1.0)
+    raise ValueError(f"Unknown surface shape: {shape}")
+
+def surface_coverage(blocks, shape, samples=20000, **params):
+    """
+    Measure how well blocks cover a shape's surface
+
+    Probe points are spread evenly over the surface; a probe counts as covered
+    when it lies inside at least one (axis-aligned) block.
+
+    Args:
+        blocks: Blocks to measure
+        shape: "sphere", "ellipsoid", "torus" or "tapered_shape"
+        samples: Number of probe points
+        **params: The shape's geometry arguments, named as in its create_* function
+
+    Returns:
+        Dictionary with blocks, surface_area, area_per_block, coverage (share
+        of probes covered) and overlap (average extra blocks over a covered probe)
+    """
+    if not blocks:
+        return {"blocks": 0, "surface_area": 0.0, "area_per_block": 0.0, "coverage": 0.0, "overlap": 0.0}
+
+    cell = max(max(block.get("scale") or [1.0]) for block in blocks)
+    grid = {}
+    for block in blocks:
+        key = (math.floor(block["x"] / cell), math.floor(block["y"] / cell), math.floor(block["z"] / cell))
+        grid.setdefault(key, []).append(block)
+
+    profile, (stretch_x, stretch_z) = _surface_profile(shape, cell, **params)
+    areas = _cumulative_area(profile)
+    covered = 0
+    extra = 0
+    for i in range(samples):
+        radius, y = _profile_at_area(profile, areas, (i + 0.5) / samples * areas[-1])
+        # An angle sequence unrelated to the block lattice's golden angle
+        angle = 2 * math.pi * ((i * 0.7548776662466927) % 1.0)
+        x, z = radius * math.cos(angle) * stretch_x, radius * math.sin(angle) * stretch_z
+        cx, cy, cz = math.floor(x / cell), math.floor(y / cell), math.floor(z / cell)
+        hits = 0
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for block in grid.get((cx + dx, cy + dy, cz + dz), ()):
+                        sx, sy, sz = block.get("scale") or (1.0, 1.0, 1.0)
+                        if abs(block["x"] - x) <= sx / 2 and abs(block["y"] - y) <= sy / 2 and abs(block["z"] - z) <= sz / 2:
+                            hits += 1
+        if hits:
+            covered += 1
+            extra += hits - 1
+
+    surface_area = areas[-1] * (stretch_x + stretch_z) / 2
+    return {
+        "blocks": len(blocks),
+        "surface_area": round(surface_area, 4),
+        "area_per_block": round(surface_area / len(blocks), 6),
+        "coverage": round(covered / samples, 4),
+        "overlap": round(extra / covered, 4) if covered else 0.0,
+    }
+
+# ---------------------------------------------------------------------------
+# Images
+# ---------------------------------------------------------------------------
+#
+# Pixel art and reliefs from PNG files. Decoding uses zlib only, so PNGs load
+# without PIL. Pixels map to the nearest concrete color, and runs of equal
+# pixels are merged into stretched blocks, so a 64x64 logo usually needs a
+# few hundred blocks rather than 4096.
+
+# Average colors of the concrete blocks, used to map RGB colors to block colors
+BLOCK_COLORS = {
+    "white": (207, 213, 214),
+    "orange": (224, 97, 1),
+    "magenta": (169, 48, 159),
+    "light_blue": (36, 137, 199),
+    "yellow": (241, 175, 21),
+    "lime": (94, 169, 24),
+    "pink": (214, 101, 143),
+    "gray": (55, 58, 62),
+    "light_gray": (125, 125, 115),
+    "cyan": (21, 119, 136),
+    "purple": (100, 32, 156),
+    "blue": (45, 47, 143),
+    "brown": (96, 60, 32),
+    "green": (73, 91, 36),
+    "red": (142, 33, 33),
+    "black": (8, 10, 15),
+}
+
+# Weight of the hue term in nearest_block_color()
+_HUE_WEIGHT = 8
+
+_BLOCK_HSV = {name: colorsys.rgb_to_hsv(*(v / 255 for v in rgb)) for name, rgb in BLOCK_COLORS.items()}
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+_ADAM7_PASSES = ((0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2))
+
+def nearest_block_color(rgb):
+    """
+    Name of the concrete color closest to an (r, g, b) color
+
+    Concrete is darker than most screen colors, so the plain weighted RGB
+    distance picks orange over red for pure red. A hue term, scaled by how
+    saturated both colors are, keeps saturated colors on their own hue.
+    """
+    r, g, b = rgb[:3]
+    hue, saturation, _ = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+    best = None
+    best_distance = None
+    for name, (br, bg, bb) in BLOCK_COLORS.items():
+        # Weighted RGB distance, a cheap approximation of perceived difference
+        mean_red = (r + br) / 2
+        distance = (2 + mean_red / 256) * (r - br) ** 2 + 4 * (g - bg) ** 2 + (2 + (255 - mean_red) / 256) * (b - bb) ** 2
+        block_hue, block_saturation, _ = _BLOCK_HSV[name]
+        hue_difference = abs(hue - block_hue)
+        hue_difference = min(hue_difference, 1 - hue_difference)
+        distance += _HUE_WEIGHT * (saturation * block_saturation * hue_difference * 255) ** 2
+        if best_distance is None or distance < best_distance:
+            best, best_distance = name, distance
+    return best
+
+def _png_unfilter(data, stride, height, bytes_per_pixel):
+    """Undo PNG scanline filters, returning one bytearray per row"""
+    rows = []
+    previous = bytearray(stride)
+    position = 0
+    for _ in range(height):
+        kind = data[position]
+        row = bytearray(data[position + 1:position + 1 + stride])
+        position += stride + 1
+        if kind == 1:
+            for i in range(bytes_per_pixel, stride):
+                row[i] = (row[i] + row[i - bytes_per_pixel]) & 0xFF
+        elif kind == 2:
+            for i in range(stride):
+                row[i] = (row[i] + previous[i]) & 0xFF
+        elif kind == 3:
+            for i in range(stride):
+                left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(stride):
+                a = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                b = previous[i]
+                c = previous[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                predictor = a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+                row[i] = (row[i] + predictor) & 0xFF
+        elif kind != 0:
+            raise ValueError(f"Invalid PNG filter type: {kind}")
+        rows.append(row)
+        previous = row
+    return rows
+
+def read_png(source):
+    """
+    Decode a PNG image
+
+    Args:
+        source: File path or PNG bytes
+
+    Returns:
+        (width, height, rows) where rows is a list of rows of (r, g, b, a) tuples
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    if data[:8] != _PNG_SIGNATURE:
+        raise ValueError("Not a PNG file")
+
+    position = 8
+    header = None
+    palette = []
+    transparency = b""
+    compressed = bytearray()
+    while position + 8 <= len(data):
+        length, kind = struct.unpack_from(">I4s", data, position)
+        chunk = data[position + 8:position + 8 + length]
+        position += length + 12
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", chunk)
+        elif kind == b"PLTE":
+            palette = [tuple(chunk[i:i + 3]) for i in range(0, len(chunk), 3)]
+        elif kind == b"tRNS":
+            transparency = chunk
+        elif kind == b"IDAT":
+            compressed += chunk
+        elif kind == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG has no IHDR chunk")
+
+    width, height, depth, color_type, _, _, interlace = header
+    if color_type not in _PNG_CHANNELS:
+        raise ValueError(f"Unsupported PNG color type: {color_type}")
+    channels = _PNG_CHANNELS[color_type]
+    bits_per_pixel = channels * depth
+    filter_unit = max(1, bits_per_pixel // 8)
+
+    key = None
+    if transparency and color_type == 0:
+        key = struct.unpack(">H", transparency[:2])[0]
+    elif transparency and color_type == 2:
+        key = struct.unpack(">HHH", transparency[:6])
+    alphas = list(transparency) if color_type == 3 else []
+    max_value = (1 << depth) - 1
+
+    def decode_row(row, count):
+        if depth == 16:
+            samples = struct.unpack(f">{len(row) // 2}H", row)
+        elif depth == 8:
+            samples = row
+        else:
+            per_byte = 8 // depth
+            samples = [(byte >> (8 - depth * (n + 1))) & max_value for byte in row for n in range(per_byte)]
+        line = []
+        for x in range(count):
+            pixel = samples[x * channels:(x + 1) * channels]
+            if color_type == 3:
+                index = pixel[0]
+                r, g, b = palette[index]
+                line.append((r, g, b, alphas[index] if index < len(alphas) else 255))
+                continue
+            if color_type in (0, 4):
+                gray = pixel[0]
+                alpha = pixel[1] if color_type == 4 else (0 if gray == key else max_value)
+                value = gray * 255 // max_value
+                line.append((value, value, value, alpha * 255 // max_value))
+            else:
+                alpha = pixel[3] if color_type == 6 else (0 if tuple(pixel) == key else max_value)
+                line.append(tuple(v * 255 // max_value for v in pixel[:3]) + (alpha * 255 // max_value,))
+        return line
+
+    raw = zlib.decompress(bytes(compressed))
+    if not interlace:
+        stride = (width * bits_per_pixel + 7) // 8
+        rows = _png_unfilter(raw, stride, height, filter_unit)
+        return width, height, [decode_row(row, width) for row in rows]
+
+    # Adam7: seven reduced images, each filtered on its own
+    pixels = [[None] * width for _ in range(height)]
+    position = 0
+    for x0, y0, dx, dy in _ADAM7_PASSES:
+        pass_width = (width - x0 + dx - 1) // dx
+        pass_height = (height - y0 + dy - 1) // dy
+        if pass_width <= 0 or pass_height <= 0:
+            continue
+        stride = (pass_width * bits_per_pixel + 7) // 8
+        size = (stride + 1) * pass_height
+        rows = _png_unfilter(raw[position:position + size], stride, pass_height, filter_unit)
+        position += size
+        for n, row in enumerate(rows):
+            pixels[y0 + n * dy][x0::dx] = decode_row(row, pass_width)
+    return width, height, pixels
+
+def _image_rows(image):
+    """Accept a path, PNG bytes or a (width, height, rows) tuple from read_png"""
+    if isinstance(image, tuple):
+        return image
+    return read_png(image)
+
+def _luminance(pixel):
+    r, g, b = pixel[:3]
+    return (0.2126 * r + 0.7152 * g + 0.0722 * b) / 255
+
+def _downsample(cells, width, height, factor, combine):
+    """Shrink a grid by an integer factor, combining each factor x factor tile"""
+    result = []
+    for y in range(0, height, factor):
+        row = []
+        for x in range(0, width, factor):
+            tile = [cells[ty][tx] for ty in range(y, min(y + factor, height)) for tx in range(x, min(x + factor, width))]
+            row.append(combine(tile))
+        result.append(row)
+    return result, len(result[0]) if result else 0, len(result)
+
+def _majority(tile):
+    counts = {}
+    for value in tile:
+        counts[value] = counts.get(value, 0) + 1
+    return max(counts, key=counts.get)
+
+def _merge_rectangles(cells, width, height):
+    """
+    Greedily cover equal non-empty cells with rectangles
+
+    Returns:
+        List of (x, y, width, height, value)
+    """
+    used = [[False] * width for _ in range(height)]
+    rectangles = []
+    for y in range(height):
+        row = cells[y]
+        for x in range(width):
+            value = row[x]
+            if value is None or used[y][x]:
+                continue
+            w = 1
+            while x + w < width and not used[y][x + w] and row[x + w] == value:
+                w += 1
+            h = 1
+            while y + h < height and all(
+                not used[y + h][x + i] and cells[y + h][x + i] == value for i in range(w)
+            ):
+                h += 1
+            for dy in range(h):
+                used[y + dy][x:x + w] = [True] * w
+            rectangles.append((x, y, w, h, value))
+    return rectangles
+
+def _fit_budget(cells, width, height, max_blocks, combine):
+    """Merge cells into rectangles, downsampling until they fit max_blocks"""
+    factor = 1
+    grid, grid_width, grid_height = cells, width, height
+    while True:
+        rectangles = _merge_rectangles(grid, grid_width, grid_height)
+        if not max_blocks or len(rectangles) <= max_blocks or (grid_width <= 1 and grid_height <= 1):
+            return rectangles, factor, grid_width, grid_height
+        factor += 1
+        grid, grid_width, grid_height = _downsample(cells, width, height, factor, combine)
+
+@_tracked_primitive
+def create_pixel_art(image, scale, block_material="concrete", center=(0, 0, 0), max_blocks=None,
+                     alpha_threshold=128, vertical=True, thickness=1, palette=None):
+    """
+    Create flat pixel art from a PNG image
+
+    Args:
+        image: PNG path, PNG bytes or a read_png() result
+        scale: Block scale (size of one pixel)
+        block_material: Material type
+        center: (x, y, z) center position
+        max_blocks: Block budget; larger images are downsampled until they fit
+        alpha_threshold: Pixels less opaque than this (0-255) are skipped
+        vertical: Stand upright in the X/Y plane (False lays it flat in X/Z)
+        thickness: Depth in pixels
+        palette: Function mapping (r, g, b) to a color name (default: nearest_block_color)
+
+    Returns:
+        List of blocks, with equal neighbouring pixels merged into stretched blocks
+    """
+    width, height, rows = _image_rows(image)
+    palette = palette or nearest_block_color
+    names = {}
+    cells = []
+    for row in rows:
+        line = []
+        for pixel in row:
+            if pixel[3] < alpha_threshold:
+                line.append(None)
+                continue
+            name = names.get(pixel[:3])
+            if name is None:
+                name = names[pixel[:3]] = block_name(palette(pixel[:3]), block_material)
+            line.append(name)
+        cells.append(line)
+
+    rectangles, factor, grid_width, grid_height = _fit_budget(cells, width, height, max_blocks, _majority)
+    return _image_blocks(
+        [(x, y, w, h, name, thickness) for x, y, w, h, name in rectangles],
+        grid_width, grid_height, scale * factor, scale, center, vertical,
+    )
+
+@_tracked_primitive
+def create_relief(image, scale, max_height, color=None, block_material="concrete", center=(0, 0, 0),
+                  max_blocks=None, alpha_threshold=128, invert=False, palette=None):
+    """
+    Create an extruded relief from a PNG heightmap or logo
+
+    Brighter pixels stand taller (darker with invert=True). Each pixel becomes
+    one column, and neighbouring columns of equal height and color are merged.
+
+    Args:
+        image: PNG path, PNG bytes or a read_png() result
+        scale: Block scale (size of one pixel)
+        max_height: Height of a white pixel in world units
+        color: Color name for every column (default: the pixel's own color)
+        block_material: Material type
+        center: (x, y, z) position of the middle of the base
+        max_blocks: Block budget; larger images are downsampled until they fit
+        alpha_threshold: Pixels less opaque than this (0-255) are skipped
+        invert: Make dark pixels tall instead
+        palette: Function mapping (r, g, b) to a color name (default: nearest_block_color)
+
+    Returns:
+        List of blocks lying in the X/Z plane, rising along Y
+    """
+    width, height, rows = _image_rows(image)
+    palette = palette or nearest_block_color
+    levels = max(1, round(max_height / scale))
+    fixed_name = block_name(color, block_material) if color else None
+    names = {}
+    cells = []
+    for row in rows:
+        line = []
+        for pixel in row:
+            if pixel[3] < alpha_threshold:
+                line.append(None)
+                continue
+            brightness = _luminance(pixel)
+            level = max(1, round((1 - brightness if invert else brightness) * levels))
+            name = fixed_name or names.get(pixel[:3])
+            if name is None:
+                name = names[pixel[:3]] = block_name(palette(pixel[:3]), block_material)
+            line.append((name, level))
+        cells.append(line)
+
+    def combine(tile):
+        opaque = [cell for cell in tile if cell is not None]
+        if len(opaque) * 2 < len(tile):
+            return None
+        name = _majority([cell[0] for cell in opaque])
+        return (name, round(sum(cell[1] for cell in opaque) / len(opaque)))
+
+    rectangles, factor, grid_width, grid_height = _fit_budget(cells, width, height, max_blocks, combine)
+    return _image_blocks(
+        [(x, y, w, h, name, level) for x, y, w, h, (name, level) in rectangles],
+        grid_width, grid_height, scale * factor, scale, center, False,
+    )
+
+def _image_blocks(rectangles, width, height, cell_size, depth_unit, center, vertical):
+    """
+    Turn merged (x, y, w, h, name, depth) image rectangles into blocks
+
+    Blocks are centered on x/z and stand on y, so an upright rectangle stands
+    on its bottom row and a lying one (or relief column) on the base.
+    """
+    cx, cy, cz = center
+    blocks = []
+    for x, y, w, h, name, depth in rectangles:
+        # Flip columns like create_text so the image reads correctly from the front
+        across = cx + ((width - 1) / 2 - (x + (w - 1) / 2)) * cell_size
+        size_across, size_down, size_depth = w * cell_size, h * cell_size, depth * depth_unit
+        if vertical:
+            bottom_row = ((y + h - 1) - (height - 1) / 2) * cell_size
+            position = (across, cy - bottom_row, cz)
+            block_scale = [size_across, size_down, size_depth]
+        else:
+            down = ((y + (h - 1) / 2) - (height - 1) / 2) * cell_size
+            position = (across, cy, cz + down)
+            block_scale = [size_across, size_depth, size_down]
+        blocks.append({
+            "block": name,
+            "x": round(position[0], 3),
+            "y": round(position[1], 3),
+            "z": round(position[2], 3),
+            "scale": [round(v, 4) for v in block_scale],
+        })
+    return blocks
+
+# ---------------------------------------------------------------------------
+# Transforms
+# ---------------------------------------------------------------------------
+#
+# Matrices are row-major tuples of 16 floats acting on column vectors, so a
+# point p maps to M * p and appending step S to M gives S * M.
+#
+# Rotations follow the block "rotation" field convention: [pitch, yaw, roll]
+# in degrees around X, Y and Z, combined as Ry(yaw) * Rx(pitch) * Rz(roll)
+# with the right-hand rule (the same way deploy builds display quaternions).
+
+_IDENTITY_MATRIX = (
+    1.0, 0.0, 0.0, 0.0,
+    0.0, 1.0, 0.0, 0.0,
+    0.0, 0.0, 1.0, 0.0,
+    0.0, 0.0, 0.0, 1.0,
+)
+
+def _matrix_multiply(a, b):
+    """Multiply two 4x4 row-major matrices (a * b)"""
+    return tuple(
+        a[r * 4] * b[c] + a[r * 4 + 1] * b[4 + c] + a[r * 4 + 2] * b[8 + c] + a[r * 4 + 3] * b[12 + c]
+        for r in range(4) for c in range(4)
+    )
+
+def _linear_matrix(m3):
+    """Embed a 3x3 row-major matrix (9 values) in a 4x4 affine matrix"""
+    return (
+        m3[0], m3[1], m3[2], 0.0,
+        m3[3], m3[4], m3[5], 0.0,
+        m3[6], m3[7], m3[8], 0.0,
+        0.0, 0.0, 0.0, 1.0,
+    )
+
+def _euler_to_matrix3(pitch, yaw, roll):
+    """3x3 rotation matrix for [pitch, yaw, roll] degrees (Ry * Rx * Rz)"""
+    a, b, c = math.radians(pitch), math.radians(yaw), math.radians(roll)
+    ca, sa = math.cos(a), math.sin(a)
+    cb, sb = math.cos(b), math.sin(b)
+    cc, sc = math.cos(c), math.sin(c)
+    return (
+        cb * cc + sb * sa * sc, sb * sa * cc - cb * sc, sb * ca,
+        ca * sc, ca * cc, -sa,
+        cb * sa * sc - sb * cc, sb * sc + cb * sa * cc, cb * ca,
+    )
+
+def _matrix3_to_euler(m):
+    """Inverse of _euler_to_matrix3, returns [pitch, yaw, roll] in degrees"""
+    pitch = math.asin(max(-1.0, min(1.0, -m[5])))
+    if abs(m[5]) < 0.9999999:
+        yaw = math.atan2(m[2], m[8])
+        roll = math.atan2(m[3], m[4])
+    else:
+        # Gimbal lock - fold roll into yaw
+        yaw = math.atan2(-m[6], m[0])
+        roll = 0.0
+    return [round(math.degrees(v), 3) + 0.0 for v in (pitch, yaw, roll)]
+
+def _quaternion_to_matrix3(q):
+    """3x3 rotation matrix for a quaternion (x, y, z, w), normalized first"""
+    x, y, z, w = q
+    n = math.sqrt(x * x + y * y + z * z + w * w)
+    if n == 0:
+        raise ValueError("Quaternion must be non-zero")
+    x, y, z, w = x / n, y / n, z / n, w / n
+    return (
+        1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w),
+        2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w),
+        2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y),
+    )
+
+def _matrix3_multiply(a, b):
+    """Multiply two 3x3 row-major matrices (a * b)"""
+    return tuple(
+        a[r * 3] * b[c] + a[r * 3 + 1] * b[3 + c] + a[r * 3 + 2] * b[6 + c]
+        for r in range(3) for c in range(3)
+    )
+
+def _orthonormalize(columns):
+    """Gram-Schmidt on the first two columns, returns a right-handed 3x3 rotation"""
+    c0, c1 = columns[0], columns[1]
+    n0 = math.sqrt(sum(v * v for v in c0))
+    c0 = tuple(v / n0 for v in c0)
+    d = sum(a * b for a, b in zip(c0, c1))
+    c1 = tuple(b - d * a for a, b in zip(c0, c1))
+    n1 = math.sqrt(sum(v * v for v in c1))
+    c1 = tuple(v / n1 for v in c1)
+    c2 = (
+        c0[1] * c1[2] - c0[2] * c1[1],
+        c0[2] * c1[0] - c0[0] * c1[2],
+        c0[0] * c1[1] - c0[1] * c1[0],
+    )
+    return (
+        c0[0], c1[0], c2[0],
+        c0[1], c1[1], c2[1],
+        c0[2], c1[2], c2[2],
+    )
+
+class Transform:
+    """
+    Affine transform for voxel models, composed lazily into one 4x4 matrix
+
+    Each method returns a new Transform with the step appended, so a chain like
+    Transform().rotate(y=30).translate(0, 2, 0).scale(2) is just a few matrix
+    multiplies. Nothing touches the blocks until apply(), which walks them once.
+
+    Use for:
+        - Tilting or turning parts by any angle
+        - Moving, resizing and mirroring parts in one pass
+        - Reusing one placement for several parts (wheels, legs, wings)
+    """
+
+    __slots__ = ("matrix",)
+
+    def __init__(self, matrix=None):
+        self.matrix = _IDENTITY_MATRIX if matrix is None else tuple(float(v) for v in matrix)
+
+    def __repr__(self):
+        return f"Transform({self.matrix!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Transform) and self.matrix == other.matrix
+
+    def __hash__(self):
+        return hash(self.matrix)
+
+    def then(self, other):
+        """Return this transform followed by another Transform"""
+        return Transform(_matrix_multiply(other.matrix, self.matrix))
+
+    def rotate(self, x=0.0, y=0.0, z=0.0):
+        """Rotate by Euler angles in degrees (pitch around X, yaw around Y, roll around Z)"""
+        if not (x or y or z):
+            return self
+        return Transform(_matrix_multiply(_linear_matrix(_euler_to_matrix3(x, y, z)), self.matrix))
+
+    def rotate_quaternion(self, quaternion):
+        """Rotate by a quaternion given as (x, y, z, w)"""
+        return Transform(_matrix_multiply(_linear_matrix(_quaternion_to_matrix3(quaternion)), self.matrix))
+
+    def translate(self, x=0.0, y=0.0, z=0.0):
+        """Move by (x, y, z)"""
+        step = (
+            1.0, 0.0, 0.0, x,
+            0.0, 1.0, 0.0, y,
+            0.0, 0.0, 1.0, z,
+            0.0, 0.0, 0.0, 1.0,
+        )
+        return Transform(_matrix_multiply(step, self.matrix))
+
+    def scale(self, x, y=None, z=None):
+        """Scale uniformly (one value) or per axis (x, y, z)"""
+        y = x if y is None else y
+        z = x if z is None else z
+        return Transform(_matrix_multiply(_linear_matrix((x, 0.0, 0.0, 0.0, y, 0.0, 0.0, 0.0, z)), self.matrix))
+
+    def mirror(self, axis):
+        """Mirror across the plane perpendicular to axis ("x", "y" or "z")"""
+        if axis not in ("x", "y", "z"):
+            raise ValueError(f"mirror axis must be 'x', 'y' or 'z', got {axis!r}")
+        return self.scale(
+            -1.0 if axis == "x" else 1.0,
+            -1.0 if axis == "y" else 1.0,
+            -1.0 if axis == "z" else 1.0,
+        )
+
+    def around(self, pivot):
+        """Return the same transform performed around pivot (x, y, z) instead of the origin"""
+        px, py, pz = pivot
+        return Transform().translate(-px, -py, -pz).then(self).translate(px, py, pz)
+
+    def is_identity(self):
+        return self.matrix == _IDENTITY_MATRIX
+
+    def translation(self):
+        """(x, y, z) offset if the transform is a pure translation, otherwise None"""
+        m = self.matrix
+        if (m[0], m[1], m[2], m[4], m[5], m[6], m[8], m[9], m[10]) == (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0):
+            return (m[3], m[7], m[11])
+        return None
+
+    def transform_point(self, x, y, z):
+        """Transform a single point and return (x, y, z)"""
+        m = self.matrix
+        return (
+            m[0] * x + m[1] * y + m[2] * z + m[3],
+            m[4] * x + m[5] * y + m[6] * z + m[7],
+            m[8] * x + m[9] * y + m[10] * z + m[11],
+        )
+
+    def _axis_scales(self):
+        """Length of each transformed unit axis - how much a block stretches along its own axes"""
+        m = self.matrix
+        return tuple(
+            math.sqrt(m[c] ** 2 + m[4 + c] ** 2 + m[8 + c] ** 2)
+            for c in range(3)
+        )
+
+    def _display_rotation(self):
+        """
+        Rotation part of the linear matrix (3x3), or None if there is none
+
+        Scale is divided out and the axes re-orthogonalized. A mirror cannot be
+        shown on a block display, so it is folded into the block's own axis that
+        leaves the orientation closest to unrotated (cubes look the same mirrored).
+        """
+        m = self.matrix
+        columns = [(m[c], m[4 + c], m[8 + c]) for c in range(3)]
+        det = (
+            m[0] * (m[5] * m[10] - m[6] * m[9])
+            - m[1] * (m[4] * m[10] - m[6] * m[8])
+            + m[2] * (m[4] * m[9] - m[5] * m[8])
+        )
+        if det == 0:
+            return None
+
+        candidates = [columns]
+        if det < 0:
+            candidates = [
+                [tuple(-v for v in col) if c == k else col for c, col in enumerate(columns)]
+                for k in range(3)
+            ]
+        rotation = max(
+            (_orthonormalize(cols) for cols in candidates),
+            key=lambda r: r[0] + r[4] + r[8],
+        )
+        if all(abs(a - b) < 1e-9 for a, b in zip(rotation, (1, 0, 0, 0, 1, 0, 0, 0, 1))):
+            return None
+        return rotation
+
+    def apply(self, blocks, pivot=None, in_place=False):
+        """
+        Apply the transform to a list of blocks in a single pass
+
+        Args:
+            blocks: List of block dictionaries
+            pivot: None to transform around the origin, (x, y, z) for a fixed
+                   point, "center" for the bounding box center, or "min" to keep
+                   the bounding box min corner where it was
+            in_place: Modify the block dictionaries instead of returning copies
+
+        Returns:
+            List of transformed blocks. Positions move, "scale" stretches with the
+            transform and "rotation" is composed with the transform's rotation.
+        """
+        if not blocks:
+            return blocks if in_place else []
+
+        xs = [block["x"] for block in blocks]
+        ys = [block["y"] for block in blocks]
+        zs = [block["z"] for block in blocks]
+
+        transform = self
+        if pivot == "center":
+            transform = self.around((
+                (min(xs) + max(xs)) / 2,
+                (min(ys) + max(ys)) / 2,
+                (min(zs) + max(zs)) / 2,
+            ))
+        elif pivot is not None and pivot != "min":
+            transform = self.around(pivot)
+
+        m = transform.matrix
+        new_x = [m[0] * x + m[1] * y + m[2] * z + m[3] for x, y, z in zip(xs, ys, zs)]
+        new_y = [m[4] * x + m[5] * y + m[6] * z + m[7] for x, y, z in zip(xs, ys, zs)]
+        new_z = [m[8] * x + m[9] * y + m[10] * z + m[11] for x, y, z in zip(xs, ys, zs)]
+
+        dx = dy = dz = 0.0
+        if pivot == "min":
+            dx = min(xs) - min(new_x)
+            dy = min(ys) - min(new_y)
+            dz = min(zs) - min(new_z)
+
+        fx, fy, fz = self._axis_scales()
+        rescale = any(abs(f - 1.0) > 1e-9 for f in (fx, fy, fz))
+        rotation = self._display_rotation()
+        if rotation is not None:
+            unrotated = _matrix3_to_euler(rotation)
+            composed = {}
+
+        result = blocks if in_place else []
+        for i, block in enumerate(blocks):
+            target = block if in_place else dict(block)
+            target["x"] = round(new_x[i] + dx, 3)
+            target["y"] = round(new_y[i] + dy, 3)
+            target["z"] = round(new_z[i] + dz, 3)
+
+            if rescale and block.get("scale"):
+                sx, sy, sz = block["scale"]
+                target["scale"] = [round(sx * fx, 3), round(sy * fy, 3), round(sz * fz, 3)]
+
+            if rotation is not None:
+                current = block.get("rotation")
+                if not current:
+                    target["rotation"] = list(unrotated)
+                else:
+                    key = tuple(current)
+                    if key not in composed:
+                        composed[key] = _matrix3_to_euler(
+                            _matrix3_multiply(rotation, _euler_to_matrix3(*key))
+                        )
+                    target["rotation"] = list(composed[key])
+
+            if not in_place:
+                result.append(target)
+
+        return result
+
+def transform_blocks(blocks, rotate=(0, 0, 0), quaternion=None, translate=(0, 0, 0),
+                     scale=1.0, mirror=None, pivot="center"):
+    """
+    Rotate, scale, mirror and move blocks in one pass (returns new blocks)
+
+    Steps are applied in the order mirror, scale, rotate, translate.
+
+    Args:
+        blocks: List of block dictionaries (not modified)
+        rotate: (pitch, yaw, roll) in degrees around X, Y, Z - any angle
+        quaternion: Optional (x, y, z, w) rotation, applied after rotate
+        translate: (x, y, z) offset
+        scale: Uniform scale, or (sx, sy, sz)
+        mirror: Optional axis name ("x", "y", "z") or list of axis names
+        pivot: "center" (bounding box center), "min", None (origin) or (x, y, z)
+
+    Returns:
+        New list of transformed blocks
+
+    Use for:
+        - Tilting wings, fins or arms by any angle (e.g. 30 degrees)
+        - Making a mirrored copy of a part for the other side
+        - Placing resized copies of a part
+    """
+    transform = Transform()
+    if mirror:
+        for axis in ([mirror] if isinstance(mirror, str) else mirror):
+            transform = transform.mirror(axis)
+    if isinstance(scale, (int, float)):
+        if scale != 1.0:
+            transform = transform.scale(scale)
+    else:
+        transform = transform.scale(*scale)
+    transform = transform.rotate(*rotate)
+    if quaternion is not None:
+        transform = transform.rotate_quaternion(quaternion)
+    # Translation is applied after the pivot so it is a plain offset
+    moved = transform.apply(blocks, pivot=pivot)
+    if any(translate):
+        moved = Transform().translate(*translate).apply(moved, in_place=True)
+    return moved
+
 def rotate_blocks_x(blocks, degrees):
     """
     Rotate blocks around X axis (pitch/tilt)
-    Uses exact 90-degree rotations with integer coordinate swapping
+    The bounding box min corner stays in place
 
     Args:
         blocks: List of block dictionaries to rotate (modified in place)
-        degrees: Rotation angle (90, -90, 180, or -180)
+        degrees: Rotation angle (any angle, e.g. 90, -45, 180)
 
     Returns:
         blocks (modified in place)
@@ -1189,52 +2894,16 @@ def rotate_blocks_x(blocks, degrees):
         - Rotating shells/domes to face forward/backward
         - Angling wings or fins
     """
-    if degrees not in [90, -90, 180, -180]:
-        print(f"Warning: rotate_blocks_x only supports 90-degree increments, got {degrees}")
-        return blocks
-
-    if not blocks:
-        return blocks
-
-    # Find bounding box to rotate around center
-    min_y = min(block["y"] for block in blocks)
-    max_y = max(block["y"] for block in blocks)
-    min_z = min(block["z"] for block in blocks)
-    max_z = max(block["z"] for block in blocks)
-
-    for block in blocks:
-        # Translate to origin (use min corner as pivot)
-        y = block["y"] - min_y
-        z = block["z"] - min_z
-
-        # Apply rotation (coordinate swapping for exact 90-degree rotations)
-        if degrees == 90:
-            # Rotate 90° around X: Y→Z, Z→-Y
-            new_y = (max_z - min_z) - z
-            new_z = y
-        elif degrees == -90:
-            # Rotate -90° around X: Y→-Z, Z→Y
-            new_y = z
-            new_z = (max_y - min_y) - y
-        elif degrees == 180 or degrees == -180:
-            # Rotate 180° around X: Y→-Y, Z→-Z
-            new_y = (max_y - min_y) - y
-            new_z = (max_z - min_z) - z
-
-        # Translate back
-        block["y"] = new_y + min_y
-        block["z"] = new_z + min_z
-
-    return blocks
+    return Transform().rotate(x=degrees).apply(blocks, pivot="min", in_place=True)
 
 def rotate_blocks_y(blocks, degrees):
     """
     Rotate blocks around Y axis (yaw/turn)
-    Uses exact 90-degree rotations with integer coordinate swapping
+    The bounding box min corner stays in place
 
     Args:
         blocks: List of block dictionaries to rotate (modified in place)
-        degrees: Rotation angle (90, -90, 180, or -180)
+        degrees: Rotation angle (any angle, e.g. 90, -45, 180)
 
     Returns:
         blocks (modified in place)
@@ -1244,52 +2913,17 @@ def rotate_blocks_y(blocks, degrees):
         - Changing facing direction
         - Rotating limbs around vertical axis
     """
-    if degrees not in [90, -90, 180, -180]:
-        print(f"Warning: rotate_blocks_y only supports 90-degree increments, got {degrees}")
-        return blocks
-
-    if not blocks:
-        return blocks
-
-    # Find bounding box
-    min_x = min(block["x"] for block in blocks)
-    max_x = max(block["x"] for block in blocks)
-    min_z = min(block["z"] for block in blocks)
-    max_z = max(block["z"] for block in blocks)
-
-    for block in blocks:
-        # Translate to origin
-        x = block["x"] - min_x
-        z = block["z"] - min_z
-
-        # Apply rotation
-        if degrees == 90:
-            # Rotate 90° around Y: X→-Z, Z→X
-            new_x = (max_z - min_z) - z
-            new_z = x
-        elif degrees == -90:
-            # Rotate -90° around Y: X→Z, Z→-X
-            new_x = z
-            new_z = (max_x - min_x) - x
-        elif degrees == 180 or degrees == -180:
-            # Rotate 180° around Y: X→-X, Z→-Z
-            new_x = (max_x - min_x) - x
-            new_z = (max_z - min_z) - z
-
-        # Translate back
-        block["x"] = new_x + min_x
-        block["z"] = new_z + min_z
-
-    return blocks
+    # Positive degrees turn clockwise seen from above, like Minecraft yaw
+    return Transform().rotate(y=-degrees).apply(blocks, pivot="min", in_place=True)
 
 def rotate_blocks_z(blocks, degrees):
     """
     Rotate blocks around Z axis (roll)
-    Uses exact 90-degree rotations with integer coordinate swapping
+    The bounding box min corner stays in place
 
     Args:
         blocks: List of block dictionaries to rotate (modified in place)
-        degrees: Rotation angle (90, -90, 180, or -180)
+        degrees: Rotation angle (any angle, e.g. 90, -45, 180)
 
     Returns:
         blocks (modified in place)
@@ -1299,44 +2933,1659 @@ def rotate_blocks_z(blocks, degrees):
         - Tilting wings or surfaces
         - Rotating flat objects
     """
-    if degrees not in [90, -90, 180, -180]:
-        print(f"Warning: rotate_blocks_z only supports 90-degree increments, got {degrees}")
-        return blocks
+    return Transform().rotate(z=degrees).apply(blocks, pivot="min", in_place=True)
+
+# ---------------------------------------------------------------------------
+# Binary model format
+# ---------------------------------------------------------------------------
+#
+# A compact alternative to the JSON block list. Little-endian layout:
+#
+#   header:  b"BCVX", u8 version, u8 compression (0 none, 1 zlib, 2 zstd),
+#            u16 reserved, u32 body length before compression
+#   body:    u32 block count
+#            u16 quantum multiplier, u32 quantum denominator,
+#            i32 x3 origin (in quanta)
+#            u16 palette size, then per entry: u16 + UTF-8 block ID,
+#                                               u16 + UTF-8 properties JSON
+#            material runs:   u32 count, then (u32 length, u16 palette index)
+#            positions:       i16[count] x, then y, then z (quanta from origin)
+#            scale runs:      u32 count, then (u32 length, u8 present, u32 x3 in 1/10000)
+#            brightness runs: u32 count, then (u32 length, u8 present, u8 sky, u8 block)
+#            rotation runs:   u32 count, then (u32 length, u8 present, i32 x3 millidegrees)
+#
+# Version 2 holds an InstancedModel: the body above for its loose blocks, then
+#
+#            parts:     u16 count, then per part: u16 + UTF-8 name, u32 length + body
+#            instances: u32 count, then (u16 part index, u8 kind, f64 values)
+#                       kind 0 is a translation (3 values), kind 1 the top three
+#                       rows of the transform matrix (12 values)
+#
+# Plain block lists are still written as version 1.
+#
+# Positions are stored in quanta of multiplier/denominator units: 0.001 (the
+# precision of the JSON output) whenever the model fits in int16 range around
+# its center, doubling as needed for very large models - but only while the
+# rounding moves no block by more than _MAX_POSITION_ERROR of the model's
+# smallest block. Models that would need a coarser quantum raise ValueError.
+# Anything other than block, properties, x/y/z, scale, brightness and
+# rotation is not stored.
+
+BINARY_MODEL_MAGIC = b"BCVX"
+BINARY_MODEL_VERSION = 1
+INSTANCED_BINARY_MODEL_VERSION = 2
+_COMPRESSION_CODES = {None: 0, "zlib": 1, "zstd": 2}
+_QUANTUM_DENOMINATOR = 1000
+_MAX_POSITION_ERROR = 0.005
+
+def _zstd_module():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def _runs(values):
+    """Run-length encode a sequence into [(length, value), ...]"""
+    runs = []
+    for value in values:
+        if runs and runs[-1][1] == value:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, value])
+    return runs
 
-    if not blocks:
-        return blocks
+class BinaryModel:
+    """
+    Decoded binary model kept in columns
+
+    Positions stay as int16 arrays and everything else as runs, so decoding a
+    large model allocates no per-block objects. Use to_blocks() when block
+    dictionaries are needed.
+    """
+
+    def __init__(self, count, quantum, origin, palette, material_runs,
+                 xs, ys, zs, scale_runs, brightness_runs, rotation_runs):
+        self.count = count
+        self.quantum = quantum  # (multiplier, denominator)
+        self.origin = origin
+        self.palette = palette  # [(block_id, properties or None), ...]
+        self.material_runs = material_runs
+        self.xs, self.ys, self.zs = xs, ys, zs
+        self.scale_runs = scale_runs
+        self.brightness_runs = brightness_runs
+        self.rotation_runs = rotation_runs
+
+    def __len__(self):
+        return self.count
+
+    def _expand(self, runs):
+        for length, value in runs:
+            for _ in range(length):
+                yield value
+
+    def iter_blocks(self):
+        """Yield block dictionaries one at a time"""
+        multiplier, denominator = self.quantum
+        ox, oy, oz = self.origin
+        materials = self._expand(self.material_runs)
+        scales = self._expand(self.scale_runs)
+        brightness = self._expand(self.brightness_runs)
+        rotations = self._expand(self.rotation_runs)
+
+        for x, y, z in zip(self.xs, self.ys, self.zs):
+            name, properties = self.palette[next(materials)]
+            block = {"block": name}
+            if properties:
+                block["properties"] = dict(properties)
+            block["x"] = (ox + x) * multiplier / denominator
+            block["y"] = (oy + y) * multiplier / denominator
+            block["z"] = (oz + z) * multiplier / denominator
+            scale = next(scales)
+            if scale is not None:
+                block["scale"] = [v / 10000 for v in scale]
+            light = next(brightness)
+            if light is not None:
+                block["brightness"] = {"sky": light[0], "block": light[1]}
+            rotation = next(rotations)
+            if rotation is not None:
+                block["rotation"] = [v / 1000 for v in rotation]
+            yield block
+
+    def to_blocks(self):
+        """Convert to the usual list of block dictionaries"""
+        return list(self.iter_blocks())
+
+def _encode_body(blocks):
+    """Version 1 body (uncompressed) for a list of blocks"""
+    count = len(blocks)
+    qx = [round(block["x"] * _QUANTUM_DENOMINATOR) for block in blocks]
+    qy = [round(block["y"] * _QUANTUM_DENOMINATOR) for block in blocks]
+    qz = [round(block["z"] * _QUANTUM_DENOMINATOR) for block in blocks]
+
+    multiplier = 1
+    origin = (0, 0, 0)
+    if count:
+        center = tuple((min(q) + max(q)) // 2 for q in (qx, qy, qz))
+        ranges = [(min(q), max(q)) for q in (qx, qy, qz)]
+
+        def fits(multiplier):
+            # The exact values column() stores for the extremes, rounding included
+            return all(
+                -32768 <= round(v / multiplier) - c // multiplier <= 32767
+                for (low, high), c in zip(ranges, center) for v in (low, high)
+            )
+
+        while not fits(multiplier):
+            multiplier *= 2
+        if multiplier > 65535:
+            raise ValueError("Model is too large for the binary format")
+        if multiplier > 1:
+            error = multiplier / _QUANTUM_DENOMINATOR / 2
+            smallest = min((min(block["scale"]) for block in blocks if block.get("scale")), default=1.0)
+            if error > smallest * _MAX_POSITION_ERROR:
+                span = max(high - low for low, high in ranges) / _QUANTUM_DENOMINATOR
+                raise ValueError(
+                    f"Model spans {span:g} blocks, too far for the binary format to keep blocks of {smallest:g} "
+                    f"in place (positions would be off by up to {error:g}); use the JSON block list"
+                )
+        origin = tuple(c // multiplier for c in center)
+
+    def column(values, offset):
+        if multiplier == 1:
+            return _little_endian(array("h", [v - offset for v in values]))
+        return _little_endian(array("h", [round(v / multiplier) - offset for v in values]))
+
+    palette = {}
+    materials = []
+    for block in blocks:
+        properties = block.get("properties")
+        key = (block.get("block", "minecraft:stone"), json.dumps(properties, sort_keys=True) if properties else "")
+        materials.append(palette.setdefault(key, len(palette)))
+    if len(palette) > 65535:
+        raise ValueError("Too many distinct materials for the binary format")
+
+    scales = _runs(
+        tuple(round(v * 10000) for v in block["scale"]) if block.get("scale") else None
+        for block in blocks
+    )
+    brightness = _runs(
+        (block["brightness"].get("sky", 15), block["brightness"].get("block", 0)) if block.get("brightness") else None
+        for block in blocks
+    )
+    rotations = _runs(
+        tuple(round(v * 1000) for v in block["rotation"]) if block.get("rotation") else None
+        for block in blocks
+    )
+
+    body = bytearray()
+    body += struct.pack("<IHI3i", count, multiplier, _QUANTUM_DENOMINATOR, *origin)
+    body += struct.pack("<H", len(palette))
+    for name, properties in palette:
+        for text in (name, properties):
+            encoded = text.encode("utf-8")
+            body += struct.pack("<H", len(encoded)) + encoded
+
+    material_runs = _runs(materials)
+    body += struct.pack("<I", len(material_runs))
+    for length, index in material_runs:
+        body += struct.pack("<IH", length, index)
+
+    body += column(qx, origin[0]).tobytes()
+    body += column(qy, origin[1]).tobytes()
+    body += column(qz, origin[2]).tobytes()
+
+    body += struct.pack("<I", len(scales))
+    for length, scale in scales:
+        body += struct.pack("<IB3I", length, scale is not None, *(scale or (0, 0, 0)))
+    body += struct.pack("<I", len(brightness))
+    for length, light in brightness:
+        body += struct.pack("<IB2B", length, light is not None, *(light or (0, 0)))
+    body += struct.pack("<I", len(rotations))
+    for length, rotation in rotations:
+        body += struct.pack("<IB3i", length, rotation is not None, *(rotation or (0, 0, 0)))
+    return body
+
+def encode_binary_model(blocks, compression="auto"):
+    """
+    Encode a block list in the compact binary model format
+
+    Args:
+        blocks: List of block dictionaries, or an InstancedModel (written as
+                version 2 with its instance table, see InstancedModel)
+        compression: "auto" (zstd if the zstandard package is installed,
+                     otherwise zlib), "zstd", "zlib" or None
+
+    Returns:
+        bytes
+    """
+    if compression == "auto":
+        compression = "zstd" if _zstd_module() is not None else "zlib"
+    if compression not in _COMPRESSION_CODES:
+        raise ValueError(f"Unknown compression: {compression!r}")
+    if compression == "zstd" and _zstd_module() is None:
+        raise ValueError("zstd compression needs the 'zstandard' package")
+
+    version = BINARY_MODEL_VERSION
+    if isinstance(blocks, InstancedModel):
+        version = INSTANCED_BINARY_MODEL_VERSION
+        body = _encode_instanced_body(blocks)
+    else:
+        body = _encode_body(blocks)
+
+    raw_length = len(body)
+    if compression == "zlib":
+        body = zlib.compress(bytes(body), 9)
+    elif compression == "zstd":
+        body = _zstd_module().ZstdCompressor(level=19).compress(bytes(body))
+
+    header = BINARY_MODEL_MAGIC + struct.pack("<BBHI", version, _COMPRESSION_CODES[compression], 0, raw_length)
+    return header + bytes(body)
+
+def _encode_instanced_body(model):
+    body = _encode_body(model.blocks)
+    names = list(model.parts)
+    if len(names) > 65535:
+        raise ValueError("Too many parts for the binary format")
+    body += struct.pack("<H", len(names))
+    for name in names:
+        encoded = name.encode("utf-8")
+        part = _encode_body(model.parts[name])
+        body += struct.pack("<H", len(encoded)) + encoded
+        body += struct.pack("<I", len(part)) + part
+
+    index = {name: i for i, name in enumerate(names)}
+    body += struct.pack("<I", len(model.instances))
+    for name, transform in model.instances:
+        offset = transform.translation()
+        if offset is not None:
+            body += struct.pack("<HB3d", index[name], 0, *offset)
+        else:
+            body += struct.pack("<HB12d", index[name], 1, *transform.matrix[:12])
+    return body
+
+def _decode_body(body, offset=0):
+    """Read a version 1 body starting at offset, returns (BinaryModel, end offset)"""
+
+    def read(fmt):
+        nonlocal offset
+        values = struct.unpack_from(fmt, body, offset)
+        offset += struct.calcsize(fmt)
+        return values
+
+    count, multiplier, denominator, ox, oy, oz = read("<IHI3i")
+    (palette_size,) = read("<H")
+    palette = []
+    for _ in range(palette_size):
+        texts = []
+        for _ in range(2):
+            (length,) = read("<H")
+            texts.append(body[offset:offset + length].decode("utf-8"))
+            offset += length
+        name, properties = texts
+        palette.append((name, json.loads(properties) if properties else None))
+
+    (run_count,) = read("<I")
+    material_runs = [read("<IH") for _ in range(run_count)]
+
+    columns = []
+    for _ in range(3):
+        values = array("h")
+        values.frombytes(body[offset:offset + 2 * count])
+        offset += 2 * count
+        columns.append(_little_endian(values))
+
+    (run_count,) = read("<I")
+    scale_runs = []
+    for _ in range(run_count):
+        length, present, sx, sy, sz = read("<IB3I")
+        scale_runs.append((length, (sx, sy, sz) if present else None))
+    (run_count,) = read("<I")
+    brightness_runs = []
+    for _ in range(run_count):
+        length, present, sky, light = read("<IB2B")
+        brightness_runs.append((length, (sky, light) if present else None))
+    (run_count,) = read("<I")
+    rotation_runs = []
+    for _ in range(run_count):
+        length, present, pitch, yaw, roll = read("<IB3i")
+        rotation_runs.append((length, (pitch, yaw, roll) if present else None))
+
+    model = BinaryModel(
+        count, (multiplier, denominator), (ox, oy, oz),
+        palette, material_runs, columns[0], columns[1], columns[2],
+        scale_runs, brightness_runs, rotation_runs,
+    )
+    return model, offset
+
+def _decode_instanced_body(body):
+    blocks, offset = _decode_body(body)
+    model = InstancedModel(blocks.to_blocks())
+
+    def read(fmt):
+        nonlocal offset
+        values = struct.unpack_from(fmt, body, offset)
+        offset += struct.calcsize(fmt)
+        return values
+
+    names = []
+    (part_count,) = read("<H")
+    for _ in range(part_count):
+        (length,) = read("<H")
+        name = body[offset:offset + length].decode("utf-8")
+        offset += length
+        (length,) = read("<I")
+        part, _ = _decode_body(body[offset:offset + length])
+        offset += length
+        model.define(name, part.to_blocks())
+        names.append(name)
+
+    (instance_count,) = read("<I")
+    for _ in range(instance_count):
+        index, kind = read("<HB")
+        if kind == 0:
+            model.place(names[index], Transform().translate(*read("<3d")))
+        elif kind == 1:
+            model.place(names[index], Transform(read("<12d") + (0.0, 0.0, 0.0, 1.0)))
+        else:
+            raise ValueError(f"Unknown instance kind: {kind}")
+    return model
+
+def decode_binary_model(data):
+    """
+    Decode bytes produced by encode_binary_model
+
+    Returns:
+        BinaryModel (call .to_blocks() for a list of block dictionaries), or
+        an InstancedModel for version 2 data (its to_blocks() expands it)
+    """
+    data = bytes(data)
+    if data[:4] != BINARY_MODEL_MAGIC:
+        raise ValueError("Not a binary voxel model (bad magic)")
+    version, compression, _, raw_length = struct.unpack_from("<BBHI", data, 4)
+    if version not in (BINARY_MODEL_VERSION, INSTANCED_BINARY_MODEL_VERSION):
+        raise ValueError(f"Unsupported binary model version: {version}")
+
+    body = data[12:]
+    if compression == 1:
+        body = zlib.decompress(body)
+    elif compression == 2:
+        zstandard = _zstd_module()
+        if zstandard is None:
+            raise ValueError("Model is zstd-compressed but the 'zstandard' package is not installed")
+        body = zstandard.ZstdDecompressor().decompress(body, max_output_size=raw_length)
+    elif compression != 0:
+        raise ValueError(f"Unknown compression code: {compression}")
+    if len(body) != raw_length:
+        raise ValueError("Binary model body has the wrong length")
+
+    if version == INSTANCED_BINARY_MODEL_VERSION:
+        return _decode_instanced_body(body)
+    return _decode_body(body)[0]
+
+# ---------------------------------------------------------------------------
+# Spatial index
+# ---------------------------------------------------------------------------
+#
+# VoxelIndex snaps block centers to a lattice of cell_size and buckets them in
+# 16x16x16 chunks kept in a dict. Each chunk stores two parallel arrays: the
+# sorted 12-bit local cell codes and the slots of the blocks in those cells,
+# so lookups are a dict hit plus a bisect. Several blocks may share a cell
+# when a model is not grid-aligned (ring-based shells usually are not).
+
+_CHUNK_BITS = 4
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+
+FACE_DIRECTIONS = {
+    "east": (1, 0, 0),
+    "west": (-1, 0, 0),
+    "up": (0, 1, 0),
+    "down": (0, -1, 0),
+    "south": (0, 0, 1),
+    "north": (0, 0, -1),
+}
+
+class _Chunk:
+    __slots__ = ("codes", "slots")
+
+    def __init__(self):
+        self.codes = array("H")
+        self.slots = array("I")
+
+class VoxelIndex:
+    """
+    Sparse spatial index over blocks, with point, box, nearest-neighbour and
+    face-neighbour queries
+
+    Queries return the original block dictionaries. Blocks are indexed by the
+    position they had when inserted; after moving a block, remove() it first
+    and insert() it again.
+    """
+
+    def __init__(self, blocks=(), cell_size=None):
+        """
+        Args:
+            blocks: Blocks to index
+            cell_size: Lattice spacing (default: the smallest block scale, or 1.0)
+        """
+        blocks = list(blocks)
+        if cell_size is None:
+            scales = [min(block["scale"]) for block in blocks if block.get("scale")]
+            cell_size = min(scales) if scales else 1.0
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._blocks = blocks
+        self._free = []
+        self._chunks = {}
+
+        # Batched build: one loop groups blocks by chunk, then each chunk is
+        # sorted once instead of bisect-inserting block by block
+        grouped = {}
+        for slot, block in enumerate(blocks):
+            chunk_key, code = self._locate(self.cell_of(block["x"], block["y"], block["z"]))
+            grouped.setdefault(chunk_key, []).append((code, slot))
+        for chunk_key, entries in grouped.items():
+            entries.sort()
+            chunk = self._chunks[chunk_key] = _Chunk()
+            chunk.codes.extend(code for code, _ in entries)
+            chunk.slots.extend(slot for _, slot in entries)
+        self._count = len(blocks)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return (block for block in self._blocks if block is not None)
+
+    def cell_of(self, x, y, z):
+        """Lattice cell (i, j, k) containing a point"""
+        size = self.cell_size
+        return (round(x / size), round(y / size), round(z / size))
+
+    @staticmethod
+    def _locate(cell):
+        i, j, k = cell
+        chunk_key = (i >> _CHUNK_BITS, j >> _CHUNK_BITS, k >> _CHUNK_BITS)
+        code = ((i & _CHUNK_MASK) << (2 * _CHUNK_BITS)) | ((j & _CHUNK_MASK) << _CHUNK_BITS) | (k & _CHUNK_MASK)
+        return chunk_key, code
+
+    def _cell_slots(self, cell):
+        chunk_key, code = self._locate(cell)
+        chunk = self._chunks.get(chunk_key)
+        if chunk is None:
+            return []
+        start = bisect.bisect_left(chunk.codes, code)
+        end = bisect.bisect_right(chunk.codes, code, start)
+        return chunk.slots[start:end]
+
+    def insert(self, block):
+        """Add a block to the index"""
+        if self._free:
+            slot = self._free.pop()
+            self._blocks[slot] = block
+        else:
+            slot = len(self._blocks)
+            self._blocks.append(block)
+        chunk_key, code = self._locate(self.cell_of(block["x"], block["y"], block["z"]))
+        chunk = self._chunks.get(chunk_key)
+        if chunk is None:
+            chunk = self._chunks[chunk_key] = _Chunk()
+        position = bisect.bisect_right(chunk.codes, code)
+        chunk.codes.insert(position, code)
+        chunk.slots.insert(position, slot)
+        self._count += 1
+
+    def remove(self, block):
+        """
+        Remove a block (matched by identity) from the index
+
+        Raises:
+            KeyError: If the block is not in the index
+        """
+        chunk_key, code = self._locate(self.cell_of(block["x"], block["y"], block["z"]))
+        chunk = self._chunks.get(chunk_key)
+        if chunk is not None:
+            position = bisect.bisect_left(chunk.codes, code)
+            while position < len(chunk.codes) and chunk.codes[position] == code:
+                slot = chunk.slots[position]
+                if self._blocks[slot] is block:
+                    del chunk.codes[position]
+                    del chunk.slots[position]
+                    if not chunk.codes:
+                        del self._chunks[chunk_key]
+                    self._blocks[slot] = None
+                    self._free.append(slot)
+                    self._count -= 1
+                    return
+                position += 1
+        raise KeyError("Block is not in the index")
+
+    def at(self, x, y, z):
+        """Blocks in the lattice cell containing a point"""
+        return [self._blocks[slot] for slot in self._cell_slots(self.cell_of(x, y, z))]
+
+    def in_box(self, min_corner, max_corner):
+        """Blocks whose centers lie inside an axis-aligned box (inclusive)"""
+        (x1, y1, z1), (x2, y2, z2) = min_corner, max_corner
+        low = self.cell_of(min(x1, x2), min(y1, y2), min(z1, z2))
+        high = self.cell_of(max(x1, x2), max(y1, y2), max(z1, z2))
+        found = []
+        for cx in range(low[0] >> _CHUNK_BITS, (high[0] >> _CHUNK_BITS) + 1):
+            for cy in range(low[1] >> _CHUNK_BITS, (high[1] >> _CHUNK_BITS) + 1):
+                for cz in range(low[2] >> _CHUNK_BITS, (high[2] >> _CHUNK_BITS) + 1):
+                    chunk = self._chunks.get((cx, cy, cz))
+                    if chunk is None:
+                        continue
+                    for slot in chunk.slots:
+                        block = self._blocks[slot]
+                        if (min(x1, x2) <= block["x"] <= max(x1, x2) and min(y1, y2) <= block["y"] <= max(y1, y2)
+                                and min(z1, z2) <= block["z"] <= max(z1, z2)):
+                            found.append(block)
+        return found
+
+    def nearest(self, x, y, z, k=1):
+        """
+        The k blocks closest to a point
+
+        Returns:
+            List of (distance, block), closest first
+        """
+        if not self._count or k <= 0:
+            return []
+        center = self.cell_of(x, y, z)
+        origin = (center[0] >> _CHUNK_BITS, center[1] >> _CHUNK_BITS, center[2] >> _CHUNK_BITS)
+        chunk_span = self.cell_size * (1 << _CHUNK_BITS)
+        max_ring = max(max(abs(key[axis] - origin[axis]) for axis in range(3)) for key in self._chunks)
+
+        best = []  # max-heap of (-distance², tie, block)
+        for ring in range(max_ring + 1):
+            if 24 * ring * ring > len(self._chunks):
+                # Rings now hold more keys than there are chunks: visit the rest directly
+                keys = [
+                    key for key in self._chunks
+                    if max(abs(key[axis] - origin[axis]) for axis in range(3)) >= ring
+                ]
+            else:
+                keys = self._ring_keys(origin, ring)
+            for key in keys:
+                chunk = self._chunks.get(key)
+                if chunk is None:
+                    continue
+                for slot in chunk.slots:
+                    block = self._blocks[slot]
+                    distance = (block["x"] - x) ** 2 + (block["y"] - y) ** 2 + (block["z"] - z) ** 2
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, slot, block))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, slot, block))
+
+            if 24 * ring * ring > len(self._chunks):
+                break
+            if len(best) == k:
+                # Anything outside the visited chunks is at least this far away
+                bound = min(
+                    min(p - ((o - ring) * chunk_span - self.cell_size / 2),
+                        ((o + ring + 1) * chunk_span - self.cell_size / 2) - p)
+                    for p, o in zip((x, y, z), origin)
+                )
+                if bound > 0 and bound * bound >= -best[0][0]:
+                    break
+        return [(math.sqrt(-d), block) for d, _, block in sorted(best, key=lambda item: (-item[0], item[1]))]
+
+    @staticmethod
+    def _ring_keys(origin, ring):
+        """Chunk keys at exactly this Chebyshev distance from origin"""
+        ox, oy, oz = origin
+        if ring == 0:
+            yield origin
+            return
+        for dx in range(-ring, ring + 1):
+            for dy in range(-ring, ring + 1):
+                if abs(dx) == ring or abs(dy) == ring:
+                    for dz in range(-ring, ring + 1):
+                        yield (ox + dx, oy + dy, oz + dz)
+                else:
+                    yield (ox + dx, oy + dy, oz - ring)
+                    yield (ox + dx, oy + dy, oz + ring)
+
+    def neighbours(self, block):
+        """
+        Blocks in the six face-adjacent cells
+
+        Returns:
+            Dictionary of direction name (see FACE_DIRECTIONS) -> list of blocks
+        """
+        i, j, k = self.cell_of(block["x"], block["y"], block["z"])
+        return {
+            name: [self._blocks[slot] for slot in self._cell_slots((i + dx, j + dy, k + dz))]
+            for name, (dx, dy, dz) in FACE_DIRECTIONS.items()
+        }
+
+    def exposed_faces(self, block):
+        """Names of the block's faces with no neighbouring block"""
+        return [name for name, found in self.neighbours(block).items() if not found]
+
+# ---------------------------------------------------------------------------
+# Model diff
+# ---------------------------------------------------------------------------
+
+_BLOCK_FIELDS = ("block", "properties", "scale", "brightness", "rotation")
+
+def _same_block(a, b, tolerance):
+    """Equal apart from position, with numeric lists compared within tolerance"""
+    for field in _BLOCK_FIELDS:
+        left, right = a.get(field), b.get(field)
+        if isinstance(left, (list, tuple)) and isinstance(right, (list, tuple)):
+            if len(left) != len(right) or any(abs(p - q) > tolerance for p, q in zip(left, right)):
+                return False
+        elif (left or None) != (right or None):
+            return False
+    return True
+
+def diff_models(old, new, tolerance=0.001):
+    """
+    Compare two versions of a model block by block
+
+    Blocks are matched by position: a new block pairs with an unmatched old
+    block whose center is within tolerance on every axis, preferring one
+    that is otherwise identical, then the closest.
+
+    Args:
+        old: Previous block list
+        new: Current block list
+        tolerance: Largest per-axis position (and scale/rotation) difference
+                   still treated as the same value
+
+    Returns:
+        Dictionary with "added" (new blocks), "removed" (old blocks),
+        "changed" and "unchanged" (lists of (old, new) pairs)
+    """
+    cell = max(tolerance, 1e-9)
+    grid = {}
+    for slot, block in enumerate(old):
+        key = (math.floor(block["x"] / cell), math.floor(block["y"] / cell), math.floor(block["z"] / cell))
+        grid.setdefault(key, []).append(slot)
+
+    matched = [False] * len(old)
+    result = {"added": [], "removed": [], "changed": [], "unchanged": []}
+    for block in new:
+        x, y, z = block["x"], block["y"], block["z"]
+        cx, cy, cz = math.floor(x / cell), math.floor(y / cell), math.floor(z / cell)
+        best = None
+        best_rank = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for slot in grid.get((cx + dx, cy + dy, cz + dz), ()):
+                        if matched[slot]:
+                            continue
+                        candidate = old[slot]
+                        offsets = (abs(candidate["x"] - x), abs(candidate["y"] - y), abs(candidate["z"] - z))
+                        if max(offsets) > tolerance:
+                            continue
+                        rank = (not _same_block(candidate, block, tolerance), sum(d * d for d in offsets), slot)
+                        if best_rank is None or rank < best_rank:
+                            best, best_rank = slot, rank
+        if best is None:
+            result["added"].append(block)
+            continue
+        matched[best] = True
+        pair = (old[best], block)
+        result["changed" if best_rank[0] else "unchanged"].append(pair)
+
+    result["removed"] = [block for slot, block in enumerate(old) if not matched[slot]]
+    return result
+
+# ---------------------------------------------------------------------------
+# Scene graph
+# ---------------------------------------------------------------------------
+#
+# A model as a tree of named parts instead of one generate() program.
+# SceneNode is one primitive call (primitive, parameters, material and
+# transform); SceneGroup holds nodes and other groups under a shared
+# transform. Every node keeps its blocks together with the inputs they came
+# from, so after an edit only the changed node and the groups above it do any
+# work. Scenes round-trip through plain JSON, for storage next to the blocks.
+
+SCENE_VERSION = 1
+_SCENE_TRANSFORM_KEYS = {"rotate", "quaternion", "translate", "scale", "mirror", "pivot"}
+_scene_ids = itertools.count()
+
+def _scene_primitive(name):
+    func = globals().get(name) if isinstance(name, str) and name.startswith("create_") else None
+    if not callable(func):
+        raise ValueError(f"Unknown primitive: {name!r}")
+    return func
+
+def _check_scene_transform(transform):
+    unknown = set(transform or ()) - _SCENE_TRANSFORM_KEYS
+    if unknown:
+        raise ValueError(f"Unknown transform keys {sorted(unknown)}, expected {sorted(_SCENE_TRANSFORM_KEYS)}")
+
+def _scene_key(*parts):
+    return json.dumps(parts, sort_keys=True, separators=(",", ":"), default=repr)
+
+def _copy_block(block):
+    copy = dict(block)
+    for field, value in block.items():
+        if isinstance(value, list):
+            copy[field] = list(value)
+        elif isinstance(value, dict):
+            copy[field] = dict(value)
+    return copy
+
+class SceneNode:
+    """
+    One primitive call in a scene, with its blocks cached by its inputs
+
+    Edit params, material or transform directly or through set(); the next
+    blocks() call notices the change and runs the primitive again.
+    """
+
+    def __init__(self, name, primitive, params=None, material=None, transform=None):
+        """
+        Args:
+            name: Name, unique among the node's siblings
+            primitive: Primitive function name, e.g. "create_sphere"
+            params: Keyword arguments for the primitive, without the material
+            material: Material keyword arguments, e.g. {"color": "red", "block_material": "wool"}
+            transform: transform_blocks() keyword arguments (rotate, translate, scale, ...)
+        """
+        _scene_primitive(primitive)
+        _check_scene_transform(transform)
+        self.name = name
+        self.primitive = primitive
+        self.params = dict(params or {})
+        self.material = dict(material or {})
+        self.transform = dict(transform or {})
+        self.revision = 0
+        self._id = next(_scene_ids)
+        self._key = None
+        self._blocks = None
+
+    def __repr__(self):
+        return f"SceneNode({self.name!r}, {self.primitive!r})"
+
+    def set(self, **params):
+        """Update primitive parameters and return the node"""
+        self.params.update(params)
+        return self
+
+    def blocks(self):
+        """Blocks of this node, shared with the cache - copy before modifying them"""
+        key = _scene_key(self.primitive, self.params, self.material, self.transform)
+        if key != self._key:
+            _check_scene_transform(self.transform)
+            blocks = _scene_primitive(self.primitive)(**self.params, **self.material)
+            if self.transform:
+                blocks = transform_blocks(blocks, **self.transform)
+            self._key, self._blocks = key, blocks
+            self.revision += 1
+        return self._blocks
+
+    def to_dict(self):
+        return {
+            "type": "node",
+            "name": self.name,
+            "primitive": self.primitive,
+            "params": self.params,
+            "material": self.material,
+            "transform": self.transform,
+        }
+
+class SceneGroup:
+    """
+    Named parts (nodes and groups) combined under one transform
+
+    With no transform, or a transform with a fixed pivot (pivot=None or
+    (x, y, z)), every child is transformed on its own and cached, so editing
+    one child only moves that child's blocks again. Pivots "center" and "min"
+    (transform_blocks' default is "center") depend on the whole group, so any
+    edit transforms the whole group again.
+    """
+
+    def __init__(self, name="root", children=(), transform=None):
+        """
+        Args:
+            name: Name, unique among the group's siblings
+            children: SceneNode and SceneGroup parts
+            transform: transform_blocks() keyword arguments for the whole group
+        """
+        _check_scene_transform(transform)
+        self.name = name
+        self.children = []
+        self.transform = dict(transform or {})
+        self.revision = 0
+        self._id = next(_scene_ids)
+        self._key = None
+        self._blocks = None
+        self._parts = {}
+        for child in children:
+            self.add(child)
+
+    def __repr__(self):
+        return f"SceneGroup({self.name!r}, {len(self.children)} children)"
+
+    def __getitem__(self, name):
+        for child in self.children:
+            if child.name == name:
+                return child
+        raise KeyError(name)
+
+    def add(self, child):
+        """Add a node or group and return it"""
+        if any(existing.name == child.name for existing in self.children):
+            raise ValueError(f"{self.name!r} already has a part named {child.name!r}")
+        self.children.append(child)
+        return child
+
+    def remove(self, name):
+        """Remove the part called name and return it"""
+        child = self[name]
+        self.children.remove(child)
+        return child
+
+    def find(self, path):
+        """Part at a "/"-separated path below this group, e.g. "car/wheels/front_left" """
+        part = self
+        for name in path.strip("/").split("/"):
+            if not isinstance(part, SceneGroup):
+                raise KeyError(path)
+            part = part[name]
+        return part
+
+    def nodes(self):
+        """Yield (path, node) for every node below this group"""
+        for child in self.children:
+            if isinstance(child, SceneGroup):
+                for path, node in child.nodes():
+                    yield f"{child.name}/{path}", node
+            else:
+                yield child.name, child
+
+    def blocks(self):
+        """Blocks of the whole group, shared with the caches - copy before modifying them"""
+        parts = [(child, child.blocks()) for child in self.children]
+        transform_key = _scene_key(self.transform)
+        key = (transform_key, tuple((child._id, child.revision) for child, _ in parts))
+        if key == self._key:
+            return self._blocks
+
+        _check_scene_transform(self.transform)
+        pivot = self.transform.get("pivot", "center")
+        combined = []
+        if not self.transform or not isinstance(pivot, str):
+            cache = {}
+            for child, blocks in parts:
+                cached = self._parts.get(child._id)
+                if cached is None or cached[0] != (child.revision, transform_key):
+                    moved = transform_blocks(blocks, **self.transform) if self.transform else blocks
+                    cached = ((child.revision, transform_key), moved)
+                cache[child._id] = cached
+                combined.extend(cached[1])
+            self._parts = cache
+        else:
+            for _, blocks in parts:
+                combined.extend(blocks)
+            combined = transform_blocks(combined, **self.transform)
+            self._parts = {}
+
+        self._key, self._blocks = key, combined
+        self.revision += 1
+        return combined
+
+    def to_blocks(self):
+        """Fresh block dictionaries for the whole group, safe to modify"""
+        return [_copy_block(block) for block in self.blocks()]
+
+    def to_dict(self):
+        return {
+            "type": "group",
+            "name": self.name,
+            "transform": self.transform,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+def _scene_part(data):
+    kind = data.get("type")
+    if kind == "node":
+        return SceneNode(data["name"], data["primitive"], data.get("params"), data.get("material"),
+                         data.get("transform"))
+    if kind == "group":
+        return SceneGroup(data["name"], [_scene_part(child) for child in data.get("children", [])],
+                          data.get("transform"))
+    raise ValueError(f"Unknown scene part type: {kind!r}")
+
+def scene_to_json(root):
+    """Serialize a scene (its root SceneGroup) to a JSON string"""
+    return json.dumps({"version": SCENE_VERSION, "root": root.to_dict()}, separators=(",", ":"))
+
+def scene_from_json(data):
+    """
+    Rebuild a scene from scene_to_json() output
+
+    Args:
+        data: JSON string or the already parsed dictionary
+
+    Returns:
+        The root SceneGroup
+    """
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    if data.get("version") != SCENE_VERSION:
+        raise ValueError(f"Unsupported scene version: {data.get('version')}")
+    return _scene_part(data["root"])
+
+# ---------------------------------------------------------------------------
+# Level of detail
+# ---------------------------------------------------------------------------
+#
+# Far-away copies or small decorations don't need every block of a big model.
+# downsample_blocks() sorts the model into an octree: leaf cells are the size
+# of its most common block, each level up merges 8 cells into one cube twice
+# as wide, and every occupied cell becomes a single block of the material
+# covering most of it. Each level cuts the block count by about 4x for shells
+# and 8x for solid parts.
+
+def _lod_base_cell(blocks):
+    """Most common block size (largest scale component), used as the leaf cell"""
+    counts = {}
+    for block in blocks:
+        size = max(block.get("scale") or (1.0, 1.0, 1.0))
+        counts[size] = counts.get(size, 0) + 1
+    return max(counts, key=counts.get)
 
-    # Find bounding box
-    min_x = min(block["x"] for block in blocks)
-    max_x = max(block["x"] for block in blocks)
-    min_y = min(block["y"] for block in blocks)
-    max_y = max(block["y"] for block in blocks)
+def _lod_offset(blocks, cell):
+    """
+    Offset of the model's block lattice from the origin, per axis
 
+    The most common position modulo the cell size, so the octree's leaf
+    cells line up with the blocks (x/z are centers, y is the bottom).
+    """
+    counts = {}
     for block in blocks:
-        # Translate to origin
-        x = block["x"] - min_x
-        y = block["y"] - min_y
-
-        # Apply rotation
-        if degrees == 90:
-            # Rotate 90° around Z: X→Y, Y→-X
-            new_x = (max_y - min_y) - y
-            new_y = x
-        elif degrees == -90:
-            # Rotate -90° around Z: X→-Y, Y→X
-            new_x = y
-            new_y = (max_x - min_x) - x
-        elif degrees == 180 or degrees == -180:
-            # Rotate 180° around Z: X→-X, Y→-Y
-            new_x = (max_x - min_x) - x
-            new_y = (max_y - min_y) - y
-
-        # Translate back
-        block["x"] = new_x + min_x
-        block["y"] = new_y + min_y
+        offset = tuple(round(block[axis] % cell, 4) % cell for axis in ("x", "y", "z"))
+        counts[offset] = counts.get(offset, 0) + 1
+    return max(counts, key=counts.get)
+
+def _lod_axis_cells(center, size, cell):
+    """
+    Leaf cell indices a block covers along one axis
+
+    Leaf cell i is centered on i * cell (relative to the lattice offset), so
+    blocks on the lattice land in one cell each. Only blocks bigger than a
+    cell cover several.
+    """
+    count = max(1, round(size / cell))
+    first = math.floor((center - (count - 1) * cell / 2) / cell + 0.5 + 1e-6)
+    return range(first, first + count)
+
+def _lod_leaves(blocks, cell, offset):
+    """
+    Leaf cells of the octree, on the lattice through offset (see _lod_offset)
 
+    Returns:
+        (cells, materials) - cells maps (i, j, k) to {material key: covered
+        volume}, materials maps a material key to its (block, properties,
+        brightness)
+    """
+    cells = {}
+    materials = {}
+    for block in blocks:
+        properties = block.get("properties") or None
+        brightness = block.get("brightness") or None
+        key = (
+            block["block"],
+            tuple(sorted(properties.items())) if properties else None,
+            (brightness.get("sky", 15), brightness.get("block", 0)) if brightness else None,
+        )
+        if key not in materials:
+            materials[key] = (block["block"], properties, brightness)
+
+        sx, sy, sz = block.get("scale") or (1.0, 1.0, 1.0)
+        ox, oy, oz = offset
+        xs = _lod_axis_cells(block["x"] - ox, sx, cell)
+        # y is the bottom: the lowest leaf a tall block covers starts at it
+        ys = _lod_axis_cells(block["y"] - oy + (sy - cell) / 2, sy, cell)
+        zs = _lod_axis_cells(block["z"] - oz, sz, cell)
+        weight = sx * sy * sz / (len(xs) * len(ys) * len(zs))
+        for i in xs:
+            for j in ys:
+                for k in zs:
+                    weights = cells.get((i, j, k))
+                    if weights is None:
+                        weights = cells[(i, j, k)] = {}
+                    weights[key] = weights.get(key, 0.0) + weight
+    return cells, materials
+
+def _lod_parent(cells):
+    """Merge each 2x2x2 group of cells into one cell of the next level"""
+    parents = {}
+    for (i, j, k), weights in cells.items():
+        parent_key = (i >> 1, j >> 1, k >> 1)
+        merged = parents.get(parent_key)
+        if merged is None:
+            parents[parent_key] = dict(weights)
+        else:
+            for key, weight in weights.items():
+                merged[key] = merged.get(key, 0.0) + weight
+    return parents
+
+def _lod_blocks(cells, materials, cell, level, offset):
+    """One block per occupied cell of an octree level, with the majority material"""
+    span = 2 ** level
+    size = round(cell * span, 3)
+    # Cell i of this level holds leaf cells i * span .. i * span + span - 1:
+    # centered on their middle along x/z, standing on the lowest along y
+    middle = (span - 1) / 2
+    ox, oy, oz = offset
+    blocks = []
+    for (i, j, k) in sorted(cells):
+        weights = cells[(i, j, k)]
+        name, properties, brightness = materials[max(weights, key=weights.get)]
+        block = {
+            "block": name,
+            "x": round((i * span + middle) * cell + ox, 3),
+            "y": round(j * span * cell + oy, 3),
+            "z": round((k * span + middle) * cell + oz, 3),
+            "scale": [size, size, size],
+        }
+        if properties:
+            block["properties"] = dict(properties)
+        if brightness:
+            block["brightness"] = dict(brightness)
+        blocks.append(block)
     return blocks
 
+def downsample_blocks(blocks, level=1, cell_size=None):
+    """
+    One level-of-detail version of a model
+
+    Args:
+        blocks: List of block dictionaries
+        level: Octree level - blocks become cubes of cell_size * 2**level
+               (level 0 returns the blocks unchanged)
+        cell_size: Leaf cell size (default: the most common block size)
+
+    Returns:
+        New list of blocks, one per occupied cell, using the material that
+        covers most of the cell. Block rotations are dropped.
+    """
+    if level <= 0 or not blocks:
+        return list(blocks)
+    cell = cell_size or _lod_base_cell(blocks)
+    offset = _lod_offset(blocks, cell)
+    cells, materials = _lod_leaves(blocks, cell, offset)
+    for _ in range(level):
+        cells = _lod_parent(cells)
+    return _lod_blocks(cells, materials, cell, level, offset)
+
+def build_lods(blocks, targets, cell_size=None):
+    """
+    Level-of-detail variants for a list of target block counts
+
+    The octree is built once and walked up level by level, so asking for
+    several targets costs little more than the coarsest one.
+
+    Args:
+        blocks: List of block dictionaries
+        targets: Block counts, e.g. [20000, 5000, 1000]
+        cell_size: Leaf cell size (default: the most common block size)
+
+    Returns:
+        List of (level, blocks), one per target: the finest level with at most
+        that many blocks (level 0 is the model itself). A target below what
+        the octree can reach gets the coarsest level.
+    """
+    if not blocks:
+        return [(0, []) for _ in targets]
+    cell = cell_size or _lod_base_cell(blocks)
+    offset = _lod_offset(blocks, cell)
+    cells, materials = _lod_leaves(blocks, cell, offset)
+
+    counts = [(0, len(blocks))]
+    levels = [cells]
+    while targets and counts[-1][1] > max(1, min(targets)):
+        cells = _lod_parent(cells)
+        if len(cells) >= counts[-1][1]:
+            break
+        levels.append(cells)
+        counts.append((len(levels) - 1, len(cells)))
+
+    result = []
+    built = {0: list(blocks)}
+    for target in targets:
+        level = next((level for level, count in counts if count <= target), counts[-1][0])
+        if level not in built:
+            built[level] = _lod_blocks(levels[level], materials, cell, level, offset)
+        result.append((level, built[level]))
+    return result
+
+# ---------------------------------------------------------------------------
+# Procedural noise
+# ---------------------------------------------------------------------------
+#
+# Seeded noise for rock, bark and terrain detail. Lattice values come from an
+# integer hash of (cell, seed) instead of the random module, so a seed always
+# gives the same model, on every machine and in any call order. Every
+# function takes a whole list of points or blocks at once and looks up each
+# lattice corner / feature point only once for the whole list.
+
+_NOISE_GRADIENTS = (
+    (1, 1, 0), (-1, 1, 0), (1, -1, 0), (-1, -1, 0),
+    (1, 0, 1), (-1, 0, 1), (1, 0, -1), (-1, 0, -1),
+    (0, 1, 1), (0, -1, 1), (0, 1, -1), (0, -1, -1),
+)
+
+def _lattice_hash(x, y, z, seed):
+    """32-bit hash of an integer lattice point"""
+    h = (x * 0x8DA6B343 ^ y * 0xD8163841 ^ z * 0xCB1AB31F ^ (seed + 1) * 0x165667B1) & 0xFFFFFFFF
+    h ^= h >> 15
+    h = (h * 0x2C1B3C6D) & 0xFFFFFFFF
+    h ^= h >> 12
+    h = (h * 0x297A2D39) & 0xFFFFFFFF
+    return h ^ (h >> 15)
+
+def _noise_points(items, frequency):
+    """(x, y, z) tuples scaled by frequency, from points or block dictionaries"""
+    points = []
+    for item in items:
+        if isinstance(item, dict):
+            points.append((item["x"] * frequency, item["y"] * frequency, item["z"] * frequency))
+        else:
+            x, y, z = item
+            points.append((x * frequency, y * frequency, z * frequency))
+    return points
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+def _lattice_noise(points, corner_value):
+    """Smoothly interpolate per-corner values; corner_value(ix, iy, iz, fx, fy, fz) -> float"""
+    values = []
+    for x, y, z in points:
+        ix, iy, iz = math.floor(x), math.floor(y), math.floor(z)
+        fx, fy, fz = x - ix, y - iy, z - iz
+        u, v, w = _fade(fx), _fade(fy), _fade(fz)
+        c000 = corner_value(ix, iy, iz, fx, fy, fz)
+        c100 = corner_value(ix + 1, iy, iz, fx - 1, fy, fz)
+        c010 = corner_value(ix, iy + 1, iz, fx, fy - 1, fz)
+        c110 = corner_value(ix + 1, iy + 1, iz, fx - 1, fy - 1, fz)
+        c001 = corner_value(ix, iy, iz + 1, fx, fy, fz - 1)
+        c101 = corner_value(ix + 1, iy, iz + 1, fx - 1, fy, fz - 1)
+        c011 = corner_value(ix, iy + 1, iz + 1, fx, fy - 1, fz - 1)
+        c111 = corner_value(ix + 1, iy + 1, iz + 1, fx - 1, fy - 1, fz - 1)
+        x00 = c000 + u * (c100 - c000)
+        x10 = c010 + u * (c110 - c010)
+        x01 = c001 + u * (c101 - c001)
+        x11 = c011 + u * (c111 - c011)
+        y0 = x00 + v * (x10 - x00)
+        y1 = x01 + v * (x11 - x01)
+        values.append(y0 + w * (y1 - y0))
+    return values
+
+def value_noise(points, seed=0, frequency=1.0):
+    """
+    Smoothly interpolated random values on an integer lattice
+
+    Args:
+        points: (x, y, z) tuples or block dictionaries
+        seed: Integer seed
+        frequency: Lattice cells per unit (higher = finer detail)
+
+    Returns:
+        One value in [-1, 1] per point
+    """
+    corners = {}
+
+    def corner_value(ix, iy, iz, fx, fy, fz):
+        key = (ix, iy, iz)
+        value = corners.get(key)
+        if value is None:
+            value = corners[key] = _lattice_hash(ix, iy, iz, seed) / 0x7FFFFFFF - 1.0
+        return value
+
+    return _lattice_noise(_noise_points(points, frequency), corner_value)
+
+def perlin_noise(points, seed=0, frequency=1.0):
+    """
+    Gradient (improved Perlin) noise - smoother and less blocky than value noise
+
+    Args:
+        points: (x, y, z) tuples or block dictionaries
+        seed: Integer seed
+        frequency: Lattice cells per unit (higher = finer detail)
+
+    Returns:
+        One value per point, roughly in [-1, 1]
+    """
+    gradients = {}
+
+    def corner_value(ix, iy, iz, fx, fy, fz):
+        key = (ix, iy, iz)
+        gradient = gradients.get(key)
+        if gradient is None:
+            gradient = gradients[key] = _NOISE_GRADIENTS[_lattice_hash(ix, iy, iz, seed) % 12]
+        return gradient[0] * fx + gradient[1] * fy + gradient[2] * fz
+
+    return _lattice_noise(_noise_points(points, frequency), corner_value)
+
+def worley_noise(points, seed=0, frequency=1.0):
+    """
+    Cellular (Worley) noise: distance to the nearest of one random feature point per cell
+
+    Gives cracked-stone, scale and cell patterns.
+
+    Args:
+        points: (x, y, z) tuples or block dictionaries
+        seed: Integer seed
+        frequency: Cells per unit
+
+    Returns:
+        One value in [0, 1] per point (0 at a feature point)
+    """
+    features = {}
+    values = []
+    for x, y, z in _noise_points(points, frequency):
+        ix, iy, iz = math.floor(x), math.floor(y), math.floor(z)
+        nearest = math.inf
+        for cx in (ix - 1, ix, ix + 1):
+            for cy in (iy - 1, iy, iy + 1):
+                for cz in (iz - 1, iz, iz + 1):
+                    feature = features.get((cx, cy, cz))
+                    if feature is None:
+                        h = _lattice_hash(cx, cy, cz, seed)
+                        feature = features[(cx, cy, cz)] = (
+                            cx + (h & 0x3FF) / 1024,
+                            cy + ((h >> 10) & 0x3FF) / 1024,
+                            cz + ((h >> 20) & 0x3FF) / 1024,
+                        )
+                    distance = (feature[0] - x) ** 2 + (feature[1] - y) ** 2 + (feature[2] - z) ** 2
+                    if distance < nearest:
+                        nearest = distance
+        values.append(min(1.0, math.sqrt(nearest)))
+    return values
+
+_NOISE_BASES = {"value": value_noise, "perlin": perlin_noise, "worley": worley_noise}
+
+def fbm(points, seed=0, frequency=1.0, octaves=4, lacunarity=2.0, gain=0.5, basis="perlin"):
+    """
+    Fractal noise: octaves of a basis noise at rising frequency and falling amplitude
+
+    Args:
+        points: (x, y, z) tuples or block dictionaries
+        seed: Integer seed (each octave uses its own seed derived from it)
+        frequency: Frequency of the first octave
+        octaves: Number of layers of detail
+        lacunarity: Frequency multiplier per octave
+        gain: Amplitude multiplier per octave
+        basis: "perlin", "value" or "worley"
+
+    Returns:
+        One value per point, in the basis noise's range
+    """
+    if basis not in _NOISE_BASES:
+        raise ValueError(f"Unknown noise basis {basis!r}, expected one of {sorted(_NOISE_BASES)}")
+    noise = _NOISE_BASES[basis]
+    points = _noise_points(points, 1.0)
+    totals = [0.0] * len(points)
+    amplitude = 1.0
+    norm = 0.0
+    for octave in range(max(1, octaves)):
+        layer = noise(points, seed * 131 + octave, frequency * lacunarity ** octave)
+        for i, value in enumerate(layer):
+            totals[i] += value * amplitude
+        norm += amplitude
+        amplitude *= gain
+    return [total / norm for total in totals]
+
+def displace_blocks(blocks, amount, seed=0, frequency=1.0, octaves=3, center=None, axis=None, basis="perlin"):
+    """
+    Push blocks in or out by fractal noise, for rough rock, bark or lumpy shells
+
+    Args:
+        blocks: List of block dictionaries (not modified)
+        amount: Largest displacement, in world units
+        seed: Integer seed
+        frequency: Noise frequency (features per unit)
+        octaves: Noise octaves
+        center: Point blocks move away from or toward (default: bounding box
+                center), so shells are displaced along their surface normal
+        axis: "x", "y" or "z" to displace along one axis instead
+        basis: "perlin", "value" or "worley"
+
+    Returns:
+        New list of displaced blocks
+    """
+    if not blocks:
+        return []
+    offsets = fbm(blocks, seed, frequency, octaves, basis=basis)
+    if center is None:
+        center = tuple(
+            (min(block[key] for block in blocks) + max(block[key] for block in blocks)) / 2
+            for key in ("x", "y", "z")
+        )
+    fixed = None
+    if axis is not None:
+        if axis not in ("x", "y", "z"):
+            raise ValueError(f"axis must be 'x', 'y' or 'z', got {axis!r}")
+        fixed = (float(axis == "x"), float(axis == "y"), float(axis == "z"))
+
+    cx, cy, cz = center
+    result = []
+    for block, offset in zip(blocks, offsets):
+        if fixed is not None:
+            dx, dy, dz = fixed
+        else:
+            dx, dy, dz = block["x"] - cx, block["y"] - cy, block["z"] - cz
+            length = math.sqrt(dx * dx + dy * dy + dz * dz)
+            dx, dy, dz = (dx / length, dy / length, dz / length) if length > 1e-9 else (0.0, 1.0, 0.0)
+        moved = dict(block)
+        distance = offset * amount
+        moved["x"] = round(block["x"] + dx * distance, 3)
+        moved["y"] = round(block["y"] + dy * distance, 3)
+        moved["z"] = round(block["z"] + dz * distance, 3)
+        result.append(moved)
+    return result
+
+def _block_id(name):
+    return name if ":" in name else f"minecraft:{name}"
+
+def noise_materials(blocks, materials, seed=0, frequency=1.0, octaves=2, thresholds=None, basis="perlin"):
+    """
+    Vary block materials with noise, e.g. stone mixed with cobblestone and andesite
+
+    Args:
+        blocks: List of block dictionaries (not modified)
+        materials: Block IDs from low to high noise, e.g.
+                   ["stone", "cobblestone", "andesite"] ("minecraft:" is optional)
+        seed: Integer seed
+        frequency: Noise frequency (patches per unit)
+        octaves: Noise octaves
+        thresholds: len(materials) - 1 rising noise values separating the
+                    materials; by default each material gets an equal share
+        basis: "perlin", "value" or "worley"
+
+    Returns:
+        New list of blocks with the "block" field replaced
+    """
+    if not materials:
+        raise ValueError("materials must not be empty")
+    names = [_block_id(name) for name in materials]
+    values = fbm(blocks, seed, frequency, octaves, basis=basis)
+    if thresholds is None:
+        ordered = sorted(values)
+        thresholds = [ordered[len(ordered) * i // len(names)] for i in range(1, len(names))] if ordered else []
+    elif len(thresholds) != len(names) - 1:
+        raise ValueError(f"Expected {len(names) - 1} thresholds for {len(names)} materials")
+
+    result = []
+    for block, value in zip(blocks, values):
+        changed = dict(block)
+        changed["block"] = names[bisect.bisect_right(thresholds, value)]
+        result.append(changed)
+    return result
+
+# Default terrain layers: (lowest height as a fraction of max_height, block)
+TERRAIN_LAYERS = [
+    (0.0, "minecraft:sand"),
+    (0.15, "minecraft:grass_block"),
+    (0.55, "minecraft:stone"),
+    (0.85, "minecraft:snow_block"),
+]
+
+def _sample_heightmap(heightmap, u, v):
+    """Bilinear sample of a 2D grid (rows along z) at fractions u, v in [0, 1]"""
+    rows, columns = len(heightmap), len(heightmap[0])
+    x, z = u * (columns - 1), v * (rows - 1)
+    x0, z0 = int(x), int(z)
+    x1, z1 = min(x0 + 1, columns - 1), min(z0 + 1, rows - 1)
+    tx, tz = x - x0, z - z0
+    top = heightmap[z0][x0] + tx * (heightmap[z0][x1] - heightmap[z0][x0])
+    bottom = heightmap[z1][x0] + tx * (heightmap[z1][x1] - heightmap[z1][x0])
+    return top + tz * (bottom - top)
+
+@_tracked_primitive
+def create_terrain(width, depth, scale, max_height, seed=0, frequency=None, octaves=4, layers=None,
+                   center=(0, 0, 0), heightmap=None, solid=False):
+    """
+    Create a terrain patch from a noise or given heightfield
+
+    Args:
+        width: X dimension
+        depth: Z dimension
+        scale: Block scale
+        max_height: Height of the highest point above center y
+        seed: Integer seed for the noise heightfield
+        frequency: Hills per unit (default: about two hills across the patch)
+        octaves: Noise octaves (more = rougher)
+        layers: (height fraction, block) pairs from low to high; each block
+                uses the last layer at or below its own height (default TERRAIN_LAYERS)
+        center: (x, y, z) of the middle of the patch's base
+        heightmap: Optional 2D list of heights in [0, 1] (rows along z) to use
+                   instead of noise, e.g. from an image
+        solid: Fill every column down to the base instead of only the surface
+
+    Returns:
+        List of blocks. Without solid, each column reaches down to its lowest
+        neighbour, so steep slopes have no holes.
+
+    Use for:
+        - Islands, hills and mountain bases under a model
+        - Landscapes from a heightmap image
+    """
+    cx, cy, cz = center
+    num_x = max(1, round(width / scale))
+    num_z = max(1, round(depth / scale))
+    columns = [(cx + (ix - (num_x - 1) / 2) * scale, cz + (iz - (num_z - 1) / 2) * scale)
+               for iz in range(num_z) for ix in range(num_x)]
+
+    if heightmap is not None:
+        heights = [
+            _sample_heightmap(heightmap, ix / max(1, num_x - 1), iz / max(1, num_z - 1))
+            for iz in range(num_z) for ix in range(num_x)
+        ]
+    else:
+        frequency = frequency if frequency is not None else 2.0 / max(width, depth)
+        heights = fbm([(x, 0.0, z) for x, z in columns], seed, frequency, octaves)
+        # Stretch the noise over the whole height range
+        low, high = min(heights), max(heights)
+        heights = [(h - low) / (high - low) if high > low else 0.5 for h in heights]
+
+    top_level = max(0, round(max_height / scale))
+    levels = [round(max(0.0, min(1.0, h)) * top_level) for h in heights]
+    layer_starts = [fraction for fraction, _ in (layers or TERRAIN_LAYERS)]
+    layer_blocks = [_block_id(name) for _, name in (layers or TERRAIN_LAYERS)]
+
+    blocks = []
+    for index, (x, z) in enumerate(columns):
+        level = levels[index]
+        ix, iz = index % num_x, index // num_x
+        lowest = 0
+        if not solid:
+            neighbours = [levels[index - 1] if ix > 0 else level, levels[index + 1] if ix < num_x - 1 else level,
+                          levels[index - num_x] if iz > 0 else level, levels[index + num_x] if iz < num_z - 1 else level]
+            lowest = max(0, min(level, min(neighbours) + 1))
+        for y_level in range(lowest, level + 1):
+            fraction = y_level / top_level if top_level else 0.0
+            blocks.append({
+                "block": layer_blocks[max(0, bisect.bisect_right(layer_starts, fraction) - 1)],
+                "x": round(x, 3),
+                "y": round(cy + y_level * scale, 3),
+                "z": round(z, 3),
+                "scale": [scale, scale, scale],
+            })
+    return blocks
+
+# ---------------------------------------------------------------------------
+# Part instancing
+# ---------------------------------------------------------------------------
+#
+# Wheels, windows, fence posts and leaf clusters are the same blocks placed
+# again and again. An InstancedModel keeps each such part once, in its own
+# coordinates around a local origin, plus a table of (part, Transform)
+# placements. Exports (to_dict(), encode_binary_model) keep the table, so the
+# model stays small, and consumers either expand it lazily (iter_blocks) or
+# turn each part into something reusable, like one datapack function called
+# at every placement.
+
+INSTANCED_MODEL_VERSION = 1
+
+class InstancedModel:
+    """
+    A model built from loose blocks plus placements of shared parts
+
+    Iterating (or iter_blocks()) expands the placements one at a time, so an
+    InstancedModel can be returned from generate() like a block list.
+
+    Use for:
+        - Models with many identical parts (wheels, windows, posts, lamps)
+        - Keeping exported models small
+    """
+
+    def __init__(self, blocks=None):
+        """
+        Args:
+            blocks: Optional loose blocks that belong to no part
+        """
+        self.blocks = list(blocks or [])
+        self.parts = {}
+        self.instances = []
+
+    def __repr__(self):
+        return f"InstancedModel({len(self.blocks)} blocks, {len(self.parts)} parts, {len(self.instances)} instances)"
+
+    def __len__(self):
+        sizes = {name: len(blocks) for name, blocks in self.parts.items()}
+        return len(self.blocks) + sum(sizes[name] for name, _ in self.instances)
+
+    def __iter__(self):
+        return self.iter_blocks()
+
+    def add(self, blocks):
+        """Add loose blocks and return the model"""
+        self.blocks.extend(iter_model(blocks))
+        return self
+
+    def define(self, name, blocks):
+        """
+        Define a part once, in coordinates relative to its own origin
+
+        Args:
+            name: Part name, unique within the model
+            blocks: The part's blocks (a list or generate()-style output)
+
+        Returns:
+            name
+        """
+        if name in self.parts:
+            raise ValueError(f"Part {name!r} is already defined")
+        self.parts[name] = list(iter_model(blocks))
+        return name
+
+    def place(self, name, transform=None, rotate=(0, 0, 0), quaternion=None, translate=(0, 0, 0),
+              scale=1.0, mirror=None):
+        """
+        Place a copy of a part
+
+        Either pass a Transform, or the transform_blocks() keywords (applied in
+        the order mirror, scale, rotate, quaternion, translate). Both act around
+        the part's origin.
+
+        Returns:
+            The Transform of the placement
+        """
+        if name not in self.parts:
+            raise KeyError(f"Unknown part {name!r}")
+        if transform is None:
+            transform = Transform()
+            for axis in ([mirror] if isinstance(mirror, str) else mirror or ()):
+                transform = transform.mirror(axis)
+            transform = transform.scale(*scale) if isinstance(scale, (list, tuple)) else transform.scale(scale)
+            transform = transform.rotate(*rotate)
+            if quaternion is not None:
+                transform = transform.rotate_quaternion(quaternion)
+            transform = transform.translate(*translate)
+        self.instances.append((name, transform))
+        return transform
+
+    def instance_blocks(self, index):
+        """Blocks of one placement (fresh dictionaries)"""
+        name, transform = self.instances[index]
+        return transform.apply(self.parts[name])
+
+    def iter_blocks(self):
+        """Yield the loose blocks, then every placement expanded"""
+        yield from self.blocks
+        for index in range(len(self.instances)):
+            yield from self.instance_blocks(index)
+
+    def to_blocks(self):
+        """Expand into the usual list of block dictionaries"""
+        return list(self.iter_blocks())
+
+    def to_dict(self):
+        instances = []
+        for name, transform in self.instances:
+            offset = transform.translation()
+            if offset is not None:
+                instances.append({"part": name, "translate": list(offset)})
+            else:
+                instances.append({"part": name, "matrix": list(transform.matrix[:12])})
+        return {
+            "version": INSTANCED_MODEL_VERSION,
+            "blocks": self.blocks,
+            "parts": self.parts,
+            "instances": instances,
+        }
+
+def is_instanced_model(data):
+    """True for an InstancedModel or its to_dict() form"""
+    return isinstance(data, InstancedModel) or (isinstance(data, dict) and "instances" in data)
+
+def instanced_model_from_dict(data):
+    """
+    Rebuild an InstancedModel from its to_dict() form
+
+    Args:
+        data: Dictionary, or its JSON string
+
+    Returns:
+        InstancedModel
+    """
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    if data.get("version") != INSTANCED_MODEL_VERSION:
+        raise ValueError(f"Unsupported instanced model version: {data.get('version')}")
+    model = InstancedModel(data.get("blocks"))
+    for name, blocks in data.get("parts", {}).items():
+        model.define(name, blocks)
+    for instance in data.get("instances", []):
+        if "matrix" in instance:
+            model.place(instance["part"], Transform(list(instance["matrix"]) + [0.0, 0.0, 0.0, 1.0]))
+        else:
+            model.place(instance["part"], Transform().translate(*instance.get("translate", (0, 0, 0))))
+    return model
+
+def expand_model(data):
+    """
+    Block list for any model form: a block list, an InstancedModel, a
+    BinaryModel, or the to_dict() form of an InstancedModel (or its JSON)
+    """
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    if isinstance(data, dict):
+        data = instanced_model_from_dict(data)
+    if isinstance(data, (InstancedModel, BinaryModel)):
+        return data.to_blocks()
+    return data
+
 # Example usage
 if __name__ == "__main__":
     # Test sphere
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Voxel Generation Worker - long-lived process that runs AI-written generate() code
+
+Starting python3 and importing the voxel library for every model is slow, and
+temp files shared between generations clobber each other. This worker loads
+voxel_shape_library once and serves JSON-RPC 2.0 requests over stdin/stdout,
+one JSON object per line.
+
+Request:
+    {"jsonrpc": "2.0", "id": 1, "method": "generate",
+     "params": {"code": "def generate(): ...", "budget": 5000,
+                "timeout": 60, "memory_mb": 1024, "profile": false}}
+
+Requests beyond --pool-size wait in a queue. Once a request starts running
+(and its timeout starts counting) a notification says so:
+    {"jsonrpc": "2.0", "method": "started", "params": {"id": 1}}
+
+While the model is produced, blocks stream out as notifications:
+    {"jsonrpc": "2.0", "method": "blocks", "params": {"id": 1, "blocks": [...]}}
+
+followed by exactly one response:
+    {"jsonrpc": "2.0", "id": 1, "result": {"report": {...}}}
+    {"jsonrpc": "2.0", "id": 1, "error": {"code": -32001, "message": "..."}}
+
+With "profile": true the report also holds a "profile" trace of every
+primitive call (see profile_generate), and the summary table goes to stderr.
+
+Other methods: "ping" and "shutdown". Closing stdin also shuts down after
+in-flight requests finish.
+
+Each request runs in its own child process, forked from a preloaded server,
+with a fresh namespace, a wall-clock timeout and an address-space cap. Up to
+--pool-size requests run at the same time.
+"""
+
+import argparse
+import builtins
+import contextlib
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import voxel_shape_library
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MEMORY_MB = 1024
+CHUNK_SIZE = 500
+
+# JSON-RPC error codes (-32000..-32099 are ours)
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+GENERATION_FAILED = -32000
+TIMED_OUT = -32001
+OUT_OF_MEMORY = -32002
+WORKER_CRASHED = -32003
+
+def _request_namespace():
+    """Fresh globals for one request, equivalent to `from voxel_shape_library import *`"""
+    namespace = {"__name__": "__voxel_request__", "__builtins__": builtins}
+    for name in dir(voxel_shape_library):
+        if not name.startswith("_"):
+            namespace[name] = getattr(voxel_shape_library, name)
+    return namespace
+
+class _PipeWriter:
+    """Text stream that forwards each complete line to the parent process"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._pending = []
+
+    def write(self, text):
+        while "\n" in text:
+            head, text = text.split("\n", 1)
+            self._pending.append(head)
+            self.conn.send(("blocks", "".join(self._pending)))
+            self._pending = []
+        if text:
+            self._pending.append(text)
+
+    def flush(self):
+        pass
+
+def _run_request(conn, code, budget, memory_mb, chunk_size, profile=False):
+    """Child process: run one generate() program and stream its blocks back"""
+    if resource is not None and memory_mb:
+        limit = int(memory_mb) * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+    # Generated code may print() while debugging; keep stdout for the protocol only
+    sys.stdout = sys.stderr
+
+    try:
+        namespace = _request_namespace()
+        exec(compile(code, "<generated>", "exec"), namespace)
+        generate = namespace.get("generate")
+        if not callable(generate):
+            raise ValueError("Code does not define a generate() function")
+
+        out = _PipeWriter(conn)
+        with contextlib.ExitStack() as stack:
+            profiler = stack.enter_context(voxel_shape_library.profile_primitives()) if profile else None
+            if budget:
+                report = voxel_shape_library.stream_with_budget(generate, int(budget), out=out, chunk_size=chunk_size)
+            else:
+                total = voxel_shape_library.write_blocks_jsonl(generate(), out=out, chunk_size=chunk_size)
+                report = {"total_blocks": total}
+        if profiler is not None:
+            profiler.total_blocks = report["total_blocks"]
+            report["profile"] = profiler.as_dict()
+            print(profiler.summary(), file=sys.stderr)
+        conn.send(("done", report))
+    except MemoryError:
+        conn.send(("error", OUT_OF_MEMORY, f"Generation exceeded the {memory_mb} MB memory limit"))
+    except BaseException as e:
+        conn.send(("error", GENERATION_FAILED, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+    finally:
+        conn.close()
+
+def _multiprocessing_context():
+    """forkserver keeps a clean, preloaded process to fork from; spawn where it is missing"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["voxel_shape_library"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+class VoxelWorker:
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 memory_mb=DEFAULT_MEMORY_MB, out=None):
+        """
+        Args:
+            pool_size: Number of requests that may run at the same time
+            timeout: Default wall-clock limit per request, in seconds
+            memory_mb: Default address-space cap per request, in megabytes
+            out: Text stream for protocol output (default: sys.stdout)
+        """
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.out = sys.stdout if out is None else out
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+        self._out_lock = threading.Lock()
+        self._context = _multiprocessing_context()
+
+    def _send_line(self, text):
+        with self._out_lock:
+            self.out.write(text)
+            self.out.write("\n")
+            self.out.flush()
+
+    def _respond(self, request_id, result):
+        self._send_line(json.dumps({"jsonrpc": "2.0", "id": request_id, "result": result}))
+
+    def _error(self, request_id, code, message):
+        self._send_line(json.dumps({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {"code": code, "message": message},
+        }))
+
+    def handle_line(self, line):
+        """
+        Handle one line of input
+
+        Returns:
+            False once a shutdown request has been received, True otherwise
+        """
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            self._error(None, PARSE_ERROR, f"Invalid JSON: {e}")
+            return True
+
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            self._error(None, INVALID_REQUEST, "Request must be an object with a method")
+            return True
+
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+
+        if method == "ping":
+            self._respond(request_id, "pong")
+        elif method == "shutdown":
+            self._respond(request_id, "bye")
+            return False
+        elif method == "generate":
+            if not isinstance(params, dict) or not isinstance(params.get("code"), str):
+                self._error(request_id, INVALID_PARAMS, "generate needs a 'code' string")
+            else:
+                self._executor.submit(self._generate, request_id, params)
+        else:
+            self._error(request_id, METHOD_NOT_FOUND, f"Unknown method: {method}")
+        return True
+
+    def _generate(self, request_id, params):
+        timeout = float(params.get("timeout") or self.timeout)
+        memory_mb = params.get("memory_mb") or self.memory_mb
+        chunk_size = int(params.get("chunk_size") or CHUNK_SIZE)
+        prefix = '{"jsonrpc":"2.0","method":"blocks","params":{"id":%s,"blocks":' % json.dumps(request_id)
+
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_run_request,
+            args=(sender, params["code"], params.get("budget"), memory_mb, max(2, chunk_size),
+                  bool(params.get("profile"))),
+            daemon=True,
+        )
+        try:
+            process.start()
+            sender.close()
+            deadline = time.monotonic() + timeout
+            self._send_line(json.dumps({"jsonrpc": "2.0", "method": "started", "params": {"id": request_id}}))
+
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not receiver.poll(remaining):
+                    self._error(request_id, TIMED_OUT, f"Generation timed out after {timeout:g} seconds")
+                    return
+                try:
+                    message = receiver.recv()
+                except EOFError:
+                    process.join(1)
+                    self._error(request_id, WORKER_CRASHED, f"Generation process exited unexpectedly (exit code {process.exitcode})")
+                    return
+
+                if message[0] == "blocks":
+                    # Chunks are already JSON arrays; splice them in without re-encoding
+                    self._send_line(prefix + message[1] + "}}")
+                elif message[0] == "done":
+                    self._respond(request_id, {"report": message[1]})
+                    return
+                else:
+                    self._error(request_id, message[1], message[2])
+                    return
+        except Exception as e:
+            self._error(request_id, GENERATION_FAILED, f"{type(e).__name__}: {e}")
+        finally:
+            receiver.close()
+            if process.is_alive():
+                process.kill()
+            process.join(1)
+
+    def serve(self, lines):
+        """Handle requests until shutdown or end of input, then wait for in-flight work"""
+        try:
+            for line in lines:
+                if line.strip() and not self.handle_line(line):
+                    break
+        finally:
+            self._executor.shutdown(wait=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived voxel generation worker (JSON-RPC over stdio)")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB)
+    args = parser.parse_args()
+
+    worker = VoxelWorker(pool_size=args.pool_size, timeout=args.timeout, memory_mb=args.memory_mb)
+    worker.serve(sys.stdin)
+
+if __name__ == "__main__":
+    main()